@@ -6,6 +6,7 @@ from beanie import Document
 from pydantic import Field, EmailStr
 from typing import Optional
 from datetime import datetime
+from pymongo import ASCENDING, IndexModel
 
 
 class AdminUsuarios(Document):
@@ -29,6 +30,11 @@ class AdminUsuarios(Document):
 
     class Settings:
         name = "admin_usuarios"  # Nombre de la colección en MongoDB
+        # Construidos en segundo plano por db/indexes.reconcile_indexes
+        background_indexes = [
+            IndexModel([("mail", ASCENDING)], unique=True),
+            IndexModel([("usuario", ASCENDING)], unique=True),
+        ]
 
     class Config:
         json_schema_extra = {
@@ -17,10 +17,11 @@ from security.jwt_auth import (
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from security.security import verificar_clave
+from security.security import verificar_clave_async
 from Projects.Admin.models.admin_usuarios_beanie import AdminUsuarios
 from Projects.Admin.utils.template_helpers import render_admin_template
 from Projects.Admin.services.validacion_vencimiento import verificar_y_actualizar_vencimiento
+from security.credential_cache import credential_cache
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
@@ -211,6 +212,7 @@ async def sincronizar_password_remota(usuario: AdminUsuarios) -> bool:
             # Guardar cambios
             logger.info(f"[SYNC PASSWORD] Actualizando: {', '.join(cambios)} para {usuario.mail}")
             await usuario.save()
+            credential_cache.invalidate_usuario(usuario.id)
             
             logger.info(f"[SYNC PASSWORD] ✅ Sincronización exitosa para {usuario.mail}")
             return True
@@ -331,7 +333,7 @@ async def admin_login_api(
                 )
         
         # Verificar contraseña
-        if not verificar_clave(password, usuario.clave_hash):
+        if not await verificar_clave_async(password, usuario.clave_hash):
             logger.warning(f"⚠️  Contraseña incorrecta para {username}, verificando sincronización con servidor remoto...")
             
             # Intentar sincronizar contraseña y otros datos desde servidor remoto
@@ -366,7 +368,7 @@ async def admin_login_api(
                             detail=f"Su acceso ha expirado el {fecha_venc.strftime('%d/%m/%Y')}"
                         )
                 
-                if verificar_clave(password, usuario.clave_hash):
+                if await verificar_clave_async(password, usuario.clave_hash):
                     logger.info(f"✅ Datos sincronizados exitosamente para {username}")
                 else:
                     logger.warning(f"❌ Intento de login admin fallido - Contraseña incorrecta después de sincronización: {username} desde {client_ip}")
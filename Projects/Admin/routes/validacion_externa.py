@@ -11,6 +11,9 @@ import bcrypt
 from Projects.Admin.schemas.validacion_externa import ValidateRequest, ValidateResponse, DatosUsuario
 from Projects.Admin.models.admin_usuarios_beanie import AdminUsuarios
 from Projects.Admin.models.proyectos_beanie import Proyecto, UsuarioProyecto
+from security.password_hasher import password_hasher, PasswordHasherBusy
+from security.credential_cache import credential_cache, en_segundo_plano
+from beanie import PydanticObjectId
 
 logger = logging.getLogger(__name__)
 
@@ -195,6 +198,17 @@ async def validate_user_project_access(request_data: ValidateRequest, request: R
         # Registrar intento de validación
         client_ip = request.client.host if request.client else "unknown"
         logger.info(f"[VALIDACIÓN] Intento desde IP {client_ip} - Email: {request_data.email}, Proyecto: {request_data.proyecto_nombre}")
+
+        # Validación exitosa reciente (sin bcrypt ni consultas; tracking en segundo plano)
+        clave_cache = credential_cache.key("admin", request_data.email, request_data.password, request_data.proyecto_nombre)
+        cacheado = credential_cache.get(clave_cache)
+        if cacheado is not None:
+            en_segundo_plano(_update_validation_attempt(
+                PydanticObjectId(cacheado["usuario_id"]), request_data.proyecto_nombre, success=True
+            ))
+            logger.info(f"[VALIDACIÓN] ✅ Acceso válido (caché) para {request_data.email} - {request_data.proyecto_nombre}")
+            return ValidateResponse(**cacheado["respuesta"])
+        generacion = credential_cache.generation
         
         # 1. Buscar usuario por email
         usuario = await AdminUsuarios.find_one(AdminUsuarios.mail == request_data.email)
@@ -210,7 +224,7 @@ async def validate_user_project_access(request_data: ValidateRequest, request: R
         password_bytes = request_data.password.encode('utf-8')
         clave_hash_bytes = usuario.clave_hash.encode('utf-8')
         
-        if not bcrypt.checkpw(password_bytes, clave_hash_bytes):
+        if not await password_hasher.run(bcrypt.checkpw, password_bytes, clave_hash_bytes):
             logger.warning(f"[VALIDACIÓN] Contraseña incorrecta para: {request_data.email}")
             # Actualizar last_validation_attempt (intento fallido)
             await _update_validation_attempt(usuario.id, request_data.proyecto_nombre, success=False)
@@ -288,7 +302,7 @@ async def validate_user_project_access(request_data: ValidateRequest, request: R
         logger.info(f"[VALIDACIÓN] ✅ Acceso válido para {request_data.email} - {request_data.proyecto_nombre}")
         
         # Preparar respuesta exitosa
-        return ValidateResponse(
+        respuesta = ValidateResponse(
             valid=True,
             mensaje="Acceso válido",
             datos_usuario=DatosUsuario(
@@ -297,7 +311,17 @@ async def validate_user_project_access(request_data: ValidateRequest, request: R
             ),
             fecha_vencimiento=vinculacion.fecha_vencimiento
         )
+        credential_cache.put(
+            clave_cache,
+            {"usuario_id": str(usuario.id), "respuesta": respuesta.model_dump()},
+            usuario.id, proyecto.id,
+            vencimiento=vinculacion.fecha_vencimiento,
+            generation=generacion
+        )
+        return respuesta
     
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         logger.error(f"[VALIDACIÓN] Error en validación: {str(e)}", exc_info=True)
         return ValidateResponse(
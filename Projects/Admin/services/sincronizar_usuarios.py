@@ -21,6 +21,7 @@ import os
 from dotenv import load_dotenv
 from Projects.Admin.models.admin_usuarios_beanie import AdminUsuarios
 from Projects.Admin.models.proyectos_beanie import Proyecto, UsuarioProyecto
+from security.credential_cache import credential_cache
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -242,6 +243,7 @@ class SincronizadorUsuarios:
             
             if not dry_run:
                 await usuario_local.save()
+                credential_cache.invalidate_usuario(usuario_local.id)
             
             estadisticas["usuarios_actualizados"] += 1
     
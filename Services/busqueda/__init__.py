@@ -0,0 +1 @@
+# Búsqueda de productos (índice invertido en memoria)
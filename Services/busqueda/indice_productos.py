@@ -0,0 +1,570 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# indice_productos.py - Índice invertido en memoria para la búsqueda de productos
+# =============================================================================
+# Motor de búsqueda de /ecomerce/api/productos/buscar:
+# - Tokenización en español sin acentos ("Consultoría" == "consultoria"),
+#   sin stopwords y con un stemming liviano de plurales ("servicios" -> "servicio").
+# - Relevancia tipo BM25 con pesos por campo (nombre > categoria > descripcion).
+# - Tolerancia a errores de tipeo (distancia de edición 1, índice de borrados
+#   estilo SymSpell) y prefijos para el último término ("búsqueda mientras se
+#   escribe").
+# - Facetas de categoría y rango de precio: cada término mantiene sus conteos
+#   por (categoría, rango) al indexar, así una consulta de un término sin
+#   filtros no recorre sus documentos; el resto se cuenta sobre columnas por
+#   documento (Counter en C, sin bucle Python por producto).
+# - Solo se ordena lo que se devuelve: heapq.nlargest(offset + limit) en lugar
+#   de ordenar todas las coincidencias.
+# - Cachés: puntajes por conjunto de términos (cambiar filtros o página no
+#   vuelve a puntuar) y, por consulta (términos + filtros), total, facetas y
+#   los mejores resultados; repetir la búsqueda no recalcula nada.
+#
+# Mantenimiento:
+# - Se construye completo en segundo plano al arrancar (start_indexer) y se
+#   reconstruye cada SEARCH_INDEX_REFRESH_SECONDS para que los demás workers
+#   converjan.
+# - routers/admin_productos lo actualiza incrementalmente (upsert/remove) en el
+#   worker que atiende la escritura.
+# =============================================================================
+
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "300"))
+
+# Peso de cada campo en la relevancia
+PESOS_CAMPOS = {"nombre": 3.0, "categoria": 2.0, "descripcion": 1.0}
+# Factor de relevancia según cómo coincidió el término de la consulta
+FACTOR_EXACTO = 1.0
+FACTOR_PREFIJO = 0.7
+FACTOR_TIPEO = 0.5
+# Saturación de la frecuencia de términos (BM25)
+BM25_K1 = 1.2
+# Máximo de términos del vocabulario en que se expande un prefijo
+MAX_EXPANSION_PREFIJO = 50
+# Largo mínimo para aplicar tolerancia a errores de tipeo
+MIN_LARGO_TIPEO = 4
+# Límites de los rangos de precio de la faceta
+RANGOS_PRECIO = [0, 1000, 5000, 10000, 50000, 100000]
+# Largo de la descripción que se devuelve en los resultados
+LARGO_DESCRIPCION = 200
+# Consultas (términos + filtros) cuyos resultados ordenados se memorizan
+MAX_CONSULTAS_CACHEADAS = 256
+# Conjuntos de términos cuyos puntajes (un dict por consulta amplia) se memorizan
+MAX_PUNTAJES_CACHEADOS = 16
+# Mínimo de resultados ordenados que se guardan por consulta (páginas siguientes)
+MIN_TOP_CACHEADO = 100
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "o", "para", "por", "que", "se", "sin", "su", "sus", "un", "una", "unos",
+    "unas", "y",
+}
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+_VOCALES = "aeiou"
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin acentos (la ñ pasa a n)"""
+    texto = unicodedata.normalize("NFD", texto.lower())
+    return "".join(c for c in texto if unicodedata.category(c) != "Mn")
+
+
+def _stem(token: str) -> str:
+    """Stemming liviano de plurales en español"""
+    if len(token) > 4 and token.endswith("es") and token[-3] in "lnrdj":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and token[-2] in _VOCALES:
+        return token[:-1]
+    return token
+
+
+def tokenizar(texto: Optional[str]) -> List[str]:
+    if not texto:
+        return []
+    tokens = _NO_ALFANUMERICO.split(normalizar(str(texto)))
+    return [_stem(t) for t in tokens if len(t) > 1 and t not in STOPWORDS]
+
+
+def _borrados(termino: str) -> Set[str]:
+    return {termino[:i] + termino[i + 1:] for i in range(len(termino))}
+
+
+def _distancia_uno(a: str, b: str) -> bool:
+    """True si a y b difieren en exactamente una edición (incluye transposición)"""
+    if a == b:
+        return False
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        difs = [i for i in range(la) if a[i] != b[i]]
+        if len(difs) == 1:
+            return True
+        return len(difs) == 2 and difs[1] == difs[0] + 1 and a[difs[0]] == b[difs[1]] and a[difs[1]] == b[difs[0]]
+    if la > lb:
+        a, b = b, a
+    # b tiene un carácter más que a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def _rango_precio(precio: float) -> int:
+    return max(0, bisect.bisect_right(RANGOS_PRECIO, precio) - 1)
+
+
+class IndiceProductos:
+    """Índice invertido de productos activos"""
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.doc_terms: Dict[str, Set[str]] = {}
+        # Columnas por documento para filtrar y contar facetas
+        self.categorias: Dict[str, Any] = {}
+        self.categorias_norm: Dict[str, str] = {}
+        self.precios: Dict[str, float] = {}
+        self.stocks: Dict[str, int] = {}
+        self.rangos: Dict[str, int] = {}
+        self.celdas: Dict[str, Tuple[Any, int]] = {}
+        # Conteo de documentos por (categoría, rango de precio) de cada término
+        self.celdas_termino: Dict[str, Counter] = defaultdict(Counter)
+        self.borrados: Dict[str, Set[str]] = defaultdict(set)
+        self._vocab_ordenado: Optional[List[str]] = None
+        # Resultados de consultas recientes (se vacían ante cualquier cambio)
+        self._consultas: "OrderedDict[tuple, Tuple[List[Tuple[str, float]], int, Dict[str, Any]]]" = OrderedDict()
+        self._puntajes: "OrderedDict[tuple, Dict[str, float]]" = OrderedDict()
+        self.construido_en: Optional[float] = None
+
+    # --- Mantenimiento --------------------------------------------------------
+    def upsert(self, producto: Dict[str, Any]):
+        """Agrega o reemplaza un producto (los inactivos se quitan del índice)"""
+        doc_id = str(producto.get("_id", producto.get("id")))
+        self.remove(doc_id)
+        self._invalidar_consultas()
+        if not producto.get("activo", True):
+            return
+
+        pesos: Dict[str, float] = defaultdict(float)
+        for campo, peso in PESOS_CAMPOS.items():
+            for token in tokenizar(producto.get(campo)):
+                pesos[token] += peso
+
+        descripcion = producto.get("descripcion") or ""
+        self.docs[doc_id] = {
+            "id": doc_id,
+            "nombre": producto.get("nombre"),
+            "descripcion": descripcion[:LARGO_DESCRIPCION],
+            "categoria": producto.get("categoria"),
+            "precio": float(producto.get("precio") or 0.0),
+            "stock": int(producto.get("stock") or 0),
+            "imagen_url": producto.get("imagen_url"),
+        }
+        precio = self.docs[doc_id]["precio"]
+        categoria = self.docs[doc_id]["categoria"]
+        self.categorias[doc_id] = categoria
+        self.categorias_norm[doc_id] = normalizar(categoria or "")
+        self.precios[doc_id] = precio
+        self.stocks[doc_id] = self.docs[doc_id]["stock"]
+        self.rangos[doc_id] = _rango_precio(precio)
+        celda = self.celdas[doc_id] = (categoria, self.rangos[doc_id])
+        self.doc_terms[doc_id] = set(pesos)
+        for termino, peso in pesos.items():
+            self.celdas_termino[termino][celda] += 1
+            if termino not in self.postings:
+                self._vocab_ordenado = None
+                if len(termino) >= MIN_LARGO_TIPEO:
+                    for variante in _borrados(termino):
+                        self.borrados[variante].add(termino)
+            # Frecuencia ponderada saturada (BM25 sin normalización por largo:
+            # los textos de producto son cortos y así el peso queda precalculado)
+            self.postings[termino][doc_id] = peso * (BM25_K1 + 1) / (peso + BM25_K1)
+
+    def remove(self, doc_id: str):
+        doc_id = str(doc_id)
+        terminos = self.doc_terms.pop(doc_id, None)
+        if terminos is None:
+            return
+        self._invalidar_consultas()
+        self.docs.pop(doc_id, None)
+        celda = self.celdas.pop(doc_id, None)
+        for columna in (self.categorias, self.categorias_norm, self.precios, self.stocks, self.rangos):
+            columna.pop(doc_id, None)
+        for termino in terminos:
+            conteo = self.celdas_termino.get(termino)
+            if conteo is not None:
+                conteo[celda] -= 1
+                if conteo[celda] <= 0:
+                    del conteo[celda]
+                if not conteo:
+                    del self.celdas_termino[termino]
+            posting = self.postings.get(termino)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[termino]
+                self._vocab_ordenado = None
+                if len(termino) >= MIN_LARGO_TIPEO:
+                    for variante in _borrados(termino):
+                        grupo = self.borrados.get(variante)
+                        if grupo is not None:
+                            grupo.discard(termino)
+                            if not grupo:
+                                del self.borrados[variante]
+
+    def _invalidar_consultas(self):
+        self._consultas.clear()
+        self._puntajes.clear()
+
+    # --- Expansión de términos de la consulta --------------------------------
+    def _vocab(self) -> List[str]:
+        if self._vocab_ordenado is None:
+            self._vocab_ordenado = sorted(self.postings)
+        return self._vocab_ordenado
+
+    def _por_prefijo(self, prefijo: str) -> List[str]:
+        vocab = self._vocab()
+        inicio = bisect.bisect_left(vocab, prefijo)
+        resultado = []
+        for termino in vocab[inicio:inicio + MAX_EXPANSION_PREFIJO + 1]:
+            if not termino.startswith(prefijo):
+                break
+            if termino != prefijo:
+                resultado.append(termino)
+        return resultado
+
+    def _por_tipeo(self, token: str) -> Set[str]:
+        if len(token) < MIN_LARGO_TIPEO:
+            return set()
+        candidatos = set(self.borrados.get(token, ()))
+        for variante in _borrados(token):
+            if variante in self.postings:
+                candidatos.add(variante)
+            candidatos.update(self.borrados.get(variante, ()))
+        return {c for c in candidatos if _distancia_uno(token, c)}
+
+    def expandir(self, token: str, ultimo: bool) -> Dict[str, float]:
+        """Términos del vocabulario que cubren un token de la consulta, con su factor"""
+        expansion: Dict[str, float] = {}
+        if token in self.postings:
+            expansion[token] = FACTOR_EXACTO
+        if ultimo:
+            for termino in self._por_prefijo(token):
+                expansion.setdefault(termino, FACTOR_PREFIJO)
+        if not expansion:
+            for termino in self._por_tipeo(token):
+                expansion[termino] = FACTOR_TIPEO
+        return expansion
+
+    # --- Búsqueda -------------------------------------------------------------
+    def _escalas(self, expansion: Dict[str, float]) -> List[Tuple[Dict[str, float], float]]:
+        """(posting, idf * factor) de cada término de la expansión"""
+        n_docs = len(self.docs) or 1
+        resultado = []
+        for termino, factor in expansion.items():
+            posting = self.postings.get(termino)
+            if posting:
+                idf = math.log(1.0 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                resultado.append((posting, idf * factor))
+        return resultado
+
+    def _puntuar(self, expansiones: List[Dict[str, float]], requerir_todos: bool) -> Dict[str, float]:
+        if not expansiones:
+            return {}
+        if requerir_todos:
+            # Se materializa solo el token más selectivo; el resto se consulta
+            # por documento candidato (intersección sin recorrer postings grandes)
+            tokens = sorted((self._escalas(e) for e in expansiones),
+                            key=lambda escalas: sum(len(p) for p, _ in escalas))
+            puntajes = self._maximo(tokens[0])
+            for escalas in tokens[1:]:
+                if len(escalas) == 1:
+                    posting, escala = escalas[0]
+                    puntajes = {d: p + posting[d] * escala for d, p in puntajes.items() if d in posting}
+                else:
+                    mejor = self._maximo(escalas, candidatos=puntajes)
+                    puntajes = {d: p + mejor[d] for d, p in puntajes.items() if d in mejor}
+                if not puntajes:
+                    break
+            return puntajes
+        puntajes: Dict[str, float] = {}
+        for expansion in expansiones:
+            for doc_id, valor in self._maximo(self._escalas(expansion)).items():
+                puntajes[doc_id] = puntajes.get(doc_id, 0.0) + valor
+        return puntajes
+
+    @staticmethod
+    def _maximo(escalas: List[Tuple[Dict[str, float], float]], candidatos: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """
+        Puntaje de cada documento para un token: el máximo entre sus expansiones.
+        Con `candidatos` solo se consideran esos documentos, recorriendo en cada
+        expansión el menor entre su posting y los candidatos.
+        """
+        escalas = sorted(escalas, key=lambda e: len(e[0]), reverse=True)
+        resultado: Dict[str, float] = {}
+        for i, (posting, escala) in enumerate(escalas):
+            if i == 0:
+                # El posting más grande se copia (comprensión, sin comparaciones)
+                if candidatos is None:
+                    resultado = {doc_id: peso * escala for doc_id, peso in posting.items()}
+                elif len(candidatos) < len(posting):
+                    resultado = {d: posting[d] * escala for d in candidatos if d in posting}
+                else:
+                    resultado = {d: peso * escala for d, peso in posting.items() if d in candidatos}
+                continue
+            if candidatos is not None and len(candidatos) < len(posting):
+                pares = ((d, posting[d]) for d in candidatos if d in posting)
+            elif candidatos is not None:
+                pares = ((d, peso) for d, peso in posting.items() if d in candidatos)
+            else:
+                pares = posting.items()
+            for doc_id, peso in pares:
+                valor = peso * escala
+                if valor > resultado.get(doc_id, 0.0):
+                    resultado[doc_id] = valor
+        return resultado
+
+    def _puntajes_de(self, clave_tokens: tuple, expansiones) -> Dict[str, float]:
+        """Puntaje de cada documento que coincide con la consulta (cacheado por términos)"""
+        puntajes = self._puntajes.get(clave_tokens)
+        if puntajes is not None:
+            self._puntajes.move_to_end(clave_tokens)
+            return puntajes
+        expansiones_validas = [e for e in expansiones if e]
+        puntajes = self._puntuar(expansiones_validas, requerir_todos=True)
+        if not puntajes and len(expansiones_validas) > 1:
+            # Ningún producto contiene todos los términos: relajar a cualquiera
+            puntajes = self._puntuar(expansiones_validas, requerir_todos=False)
+        self._puntajes[clave_tokens] = puntajes
+        if len(self._puntajes) > MAX_PUNTAJES_CACHEADOS:
+            self._puntajes.popitem(last=False)
+        return puntajes
+
+    @staticmethod
+    def _facetas_de_celdas(celdas: Counter) -> Dict[str, Any]:
+        """Facetas a partir de conteos por (categoría, rango de precio)"""
+        facetas_categoria: Counter = Counter()
+        facetas_precio = [0] * len(RANGOS_PRECIO)
+        for (categoria, rango), count in celdas.items():
+            facetas_categoria[categoria] += count
+            facetas_precio[rango] += count
+        return {"categorias": facetas_categoria, "precios": facetas_precio}
+
+    def _resolver(self, clave_tokens, expansiones, categoria_norm, precio_min, precio_max, en_stock, k: int):
+        """Los k mejores (doc_id, puntaje), el total y los conteos de facetas de una consulta"""
+        sin_filtros = not en_stock and categoria_norm is None and precio_min is None and precio_max is None
+        expansiones_validas = [e for e in expansiones if e]
+        if sin_filtros and len(expansiones_validas) == 1 and len(expansiones_validas[0]) == 1:
+            # Un solo término: el ranking es su posting escalado y las facetas
+            # ya están contadas; no se materializa un dict de puntajes
+            (termino,) = expansiones_validas[0]
+            (posting, escala), = self._escalas(expansiones_validas[0])
+            top = [(d, peso * escala) for d, peso in heapq.nlargest(k, posting.items(), key=itemgetter(1))]
+            return top, len(posting), self._facetas_de_celdas(self.celdas_termino[termino])
+
+        puntajes = self._puntajes_de(clave_tokens, expansiones)
+
+        # Cada filtro es una comprensión de dict y cada faceta un Counter sobre
+        # una columna: recorridos en C en lugar de un bucle Python por documento
+        base = puntajes
+        if en_stock:
+            stocks = self.stocks
+            base = {d: p for d, p in base.items() if stocks[d] > 0}
+        por_precio = base
+        if precio_min is not None or precio_max is not None:
+            minimo = precio_min if precio_min is not None else float("-inf")
+            maximo = precio_max if precio_max is not None else float("inf")
+            precios = self.precios
+            por_precio = {d: p for d, p in base.items() if minimo <= precios[d] <= maximo}
+        if categoria_norm is None:
+            por_categoria, resultados = base, por_precio
+        else:
+            categorias_norm = self.categorias_norm
+            por_categoria = {d: p for d, p in base.items() if categorias_norm[d] == categoria_norm}
+            resultados = {d: p for d, p in por_precio.items() if categorias_norm[d] == categoria_norm}
+
+        # Facetas disyuntivas: cada una ignora su propio filtro
+        if por_precio is por_categoria:
+            facetas = self._facetas_de_celdas(Counter(map(self.celdas.__getitem__, base)))
+        else:
+            conteo_rangos = Counter(map(self.rangos.__getitem__, por_categoria))
+            facetas = {
+                "categorias": Counter(map(self.categorias.__getitem__, por_precio)),
+                "precios": [conteo_rangos.get(i, 0) for i in range(len(RANGOS_PRECIO))],
+            }
+
+        # Solo se ordenan los k mejores (desempate estable por orden de inserción)
+        top = heapq.nlargest(k, resultados.items(), key=itemgetter(1))
+        return top, len(resultados), facetas
+
+    def buscar(
+        self,
+        q: str,
+        categoria: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        en_stock: bool = False,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        tokens = list(dict.fromkeys(tokenizar(q)))
+        expansiones = [self.expandir(t, i == len(tokens) - 1) for i, t in enumerate(tokens)]
+        correcciones = {
+            t: max(e, key=lambda termino: len(self.postings.get(termino, ())))
+            for t, e in zip(tokens, expansiones)
+            if e and t not in e and all(f == FACTOR_TIPEO for f in e.values())
+        }
+
+        categoria_norm = normalizar(categoria) if categoria else None
+        clave = (tuple(tokens), categoria_norm, precio_min, precio_max, en_stock)
+        necesarios = offset + limit
+        cacheado = self._consultas.get(clave)
+        if cacheado is not None and (len(cacheado[0]) >= necesarios or len(cacheado[0]) >= cacheado[1]):
+            self._consultas.move_to_end(clave)
+            top, total, facetas = cacheado
+        else:
+            # Se guardan más resultados de los pedidos para servir las páginas siguientes
+            k = max(necesarios, MIN_TOP_CACHEADO, 2 * len(cacheado[0]) if cacheado else 0)
+            top, total, facetas = self._resolver(
+                clave[0], expansiones, categoria_norm, precio_min, precio_max, en_stock, k
+            )
+            self._consultas[clave] = (top, total, facetas)
+            if len(self._consultas) > MAX_CONSULTAS_CACHEADAS:
+                self._consultas.popitem(last=False)
+
+        pagina = [
+            {**self.docs[doc_id], "score": round(puntaje, 4)}
+            for doc_id, puntaje in top[offset:necesarios]
+        ]
+        facetas_categoria, facetas_precio = facetas["categorias"], facetas["precios"]
+        precios = []
+        for i, count in enumerate(facetas_precio):
+            hasta = RANGOS_PRECIO[i + 1] if i + 1 < len(RANGOS_PRECIO) else None
+            precios.append({"desde": RANGOS_PRECIO[i], "hasta": hasta, "count": count})
+
+        return {
+            "q": q,
+            "total": total,
+            "resultados": pagina,
+            "facetas": {
+                "categorias": sorted(
+                    ({"nombre": nombre, "count": count} for nombre, count in facetas_categoria.items()),
+                    key=lambda f: -f["count"]
+                ),
+                "precios": precios,
+            },
+            "correcciones": correcciones,
+            "tiempo_ms": round((time.perf_counter() - inicio) * 1000.0, 3),
+        }
+
+
+# Índice vigente; las reconstrucciones completas arman uno nuevo y lo reemplazan
+indice_productos = IndiceProductos()
+
+_build_lock = asyncio.Lock()
+_indexer_task: Optional[asyncio.Task] = None
+# Cambios recibidos mientras se reconstruye; se reaplican sobre el índice nuevo
+_pendientes: List[Tuple[str, Any]] = []
+
+_PROYECCION = {"nombre": 1, "descripcion": 1, "categoria": 1, "precio": 1, "stock": 1, "imagen_url": 1, "activo": 1}
+
+
+async def reconstruir_indice(db=None) -> IndiceProductos:
+    """Reconstruye el índice completo desde la colección de productos"""
+    global indice_productos
+    if db is None:
+        from db.database import get_database
+        db = get_database()
+    async with _build_lock:
+        inicio = time.perf_counter()
+        nuevo = IndiceProductos()
+        async for producto in db.productos.find({"activo": True}, _PROYECCION):
+            nuevo.upsert(producto)
+        for operacion, valor in _pendientes:
+            if operacion == "upsert":
+                nuevo.upsert(valor)
+            else:
+                nuevo.remove(valor)
+        _pendientes.clear()
+        nuevo.construido_en = time.time()
+        indice_productos = nuevo
+        logger.info(
+            f"Índice de búsqueda construido: {len(nuevo.docs)} productos, "
+            f"{len(nuevo.postings)} términos en {round((time.perf_counter() - inicio) * 1000.0, 1)} ms"
+        )
+        return nuevo
+
+
+async def obtener_indice(db=None) -> IndiceProductos:
+    """Índice listo para consultar (lo construye si todavía no existe)"""
+    if indice_productos.construido_en is None:
+        async with _build_lock:
+            listo = indice_productos.construido_en is not None
+        if not listo:
+            return await reconstruir_indice(db)
+    return indice_productos
+
+
+def actualizar_producto(producto: Dict[str, Any]):
+    """Actualización incremental tras un alta/edición desde el panel admin"""
+    if _build_lock.locked():
+        _pendientes.append(("upsert", producto))
+    if indice_productos.construido_en is not None:
+        indice_productos.upsert(producto)
+
+
+def quitar_producto(producto_id: str):
+    if _build_lock.locked():
+        _pendientes.append(("remove", str(producto_id)))
+    if indice_productos.construido_en is not None:
+        indice_productos.remove(producto_id)
+
+
+async def _indexer_loop(intervalo: int):
+    while True:
+        try:
+            await reconstruir_indice()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error construyendo índice de búsqueda: {e}")
+        if intervalo <= 0:
+            return
+        await asyncio.sleep(intervalo)
+
+
+def start_indexer(intervalo: Optional[int] = None) -> asyncio.Task:
+    """Construye el índice en segundo plano y lo refresca periódicamente"""
+    global _indexer_task
+    intervalo = SEARCH_INDEX_REFRESH_SECONDS if intervalo is None else intervalo
+    if _indexer_task is None or _indexer_task.done():
+        _indexer_task = asyncio.create_task(_indexer_loop(intervalo))
+    return _indexer_task
+
+
+async def stop_indexer():
+    global _indexer_task
+    task, _indexer_task = _indexer_task, None
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1 @@
+# Servicios de contratos (renovación y expiración por lotes, caché de PDFs)
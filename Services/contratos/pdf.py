@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# pdf.py - Caché en disco de los PDFs de contratos
+# =============================================================================
+# Cada descarga de /contratos/{id}/pdf armaba el documento ReportLab completo
+# dentro del event loop (cientos de ms de CPU que bloqueaban al worker) y lo
+# copiaba dos veces en memoria. Ahora:
+# - Los PDFs se guardan en CONTRACT_PDF_CACHE_DIR. La clave es un hash de todo
+#   lo que se imprime: id y campos del contrato (cualquier cambio de estado,
+#   precio o fechas genera otra clave), servicio, datos del cliente,
+#   configuración del proveedor, fecha de emisión y PDF_TEMPLATE_VERSION.
+#   El contrato no tiene updated_at: hashear los datos invalida igual y no
+#   depende de que cada escritura lo actualice.
+# - La generación corre en un pool de procesos (CONTRACT_PDF_WORKERS; 0 = en
+#   un hilo) y pedidos simultáneos del mismo PDF esperan una única generación.
+#   Los procesos se crean con forkserver/spawn: un fork del worker copiaría
+#   los hilos de monitoreo de Motor/PyMongo y podría trabar a los hijos.
+# - El router sirve el archivo con FileResponse (sendfile) y usa la clave como
+#   ETag: un If-None-Match válido responde 304 sin generar nada.
+# - Los archivos con más de CONTRACT_PDF_CACHE_MAX_AGE_DAYS se borran
+#   periódicamente (la fecha de emisión forma parte de la clave).
+# =============================================================================
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CONTRACT_PDF_CACHE_DIR = os.getenv("CONTRACT_PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "contratos_pdf")
+CONTRACT_PDF_WORKERS = int(os.getenv("CONTRACT_PDF_WORKERS", "2"))
+CONTRACT_PDF_CACHE_MAX_AGE_DAYS = float(os.getenv("CONTRACT_PDF_CACHE_MAX_AGE_DAYS", "7"))
+
+# Subir al cambiar el texto o el diseño de utils/pdf_generator.py para
+# invalidar todos los PDFs ya generados
+PDF_TEMPLATE_VERSION = "1"
+
+# Segundos mínimos entre limpiezas del directorio de caché
+LIMPIEZA_CADA = 3600
+
+_executor: Optional[ProcessPoolExecutor] = None
+_en_curso: Dict[str, asyncio.Future] = {}
+_ultima_limpieza = 0.0
+_stats = {"hits": 0, "generados": 0, "errores": 0, "generacion_total_s": 0.0}
+
+
+def clave(contract_data: Dict[str, Any], user_data: Dict[str, Any]) -> str:
+    """Hash de todos los datos que se imprimen en el PDF"""
+    contenido = json.dumps(
+        {"v": PDF_TEMPLATE_VERSION, "contrato": contract_data, "usuario": user_data},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:20]
+
+
+def etag(clave_pdf: str) -> str:
+    return f'"{clave_pdf}"'
+
+
+def _ruta(contract_data: Dict[str, Any], clave_pdf: str) -> str:
+    return os.path.join(CONTRACT_PDF_CACHE_DIR, f"{contract_data.get('id', 'contrato')}-{clave_pdf}.pdf")
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if CONTRACT_PDF_WORKERS <= 0:
+        return None
+    if _executor is None:
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(max_workers=CONTRACT_PDF_WORKERS, mp_context=multiprocessing.get_context(metodo))
+    return _executor
+
+
+async def _generar(contract_data: Dict[str, Any], user_data: Dict[str, Any], destino: str):
+    global _executor
+    from utils.pdf_generator import write_contract_pdf
+
+    executor = _get_executor()
+    if executor is None:
+        await asyncio.to_thread(write_contract_pdf, contract_data, user_data, destino)
+        return
+    try:
+        await asyncio.get_running_loop().run_in_executor(executor, write_contract_pdf, contract_data, user_data, destino)
+    except BrokenProcessPool:
+        # Un proceso del pool murió: se descarta el pool y el próximo pedido crea otro
+        if _executor is executor:
+            _executor = None
+        executor.shutdown(wait=False)
+        raise
+
+
+def _limpiar():
+    """Borra PDFs viejos y temporales huérfanos del directorio de caché"""
+    limite = time.time() - CONTRACT_PDF_CACHE_MAX_AGE_DAYS * 86400
+    try:
+        entradas = list(os.scandir(CONTRACT_PDF_CACHE_DIR))
+    except FileNotFoundError:
+        return
+    borrados = 0
+    for entrada in entradas:
+        try:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.unlink(entrada.path)
+                borrados += 1
+        except OSError:
+            pass
+    if borrados:
+        logger.info(f"Caché de PDFs de contratos: {borrados} archivos vencidos eliminados")
+
+
+def _programar_limpieza():
+    global _ultima_limpieza
+    ahora = time.monotonic()
+    if ahora - _ultima_limpieza < LIMPIEZA_CADA:
+        return
+    _ultima_limpieza = ahora
+    asyncio.get_running_loop().run_in_executor(None, _limpiar)
+
+
+async def obtener_pdf(contract_data: Dict[str, Any], user_data: Dict[str, Any], clave_pdf: Optional[str] = None) -> str:
+    """Ruta del PDF del contrato, generándolo si no está en caché"""
+    clave_pdf = clave_pdf or clave(contract_data, user_data)
+    destino = _ruta(contract_data, clave_pdf)
+    if os.path.exists(destino):
+        _stats["hits"] += 1
+        return destino
+
+    pendiente = _en_curso.get(destino)
+    if pendiente is not None:
+        try:
+            await asyncio.shield(pendiente)
+        except asyncio.CancelledError:
+            if not pendiente.cancelled():
+                raise
+            # Se canceló el pedido que generaba (no este): se vuelve a intentar
+            return await obtener_pdf(contract_data, user_data, clave_pdf)
+        return destino
+
+    futuro = asyncio.get_running_loop().create_future()
+    _en_curso[destino] = futuro
+    inicio = time.perf_counter()
+    try:
+        await _generar(contract_data, user_data, destino)
+        futuro.set_result(destino)
+    except Exception as e:
+        _stats["errores"] += 1
+        futuro.set_exception(e)
+        futuro.exception()
+        raise
+    finally:
+        # Cancelación (BaseException): los que esperan no deben quedar colgados
+        if not futuro.done():
+            futuro.cancel()
+        _en_curso.pop(destino, None)
+    _stats["generados"] += 1
+    _stats["generacion_total_s"] += time.perf_counter() - inicio
+    _programar_limpieza()
+    return destino
+
+
+def get_pdf_cache_status() -> Dict[str, Any]:
+    generados = _stats["generados"]
+    return {
+        "directorio": CONTRACT_PDF_CACHE_DIR,
+        "workers": CONTRACT_PDF_WORKERS,
+        "version_plantilla": PDF_TEMPLATE_VERSION,
+        "hits": _stats["hits"],
+        "generados": generados,
+        "errores": _stats["errores"],
+        "en_curso": len(_en_curso),
+        "generacion_promedio_s": round(_stats["generacion_total_s"] / generados, 3) if generados else 0.0,
+    }
+
+
+def shutdown():
+    """Cierra el pool de procesos (lifespan de main.py)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# renovaciones.py - Renovación automática y expiración de contratos por lotes
+# =============================================================================
+# Reemplaza el bucle de 24 h de main.check_contract_renewals, que cargaba todos
+# los contratos con to_list() y hacía Servicio.get / save() / find_one y el
+# envío de correo por cada uno. Cada corrida:
+# 1. Toma el lease "renovacion_contratos" (db/leases.py): con varios workers
+#    o instancias solo uno la ejecuta.
+# 2. Fase "renovar": contratos activos con renovación automática que vencen
+#    dentro de CONTRACT_RENEWAL_WINDOW_DAYS -> fecha_fin + EXTENSION_DAYS.
+#    Fase "expirar": contratos activos sin renovación automática ya vencidos
+#    -> estado "expirado".
+# 3. Cada fase recorre el índice (estado, fecha_fin) en lotes de
+#    CONTRACT_RENEWAL_CHUNK ordenados por (fecha_fin, _id); por lote: servicios
+#    y usuarios con un $in cada uno (db/loaders), un bulk_write de $set y los
+#    avisos encolados en la cola de correos.
+# 4. Tras cada lote persiste el checkpoint (fase + último (fecha_fin, _id)) en
+#    el documento del lease: un reinicio retoma donde quedó y una corrida del
+#    día ya terminada no se repite.
+# Los $set incluyen el valor previo en el filtro: aplicar dos veces el mismo
+# lote no renueva dos veces, y los avisos se encolan solo para los contratos
+# que, releídos tras el bulk_write, quedaron con el valor nuevo.
+# El lease excluye a otros procesos; dentro de un mismo proceso (tarea del
+# scheduler + POST /admin/renovaciones/ejecutar) lo hace _en_ejecucion, porque
+# leases.adquirir() acepta al dueño actual.
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+
+from db import leases
+from db.loaders import RequestLoaders
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre corridas; 0 deshabilita la tarea periódica (como el bucle anterior)
+CONTRACT_RENEWAL_INTERVAL_SECONDS = int(os.getenv("CONTRACT_RENEWAL_INTERVAL_SECONDS", "0"))
+CONTRACT_RENEWAL_CHUNK = int(os.getenv("CONTRACT_RENEWAL_CHUNK", "500"))
+CONTRACT_RENEWAL_LEASE_SECONDS = int(os.getenv("CONTRACT_RENEWAL_LEASE_SECONDS", "600"))
+CONTRACT_RENEWAL_WINDOW_DAYS = int(os.getenv("CONTRACT_RENEWAL_WINDOW_DAYS", "7"))
+CONTRACT_RENEWAL_EXTENSION_DAYS = int(os.getenv("CONTRACT_RENEWAL_EXTENSION_DAYS", "30"))
+
+LEASE = "renovacion_contratos"
+
+RENOVAR = "renovar"
+EXPIRAR = "expirar"
+TERMINADO = "terminado"
+
+_renewal_task: Optional[asyncio.Task] = None
+_last_result: Optional[Dict[str, Any]] = None
+_en_ejecucion = asyncio.Lock()
+
+
+def _filtro_fase(fase: str, ahora: datetime) -> Dict[str, Any]:
+    if fase == RENOVAR:
+        return {
+            "estado": "activo",
+            "renovacion_automatica": True,
+            "fecha_fin": {"$gt": ahora, "$lte": ahora + timedelta(days=CONTRACT_RENEWAL_WINDOW_DAYS)},
+        }
+    return {
+        "estado": "activo",
+        "renovacion_automatica": {"$ne": True},
+        "fecha_fin": {"$lte": ahora},
+    }
+
+
+async def _siguiente_lote(coleccion, fase: str, ahora: datetime, cursor: Optional[Tuple[datetime, Any]]) -> List[Dict[str, Any]]:
+    """Siguiente lote de la fase en orden (fecha_fin, _id), a partir del checkpoint"""
+    filtro = _filtro_fase(fase, ahora)
+    if cursor is not None:
+        fecha, ultimo_id = cursor
+        filtro = {"$and": [filtro, {"$or": [
+            {"fecha_fin": {"$gt": fecha}},
+            {"fecha_fin": fecha, "_id": {"$gt": ultimo_id}},
+        ]}]}
+    proyeccion = {"servicio_id": 1, "usuario_id": 1, "fecha_fin": 1, "precio_mensual": 1}
+    return await coleccion.find(filtro, proyeccion).sort(
+        [("fecha_fin", ASCENDING), ("_id", ASCENDING)]
+    ).limit(CONTRACT_RENEWAL_CHUNK).to_list(length=CONTRACT_RENEWAL_CHUNK)
+
+
+def _mensaje_renovacion(servicio, fecha_fin: datetime, precio_mensual) -> Tuple[str, str]:
+    asunto = f"Contrato de {servicio.nombre} renovado automáticamente"
+    mensaje = f"""
+Tu contrato para el servicio "{servicio.nombre}" ha sido renovado automáticamente.
+
+Detalles actualizados:
+- Servicio: {servicio.nombre}
+- Nueva fecha de expiración: {fecha_fin.strftime('%Y-%m-%d')}
+- Precio mensual: ${precio_mensual or 0}
+
+Si deseas cancelar la renovación automática, puedes hacerlo desde tu panel de usuario.
+
+Atentamente,
+Equipo de Servicios Profesionales
+"""
+    return asunto, mensaje
+
+
+def _mensaje_expiracion(servicio) -> Tuple[str, str]:
+    asunto = f"Contrato de {servicio.nombre} expirado"
+    mensaje = f"""
+Tu contrato para el servicio "{servicio.nombre}" ha expirado.
+
+Si deseas renovarlo, puedes crear un nuevo contrato desde nuestro sitio web.
+
+Atentamente,
+Equipo de Servicios Profesionales
+"""
+    return asunto, mensaje
+
+
+async def _procesar_lote(coleccion, fase: str, docs: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Aplica la fase a un lote: un $in por colección relacionada y un bulk_write"""
+    from models.models_beanie import Servicio, Usuario
+    from Services.mail.cola import encolar_correo
+
+    loaders = RequestLoaders()
+    servicios = await loaders.by_id(Servicio).load_many(d.get("servicio_id") for d in docs)
+    usuarios = await loaders.by_id(Usuario).load_many(d.get("usuario_id") for d in docs)
+
+    operaciones = []
+    # _id -> (valores esperados tras el $set, email, asunto, mensaje)
+    avisos: Dict[Any, Tuple[Dict[str, Any], str, str, str]] = {}
+    for doc in docs:
+        servicio = servicios.get(str(doc.get("servicio_id")))
+        if fase == RENOVAR:
+            # Sin servicio no se renueva (mismo criterio que el bucle anterior)
+            if servicio is None:
+                continue
+            nueva_fecha = doc["fecha_fin"] + timedelta(days=CONTRACT_RENEWAL_EXTENSION_DAYS)
+            operaciones.append(UpdateOne(
+                {"_id": doc["_id"], "estado": "activo", "fecha_fin": doc["fecha_fin"]},
+                {"$set": {"fecha_fin": nueva_fecha}},
+            ))
+            esperado = {"fecha_fin": nueva_fecha}
+            asunto_mensaje = _mensaje_renovacion(servicio, nueva_fecha, doc.get("precio_mensual"))
+        else:
+            operaciones.append(UpdateOne(
+                {"_id": doc["_id"], "estado": "activo"},
+                {"$set": {"estado": "expirado"}},
+            ))
+            esperado = {"estado": "expirado"}
+            asunto_mensaje = _mensaje_expiracion(servicio) if servicio is not None else None
+
+        usuario = usuarios.get(str(doc.get("usuario_id")))
+        if asunto_mensaje and usuario is not None and usuario.email:
+            avisos[doc["_id"]] = (esperado, usuario.email, *asunto_mensaje)
+
+    modificados = 0
+    if operaciones:
+        result = await coleccion.bulk_write(operaciones, ordered=False)
+        modificados = result.modified_count
+
+    # Avisar solo si el $set se aplicó (un filtro que no coincidió no cambia nada)
+    enviados = 0
+    if avisos:
+        actuales = {
+            d["_id"]: d async for d in coleccion.find(
+                {"_id": {"$in": list(avisos)}}, {"fecha_fin": 1, "estado": 1}
+            )
+        }
+        for doc_id, (esperado, email, asunto, mensaje) in avisos.items():
+            actual = actuales.get(doc_id, {})
+            if any(actual.get(campo) != valor for campo, valor in esperado.items()):
+                continue
+            try:
+                await encolar_correo(email, asunto, mensaje)
+                enviados += 1
+            except Exception as e:
+                logger.error(f"Error encolando aviso de contrato a {email}: {e}")
+    return {"evaluados": len(docs), "modificados": modificados, "avisos": enviados}
+
+
+async def ejecutar_renovaciones(now: Optional[datetime] = None, forzar: bool = False) -> Dict[str, Any]:
+    """
+    Ejecuta (o retoma) la corrida del día. Devuelve el resultado, o el motivo
+    por el que no se ejecutó (lease tomado por otro worker, corrida ya hecha).
+    `forzar` descarta el checkpoint del día y empieza de nuevo.
+    """
+    if _en_ejecucion.locked():
+        return {"ejecutado": False, "motivo": "Las renovaciones ya están en ejecución en este proceso"}
+    async with _en_ejecucion:
+        return await _ejecutar(now, forzar)
+
+
+async def _ejecutar(now: Optional[datetime], forzar: bool) -> Dict[str, Any]:
+    global _last_result
+    from models.models_beanie import Contrato
+
+    now = now or datetime.utcnow()
+    run_id = now.strftime("%Y-%m-%d")
+    lease = await leases.adquirir(LEASE, CONTRACT_RENEWAL_LEASE_SECONDS)
+    if lease is None:
+        return {"ejecutado": False, "motivo": "Otro worker está ejecutando las renovaciones"}
+
+    inicio = time.perf_counter()
+    try:
+        checkpoint = lease.get("checkpoint") or {}
+        if forzar or checkpoint.get("run_id") != run_id:
+            # Nueva corrida: la hora de referencia queda fija para poder retomarla
+            checkpoint = {
+                "run_id": run_id, "ahora": now, "fase": RENOVAR, "cursor": None,
+                "evaluados": 0, "renovados": 0, "expirados": 0, "avisos": 0,
+            }
+        elif checkpoint.get("fase") == TERMINADO:
+            return {"ejecutado": False, "motivo": f"La corrida {run_id} ya está completa", "checkpoint": checkpoint}
+        else:
+            logger.info(f"Renovaciones: retomando corrida {run_id} en fase {checkpoint['fase']}")
+
+        coleccion = Contrato.get_motor_collection()
+        procesados = 0
+        while checkpoint["fase"] != TERMINADO:
+            fase = checkpoint["fase"]
+            docs = await _siguiente_lote(coleccion, fase, checkpoint["ahora"], checkpoint["cursor"])
+            if docs:
+                resultado = await _procesar_lote(coleccion, fase, docs)
+                procesados += resultado["evaluados"]
+                checkpoint["evaluados"] += resultado["evaluados"]
+                checkpoint["renovados" if fase == RENOVAR else "expirados"] += resultado["modificados"]
+                checkpoint["avisos"] += resultado["avisos"]
+                checkpoint["cursor"] = (docs[-1]["fecha_fin"], docs[-1]["_id"])
+            if len(docs) < CONTRACT_RENEWAL_CHUNK:
+                checkpoint["fase"] = EXPIRAR if fase == RENOVAR else TERMINADO
+                checkpoint["cursor"] = None
+            if not await leases.guardar(LEASE, CONTRACT_RENEWAL_LEASE_SECONDS, checkpoint=checkpoint):
+                # El lease venció y lo tomó otro worker: él retoma desde el checkpoint
+                logger.warning("Renovaciones: se perdió el lease, se abandona la corrida")
+                return {"ejecutado": False, "motivo": "Lease perdido durante la corrida", "checkpoint": checkpoint}
+
+        duracion = time.perf_counter() - inicio
+        _last_result = {
+            "ejecutado": True,
+            "run_id": run_id,
+            "evaluados": checkpoint["evaluados"],
+            "renovados": checkpoint["renovados"],
+            "expirados": checkpoint["expirados"],
+            "avisos": checkpoint["avisos"],
+            "procesados_en_esta_ejecucion": procesados,
+            "duracion_s": round(duracion, 3),
+            "contratos_por_segundo": round(procesados / duracion, 1) if duracion > 0 else None,
+            "finalizado_en": datetime.utcnow().isoformat(),
+        }
+        logger.info(
+            f"Renovaciones {run_id}: {checkpoint['renovados']} renovados, {checkpoint['expirados']} expirados, "
+            f"{procesados} contratos en {duracion:.2f}s ({_last_result['contratos_por_segundo']}/s)"
+        )
+        await leases.guardar(LEASE, ultima_ejecucion=_last_result)
+        return _last_result
+    finally:
+        await leases.liberar(LEASE)
+
+
+async def _renewal_loop(interval: int):
+    while True:
+        try:
+            await ejecutar_renovaciones()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en renovación de contratos: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_renovaciones(interval: Optional[int] = None) -> Optional[asyncio.Task]:
+    """Lanza la tarea periódica (idempotente). None si está deshabilitada."""
+    global _renewal_task
+    interval = CONTRACT_RENEWAL_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        logger.info("Renovación automática de contratos deshabilitada (CONTRACT_RENEWAL_INTERVAL_SECONDS=0)")
+        return None
+    if _renewal_task is None or _renewal_task.done():
+        _renewal_task = asyncio.create_task(_renewal_loop(interval))
+    return _renewal_task
+
+
+async def stop_renovaciones():
+    """Cancela la tarea periódica y espera a que termine"""
+    global _renewal_task
+    task, _renewal_task = _renewal_task, None
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+async def get_renovaciones_status() -> Dict[str, Any]:
+    """Estado de la tarea, lease/checkpoint persistidos y última corrida de este proceso"""
+    lease = await leases.leer(LEASE) or {}
+    return {
+        "running": _renewal_task is not None and not _renewal_task.done(),
+        "interval_seconds": CONTRACT_RENEWAL_INTERVAL_SECONDS,
+        "lease": {"owner": lease.get("owner"), "lease_hasta": lease.get("lease_hasta")},
+        "checkpoint": lease.get("checkpoint"),
+        "ultima_ejecucion": lease.get("ultima_ejecucion") or _last_result,
+    }
@@ -0,0 +1 @@
+# Imágenes responsive (derivados por ancho y formato de static/img)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# derivados.py - Derivados responsive (ancho + WebP/AVIF) de static/img
+# =============================================================================
+# Las imágenes de static/img (héroes, ofertas, productos) pesan varios MB y se
+# mostraban tal cual incluso en móviles. Este módulo genera versiones más
+# chicas bajo demanda:
+# - Anchos normalizados (ANCHOS): un ?w= arbitrario se redondea hacia arriba al
+#   siguiente ancho de la lista, así la caché no crece con cada valor distinto.
+#   Nunca se agranda la imagen original.
+# - Formato según el Accept del navegador: AVIF > WebP > formato original.
+# - Caché en disco (IMAGE_CACHE_DIR). La clave incluye mtime y tamaño del
+#   original, por lo que reemplazar el archivo invalida sus derivados.
+# - La codificación corre en hilos, limitada por IMAGE_RESIZE_CONCURRENCY, y
+#   pedidos concurrentes del mismo derivado esperan una única generación.
+#
+# routers/admin_productos llama a `pregenerar()` al guardar un producto con una
+# imagen local para que los primeros visitantes no paguen la codificación.
+# Pillow es opcional: sin Pillow se sirve siempre el original.
+# =============================================================================
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # opcional
+    Image = None
+
+IMG_DIR = os.path.join("static", "img")
+IMG_URL = "/static/img/"
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "img_derivados")
+IMAGE_RESIZE_CONCURRENCY = int(os.getenv("IMAGE_RESIZE_CONCURRENCY", "2"))
+# Anchos que se generan al guardar un producto (el resto, al primer pedido)
+IMAGE_PREGENERATE_WIDTHS = [
+    int(w) for w in os.getenv("IMAGE_PREGENERATE_WIDTHS", "320,640,960").split(",") if w.strip()
+]
+
+# Anchos permitidos para ?w= (y para los srcset de las plantillas)
+ANCHOS = (96, 160, 320, 480, 640, 960, 1280, 1920)
+EXTENSIONES = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
+
+# formato -> (formato Pillow, extensión, media type, opciones de guardado)
+FORMATOS = {
+    "avif": ("AVIF", ".avif", "image/avif", {"quality": 55, "speed": 8}),
+    "webp": ("WEBP", ".webp", "image/webp", {"quality": 78, "method": 4}),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    "png": ("PNG", ".png", "image/png", {"optimize": True}),
+}
+
+_semaforo: Optional[asyncio.Semaphore] = None
+_en_curso: Dict[str, asyncio.Future] = {}
+_tareas: Set[asyncio.Task] = set()
+
+
+def disponible() -> bool:
+    return Image is not None
+
+
+def formatos_soportados() -> Set[str]:
+    if Image is None:
+        return set()
+    soportados = {"jpeg", "png"}
+    if features.check("webp"):
+        soportados.add("webp")
+    if features.check("avif"):
+        soportados.add("avif")
+    return soportados
+
+
+def normalizar_ancho(ancho: int) -> int:
+    """Primer ancho de ANCHOS >= al pedido (o el mayor)"""
+    for candidato in ANCHOS:
+        if candidato >= ancho:
+            return candidato
+    return ANCHOS[-1]
+
+
+def ruta_original(nombre: str) -> Optional[str]:
+    """Ruta en disco de static/img/<nombre>; None si no existe o sale del directorio"""
+    base = os.path.realpath(IMG_DIR)
+    ruta = os.path.realpath(os.path.join(base, nombre))
+    if os.path.commonpath([base, ruta]) != base or not os.path.isfile(ruta):
+        return None
+    return ruta
+
+
+def nombre_desde_url(url: Optional[str]) -> Optional[str]:
+    """'/static/img/a/b.png?x' -> 'a/b.png' (solo imágenes locales de static/img)"""
+    if not url or not url.startswith(IMG_URL):
+        return None
+    nombre = url[len(IMG_URL):].split("?", 1)[0]
+    return nombre if os.path.splitext(nombre)[1].lower() in EXTENSIONES else None
+
+
+def elegir_formato(accept: str, ruta: str, pedido: Optional[str] = None) -> str:
+    """Formato de salida: el pedido (?format=) o el mejor que acepte el navegador"""
+    soportados = formatos_soportados()
+    if pedido in soportados:
+        return pedido
+    accept = accept or ""
+    for formato in ("avif", "webp"):
+        if formato in soportados and f"image/{formato}" in accept:
+            return formato
+    return "png" if os.path.splitext(ruta)[1].lower() in (".png", ".gif") else "jpeg"
+
+
+def media_type(formato: str) -> str:
+    return FORMATOS[formato][2]
+
+
+def _ruta_derivado(ruta: str, ancho: int, formato: str) -> str:
+    stat = os.stat(ruta)
+    clave = f"{ruta}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8")
+    digest = hashlib.sha1(clave).hexdigest()[:16]
+    return os.path.join(IMAGE_CACHE_DIR, f"{digest}-{ancho}{FORMATOS[formato][1]}")
+
+
+def _generar(ruta: str, ancho: int, formato: str, destino: str):
+    pil_formato, _, _, opciones = FORMATOS[formato]
+    with Image.open(ruta) as original:
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.width > ancho:
+            alto = max(1, round(imagen.height * ancho / imagen.width))
+            imagen = imagen.resize((ancho, alto), Image.LANCZOS)
+        if formato == "jpeg" and imagen.mode not in ("RGB", "L"):
+            imagen = imagen.convert("RGB")
+        elif imagen.mode not in ("RGB", "RGBA", "L", "LA"):
+            imagen = imagen.convert("RGBA")
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        # Escritura atómica: otro worker puede estar leyendo el mismo derivado
+        fd, temporal = tempfile.mkstemp(dir=IMAGE_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                imagen.save(f, pil_formato, **opciones)
+            os.replace(temporal, destino)
+        except Exception:
+            os.unlink(temporal)
+            raise
+
+
+async def obtener_derivado(ruta: str, ancho: int, formato: str) -> Tuple[str, str]:
+    """Ruta del derivado (generándolo si falta) y su media type"""
+    global _semaforo
+    ancho = normalizar_ancho(ancho)
+    destino = _ruta_derivado(ruta, ancho, formato)
+    if os.path.exists(destino):
+        return destino, media_type(formato)
+
+    pendiente = _en_curso.get(destino)
+    if pendiente is not None:
+        try:
+            await asyncio.shield(pendiente)
+        except asyncio.CancelledError:
+            if not pendiente.cancelled():
+                raise
+            # Se canceló el pedido que generaba (no este): se vuelve a intentar
+            return await obtener_derivado(ruta, ancho, formato)
+        return destino, media_type(formato)
+
+    futuro = asyncio.get_running_loop().create_future()
+    _en_curso[destino] = futuro
+    try:
+        if _semaforo is None:
+            _semaforo = asyncio.Semaphore(IMAGE_RESIZE_CONCURRENCY)
+        async with _semaforo:
+            await asyncio.to_thread(_generar, ruta, ancho, formato, destino)
+        futuro.set_result(destino)
+    except Exception as e:
+        futuro.set_exception(e)
+        futuro.exception()
+        raise
+    finally:
+        # Cancelación (BaseException): los que esperan no deben quedar colgados
+        if not futuro.done():
+            futuro.cancel()
+        _en_curso.pop(destino, None)
+    return destino, media_type(formato)
+
+
+async def _pregenerar(ruta: str):
+    for formato in ("webp", "avif"):
+        if formato not in formatos_soportados():
+            continue
+        for ancho in IMAGE_PREGENERATE_WIDTHS:
+            try:
+                await obtener_derivado(ruta, ancho, formato)
+            except Exception as e:
+                logger.warning(f"No se pudo generar {formato} {ancho}px de {ruta}: {e}")
+                return
+
+
+def pregenerar(imagen_url: Optional[str]) -> Optional[asyncio.Task]:
+    """Genera en segundo plano los derivados habituales de una imagen local"""
+    if Image is None:
+        return None
+    nombre = nombre_desde_url(imagen_url)
+    ruta = ruta_original(nombre) if nombre else None
+    if ruta is None:
+        return None
+    tarea = asyncio.create_task(_pregenerar(ruta))
+    _tareas.add(tarea)
+    tarea.add_done_callback(_tareas.discard)
+    return tarea
+
+
+def srcset(url: Optional[str], anchos=(320, 640, 960, 1280)) -> str:
+    """Atributo srcset con derivados ?w= para imágenes de static/img ("" si no aplica)"""
+    if nombre_desde_url(url) is None:
+        return ""
+    base = url.split("?", 1)[0]
+    return ", ".join(f"{base}?w={ancho} {ancho}w" for ancho in anchos)
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# cola.py - Cola persistente de correos salientes con worker de envío
+# =============================================================================
+# enviar_correo abre una conexión SMTP nueva por mensaje y es bloqueante: las
+# rutas async que lo llamaban detenían el event loop durante todo el handshake.
+# Ahora:
+# - Los handlers solo encolan (`await encolar_correo(...)`): un insert en la
+#   colección `cola_correos` con el mensaje MIME ya armado.
+# - Un worker de fondo reclama lotes de hasta MAIL_QUEUE_BATCH_SIZE mensajes
+#   (con un lease que vence, así varios procesos pueden compartir la cola y
+#   un worker caído no deja mensajes tomados para siempre).
+# - Los envía por una sesión SMTP persistente en un hilo dedicado: se reutiliza
+#   entre lotes, se verifica con NOOP tras un rato sin uso, se renueva cada
+#   MAIL_SMTP_MAX_MESSAGES_PER_CONNECTION mensajes y se cierra al quedar ociosa.
+# - Reintentos con backoff exponencial. Los rechazos permanentes (5xx del
+#   servidor para ese mensaje) o agotar MAIL_QUEUE_MAX_ATTEMPTS lo dejan
+#   como "fallido".
+# - Los enviados se borran solos a los MAIL_QUEUE_RETENTION_DAYS (índice TTL).
+# El estado de la cola (profundidad por estado, antigüedad del pendiente más
+# viejo y métricas del worker) está en get_cola_status().
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MAIL_QUEUE_BATCH_SIZE = int(os.getenv("MAIL_QUEUE_BATCH_SIZE", "20"))
+MAIL_QUEUE_POLL_SECONDS = float(os.getenv("MAIL_QUEUE_POLL_SECONDS", "5"))
+MAIL_QUEUE_LEASE_SECONDS = int(os.getenv("MAIL_QUEUE_LEASE_SECONDS", "300"))
+MAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv("MAIL_QUEUE_MAX_ATTEMPTS", "6"))
+MAIL_QUEUE_RETRY_BASE_SECONDS = int(os.getenv("MAIL_QUEUE_RETRY_BASE_SECONDS", "30"))
+MAIL_QUEUE_RETRY_MAX_SECONDS = int(os.getenv("MAIL_QUEUE_RETRY_MAX_SECONDS", "3600"))
+MAIL_QUEUE_RETENTION_DAYS = int(os.getenv("MAIL_QUEUE_RETENTION_DAYS", "7"))
+MAIL_SMTP_IDLE_SECONDS = int(os.getenv("MAIL_SMTP_IDLE_SECONDS", "60"))
+MAIL_SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("MAIL_SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+
+COLECCION = "cola_correos"
+
+PENDIENTE = "pendiente"
+ENVIANDO = "enviando"
+ENVIADO = "enviado"
+FALLIDO = "fallido"
+
+# Identifica el proceso que tomó cada lote (diagnóstico)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_worker_task: Optional[asyncio.Task] = None
+_despertar: Optional[asyncio.Event] = None
+# Un solo hilo: la sesión SMTP no es thread-safe y los envíos son secuenciales
+_executor: Optional[ThreadPoolExecutor] = None
+_indices_creados = False
+
+_metricas: Dict[str, Any] = {
+    "encolados": 0,
+    "enviados": 0,
+    "reintentos": 0,
+    "fallidos": 0,
+    "lotes": 0,
+    "ultimo_error": None,
+    "ultimo_envio": None,
+}
+
+
+def _get_db():
+    from db.database import get_database
+    return get_database()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+    return _executor
+
+
+class SesionSMTP:
+    """
+    Conexión SMTP reutilizable entre envíos. No es thread-safe: cada sesión la
+    usa un solo hilo a la vez (el del worker de la cola, o uno por conexión en
+    los envíos masivos).
+    """
+
+    def __init__(self, max_mensajes: int = MAIL_SMTP_MAX_MESSAGES_PER_CONNECTION,
+                 conectar: Optional[Callable[[], Any]] = None):
+        self.max_mensajes = max_mensajes
+        self._conectar_fn = conectar
+        self._server = None
+        self._mensajes = 0
+        self._ultimo_uso = 0.0
+        self.conexiones = 0
+
+    @property
+    def abierta(self) -> bool:
+        return self._server is not None
+
+    @property
+    def inactiva_hace(self) -> float:
+        return time.monotonic() - self._ultimo_uso
+
+    def _viva(self) -> bool:
+        if self._server is None:
+            return False
+        if self.inactiva_hace > 30:
+            # El servidor puede haber cerrado una conexión ociosa
+            try:
+                return self._server.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                self.cerrar()
+                return False
+        return True
+
+    def _conectar(self):
+        self.cerrar()
+        if self._conectar_fn is None:
+            from Services.mail.mail import abrir_conexion_smtp
+            self._conectar_fn = abrir_conexion_smtp
+        self._server = self._conectar_fn()
+        self._mensajes = 0
+        self.conexiones += 1
+
+    def enviar(self, remitente: str, destinatario: str, contenido: str):
+        if self._mensajes >= self.max_mensajes:
+            self.cerrar()
+        if not self._viva():
+            self._conectar()
+        try:
+            self._server.sendmail(remitente, destinatario, contenido)
+        except smtplib.SMTPServerDisconnected:
+            # Conexión cortada entre mensajes: se reintenta una vez con una nueva
+            self._conectar()
+            self._server.sendmail(remitente, destinatario, contenido)
+        self._mensajes += 1
+        self._ultimo_uso = time.monotonic()
+
+    def cerrar(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+_sesion = SesionSMTP()
+
+
+def es_permanente(error: Exception) -> bool:
+    """Rechazo definitivo de ESTE mensaje (reintentarlo no cambia el resultado)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # Los 4xx (450/451 greylisting, buzón ocupado) son temporales: se reintentan
+        codigos = [codigo for codigo, _ in error.recipients.values()]
+        return bool(codigos) and all(codigo >= 500 for codigo in codigos)
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+
+def _enviar_lote(lote: List[Dict[str, Any]]) -> List[Tuple[Any, Optional[Exception], bool]]:
+    """
+    Envía el lote por la sesión persistente (corre en el hilo del worker).
+    Devuelve (id, error, intentado) por mensaje. Ante un error de conexión o
+    de autenticación se corta el lote: los restantes quedan sin intentar.
+    """
+    resultados = []
+    for i, doc in enumerate(lote):
+        try:
+            _sesion.enviar(doc["remitente"], doc["destinatario"], doc["contenido"])
+            resultados.append((doc["_id"], None, True))
+        except Exception as e:
+            resultados.append((doc["_id"], e, True))
+            # Un rechazo del destinatario (aun temporal) no invalida la conexión
+            if not es_permanente(e) and not isinstance(e, smtplib.SMTPRecipientsRefused):
+                _sesion.cerrar()
+                resultados.extend((otro["_id"], e, False) for otro in lote[i + 1:])
+                break
+    return resultados
+
+
+def _backoff(intentos: int) -> float:
+    espera = min(MAIL_QUEUE_RETRY_MAX_SECONDS, MAIL_QUEUE_RETRY_BASE_SECONDS * 2 ** max(0, intentos - 1))
+    return espera * random.uniform(0.8, 1.2)
+
+
+async def asegurar_indices(db=None):
+    """Índices de la cola (idempotente)"""
+    global _indices_creados
+    if _indices_creados:
+        return
+    db = db if db is not None else _get_db()
+    coleccion = db[COLECCION]
+    await coleccion.create_index([("estado", ASCENDING), ("proximo_intento", ASCENDING)])
+    await coleccion.create_index([("estado", ASCENDING), ("lease_hasta", ASCENDING)])
+    await coleccion.create_index("enviado_en", expireAfterSeconds=MAIL_QUEUE_RETENTION_DAYS * 86400)
+    _indices_creados = True
+
+
+async def encolar_mensaje(destinatario: str, asunto: str, msg, remitente: Optional[str] = None) -> Optional[str]:
+    """Encola un mensaje MIME ya armado. Devuelve el id del documento (None si el correo no está configurado)."""
+    from Services.mail.mail import MAIL_CONFIG_OK, MAIL_FROM
+    if not MAIL_CONFIG_OK:
+        logger.warning(f"Correo no configurado; no se encola el mensaje a {destinatario}: {asunto}")
+        return None
+    now = datetime.utcnow()
+    result = await _get_db()[COLECCION].insert_one({
+        "destinatario": destinatario,
+        "asunto": asunto,
+        "remitente": remitente or MAIL_FROM,
+        "contenido": msg.as_string(),
+        "estado": PENDIENTE,
+        "intentos": 0,
+        "proximo_intento": now,
+        "creado_en": now,
+    })
+    _metricas["encolados"] += 1
+    if _despertar is not None:
+        _despertar.set()
+    return str(result.inserted_id)
+
+
+async def encolar_correo(destinatario: str, asunto: str, mensaje: str) -> Optional[str]:
+    """Equivalente no bloqueante de enviar_correo: solo encola (un insert)"""
+    from Services.mail.mail import construir_mensaje
+    return await encolar_mensaje(destinatario, asunto, construir_mensaje(destinatario, asunto, mensaje))
+
+
+async def encolar_correo_con_adjuntos(destinatario: str, asunto: str, mensaje: str, rutas_archivos: List[str]) -> Optional[str]:
+    """Encola un correo con adjuntos (los archivos se leen ahora y pueden borrarse al volver)"""
+    from Services.mail.mail import construir_mensaje_con_adjuntos
+    msg = await asyncio.to_thread(construir_mensaje_con_adjuntos, destinatario, asunto, mensaje, rutas_archivos)
+    return await encolar_mensaje(destinatario, asunto, msg)
+
+
+async def _reclamar_lote(db) -> List[Dict[str, Any]]:
+    """Toma hasta MAIL_QUEUE_BATCH_SIZE mensajes listos (o con el lease vencido)"""
+    now = datetime.utcnow()
+    lote = []
+    for _ in range(MAIL_QUEUE_BATCH_SIZE):
+        doc = await db[COLECCION].find_one_and_update(
+            {"$or": [
+                {"estado": PENDIENTE, "proximo_intento": {"$lte": now}},
+                {"estado": ENVIANDO, "lease_hasta": {"$lt": now}},
+            ]},
+            {"$set": {
+                "estado": ENVIANDO,
+                "lease_hasta": now + timedelta(seconds=MAIL_QUEUE_LEASE_SECONDS),
+                "worker": WORKER_ID,
+            }},
+            sort=[("proximo_intento", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            break
+        lote.append(doc)
+    return lote
+
+
+async def _registrar_resultados(db, lote: List[Dict[str, Any]], resultados):
+    now = datetime.utcnow()
+    intentos_previos = {doc["_id"]: doc.get("intentos", 0) for doc in lote}
+    operaciones = []
+    for doc_id, error, intentado in resultados:
+        filtro = {"_id": doc_id, "worker": WORKER_ID, "estado": ENVIANDO}
+        if error is None:
+            _metricas["enviados"] += 1
+            operaciones.append(UpdateOne(filtro, {
+                "$set": {"estado": ENVIADO, "enviado_en": now},
+                "$inc": {"intentos": 1},
+                "$unset": {"lease_hasta": "", "ultimo_error": ""},
+            }))
+            continue
+
+        intentos = intentos_previos[doc_id] + (1 if intentado else 0)
+        mensaje_error = f"{type(error).__name__}: {error}"[:500]
+        _metricas["ultimo_error"] = mensaje_error
+        if es_permanente(error) or intentos >= MAIL_QUEUE_MAX_ATTEMPTS:
+            _metricas["fallidos"] += 1
+            estado = {"estado": FALLIDO, "fallido_en": now}
+            logger.error(f"Correo {doc_id} descartado tras {intentos} intentos: {mensaje_error}")
+        else:
+            _metricas["reintentos"] += 1
+            estado = {"estado": PENDIENTE, "proximo_intento": now + timedelta(seconds=_backoff(intentos))}
+        operaciones.append(UpdateOne(filtro, {
+            "$set": {**estado, "intentos": intentos, "ultimo_error": mensaje_error},
+            "$unset": {"lease_hasta": ""},
+        }))
+    if operaciones:
+        await db[COLECCION].bulk_write(operaciones, ordered=False)
+
+
+async def procesar_lote(db=None) -> int:
+    """Reclama y envía un lote. Devuelve cuántos mensajes se tomaron."""
+    db = db if db is not None else _get_db()
+    lote = await _reclamar_lote(db)
+    if not lote:
+        return 0
+    resultados = await asyncio.get_running_loop().run_in_executor(_get_executor(), _enviar_lote, lote)
+    await _registrar_resultados(db, lote, resultados)
+    _metricas["lotes"] += 1
+    _metricas["ultimo_envio"] = datetime.utcnow().isoformat()
+    return len(lote)
+
+
+async def _worker_loop():
+    db = _get_db()
+    await asegurar_indices(db)
+    while True:
+        try:
+            if await procesar_lote(db):
+                continue
+            # Sin trabajo: liberar la conexión ociosa y esperar un encolado local
+            # (o el próximo sondeo, para mensajes encolados por otros procesos)
+            if _sesion.abierta and _sesion.inactiva_hace > MAIL_SMTP_IDLE_SECONDS:
+                await asyncio.get_running_loop().run_in_executor(_get_executor(), _sesion.cerrar)
+            _despertar.clear()
+            try:
+                await asyncio.wait_for(_despertar.wait(), timeout=MAIL_QUEUE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _metricas["ultimo_error"] = str(e)
+            logger.error(f"Error en worker de la cola de correos: {e}")
+            await asyncio.sleep(MAIL_QUEUE_POLL_SECONDS)
+
+
+def start_mail_worker() -> Optional[asyncio.Task]:
+    """Lanza el worker de la cola (idempotente). None si el correo no está configurado."""
+    global _worker_task, _despertar
+    from Services.mail.mail import MAIL_CONFIG_OK
+    if not MAIL_CONFIG_OK:
+        logger.info("Cola de correos sin worker: configuración SMTP incompleta")
+        return None
+    if _despertar is None:
+        _despertar = asyncio.Event()
+    if _worker_task is None or _worker_task.done():
+        _worker_task = asyncio.create_task(_worker_loop())
+    return _worker_task
+
+
+async def stop_mail_worker():
+    """Cancela el worker y cierra la sesión SMTP"""
+    global _worker_task, _executor
+    task, _worker_task = _worker_task, None
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if _executor is not None:
+        await asyncio.get_running_loop().run_in_executor(_executor, _sesion.cerrar)
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def get_cola_status(db=None) -> Dict[str, Any]:
+    """Profundidad de la cola por estado, antigüedad del pendiente más viejo y métricas del worker"""
+    db = db if db is not None else _get_db()
+    conteos = {PENDIENTE: 0, ENVIANDO: 0, ENVIADO: 0, FALLIDO: 0}
+    async for row in db[COLECCION].aggregate([{"$group": {"_id": "$estado", "count": {"$sum": 1}}}]):
+        conteos[row["_id"]] = row["count"]
+    mas_viejo = await db[COLECCION].find_one(
+        {"estado": PENDIENTE}, {"creado_en": 1}, sort=[("creado_en", ASCENDING)]
+    )
+    return {
+        "running": _worker_task is not None and not _worker_task.done(),
+        "worker": WORKER_ID,
+        "depth": conteos[PENDIENTE] + conteos[ENVIANDO],
+        "por_estado": conteos,
+        "pendiente_mas_viejo_segundos": (
+            round((datetime.utcnow() - mas_viejo["creado_en"]).total_seconds(), 1) if mas_viejo else None
+        ),
+        "smtp": {"abierta": _sesion.abierta, "conexiones": _sesion.conexiones},
+        "metricas": dict(_metricas),
+    }
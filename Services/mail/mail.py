@@ -85,16 +85,42 @@ async def enviar_correo_route(request: EmailRequest):
     destinatario = validar_email(request.destinatario)
     if not destinatario:
         raise HTTPException(status_code=400, detail="Correo electrónico inválido")
-    # Enviar el correo
+    # Encolar el correo (lo envía el worker de Services/mail/cola.py)
     try:
-        enviar_correo(destinatario, request.asunto, request.mensaje)
-        return {'mensaje': "Correo enviado exitosamente"}
+        from Services.mail.cola import encolar_correo
+        await encolar_correo(destinatario, request.asunto, request.mensaje)
+        return {'mensaje': "Correo encolado para envío"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al enviar el correo: {str(e)}")
     
+def abrir_conexion_smtp():
+    """
+    Abre y autentica una conexión SMTP con la configuración del .env.
+    La cola de correos (Services/mail/cola.py) la mantiene abierta entre envíos.
+    """
+    if SMTP_USE_SSL:
+        server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
+    else:
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+        if SMTP_USE_TLS:
+            server.starttls()
+    server.login(USERNAME, PASSWORD)
+    return server
+
+def construir_mensaje(destinatario, asunto, mensaje):
+    """Mensaje HTML simple (sin adjuntos) listo para enviar"""
+    # Para emails simples, usar MIMEText con HTML para mejor compatibilidad
+    html_message = mensaje.replace('\n', '<br>')
+    msg = MIMEText(f'<html><body><pre style="font-family: Arial, sans-serif; white-space: pre-wrap;">{html_message}</pre></body></html>', 'html', 'utf-8')
+    msg['From'] = MAIL_FROM
+    msg['To'] = destinatario
+    msg['Subject'] = Header(asunto, 'utf-8')
+    return msg
+
 def enviar_correo(destinatario, asunto, mensaje):
     """
     Envía un correo electrónico simple sin adjuntos.
+    Bloqueante: desde rutas async usar `await encolar_correo(...)` (Services/mail/cola.py).
     
     Args:
         destinatario: Dirección de correo del destinatario
@@ -109,24 +135,11 @@ def enviar_correo(destinatario, asunto, mensaje):
         print(f"⚠️  Correo deshabilitado. Se habría enviado a {destinatario}: {asunto}")
         return
         
-    # Para emails simples, usar MIMEText con HTML para mejor compatibilidad
-    html_message = mensaje.replace('\n', '<br>')
-    msg = MIMEText(f'<html><body><pre style="font-family: Arial, sans-serif; white-space: pre-wrap;">{html_message}</pre></body></html>', 'html', 'utf-8')
-    msg['From'] = MAIL_FROM
-    msg['To'] = destinatario
-    msg['Subject'] = Header(asunto, 'utf-8')
+    msg = construir_mensaje(destinatario, asunto, mensaje)
     
     try:
-        # Configurar el servidor SMTP
-        if SMTP_USE_SSL:
-            server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
-        else:
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            if SMTP_USE_TLS:
-                server.starttls()
-        
         # Autenticar y enviar
-        server.login(USERNAME, PASSWORD)
+        server = abrir_conexion_smtp()
         text = msg.as_string()
         server.sendmail(MAIL_FROM, destinatario, text)
         server.quit()
@@ -222,22 +235,9 @@ def enviar_email_con_adjuntos_simple(destinatario: str, asunto: str, mensaje: st
     except Exception as e:
         raise Exception(f"Error al enviar correo con adjuntos: {str(e)}")
 
-def enviar_email_con_adjunto(destinatario, asunto, mensaje, rutas_archivos):
-    """
-    Envía un correo electrónico con archivos adjuntos.
-    
-    Args:
-        destinatario: Dirección de correo del destinatario
-        asunto: Asunto del correo
-        mensaje: Cuerpo del mensaje
-        rutas_archivos: Lista de rutas a los archivos que se adjuntarán
-    
-    Returns:
-        None
-    
-    Raises:
-        Exception: Si ocurre algún error durante el envío
-    """    # Crear el mensaje
+def construir_mensaje_con_adjuntos(destinatario, asunto, mensaje, rutas_archivos):
+    """Mensaje MIME con los archivos adjuntos (se leen del disco al construirlo)"""
+    # Crear el mensaje
     msg = MIMEMultipart()
     msg['From'] = f"{MAIL_FROM_NAME} <{MAIL_FROM}>" if MAIL_FROM_NAME else MAIL_FROM
     msg['To'] = destinatario
@@ -268,19 +268,30 @@ def enviar_email_con_adjunto(destinatario, asunto, mensaje, rutas_archivos):
             
             # Agregar el archivo adjunto al mensaje
             msg.attach(part)
+    return msg
+
+def enviar_email_con_adjunto(destinatario, asunto, mensaje, rutas_archivos):
+    """
+    Envía un correo electrónico con archivos adjuntos.
+    
+    Args:
+        destinatario: Dirección de correo del destinatario
+        asunto: Asunto del correo
+        mensaje: Cuerpo del mensaje
+        rutas_archivos: Lista de rutas a los archivos que se adjuntarán
+    
+    Returns:
+        None
+    
+    Raises:
+        Exception: Si ocurre algún error durante el envío
+    """
+    msg = construir_mensaje_con_adjuntos(destinatario, asunto, mensaje, rutas_archivos)
     
     # Enviar el correo
     try:
-        # Configurar el servidor SMTP
-        if SMTP_USE_SSL:
-            server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
-        else:
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            if SMTP_USE_TLS:
-                server.starttls()
-        
         # Autenticar y enviar
-        server.login(USERNAME, PASSWORD)
+        server = abrir_conexion_smtp()
         text = msg.as_string()
         server.sendmail(MAIL_FROM, destinatario, text)
         server.quit()
@@ -313,15 +324,16 @@ async def enviar_email_con_adjunto_route(request: EmailConAdjuntoRequest):
             detail=f"Los siguientes archivos no fueron encontrados: {', '.join(archivos_no_encontrados)}"
         )
     
-    # Enviar el correo con los adjuntos
+    # Encolar el correo con los adjuntos
     try:
-        enviar_email_con_adjunto(
+        from Services.mail.cola import encolar_correo_con_adjuntos
+        await encolar_correo_con_adjuntos(
             destinatario, 
             request.asunto, 
             request.mensaje, 
             request.rutas_archivos
         )
-        return {'mensaje': "Correo con archivos adjuntos enviado exitosamente"}
+        return {'mensaje': "Correo con archivos adjuntos encolado para envío"}
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -364,20 +376,21 @@ async def enviar_email_con_adjunto_upload(
             # Añadir la ruta a la lista
             rutas_temporales.append(nombre_temporal)
         
-        # Enviar el correo con los archivos adjuntos
-        enviar_email_con_adjunto(
+        # Encolar el correo (los adjuntos quedan dentro del mensaje encolado)
+        from Services.mail.cola import encolar_correo_con_adjuntos
+        await encolar_correo_con_adjuntos(
             destinatario_valido, 
             asunto, 
             mensaje, 
             rutas_temporales
         )
         
-        # Eliminar los archivos temporales después de enviar el correo
+        # Eliminar los archivos temporales después de encolar el correo
         for ruta in rutas_temporales:
             if os.path.exists(ruta):
                 os.remove(ruta)
         
-        return {'mensaje': "Correo con archivos adjuntos enviado exitosamente"}
+        return {'mensaje': "Correo con archivos adjuntos encolado para envío"}
     
     except Exception as e:
         # Asegurarse de limpiar los archivos temporales en caso de error
@@ -400,7 +413,6 @@ async def enviar_correo_presupuesto(presupuesto_detalles: dict):
     Args:
         presupuesto_detalles: Diccionario con los detalles del presupuesto
     """
-    import asyncio
     logger = logging.getLogger(__name__)
     
     try:
@@ -443,85 +455,42 @@ Equipo de Ventas
 Tu Tienda Online
 """
 
-        # Enviar el correo de forma asíncrona usando asyncio.to_thread()
-        await asyncio.to_thread(enviar_email_simple, destinatario, asunto, mensaje)
-        logger.info(f"Correo de presupuesto enviado exitosamente a {destinatario}")
+        # Encolar el correo (lo envía el worker de Services/mail/cola.py)
+        if not validar_email(destinatario or ""):
+            raise ValueError("Correo electrónico inválido")
+        from Services.mail.cola import encolar_correo
+        await encolar_correo(destinatario, asunto, mensaje)
+        logger.info(f"Correo de presupuesto encolado para {destinatario}")
 
     except Exception as e:
         logger.error(f"Error enviando correo de presupuesto: {e}")
         raise e
 
-async def enviar_multiples_emails(emails_lista: list):
+async def enviar_multiples_emails(emails_lista: list, al_progreso=None):
     """
-    Envía múltiples emails de forma concurrente
+    Envía múltiples emails con concurrencia acotada (Services/mail/masivo.py):
+    pocas conexiones SMTP reutilizadas y un límite de mensajes por segundo.
 
     Args:
         emails_lista: Lista de diccionarios con 'destinatario', 'asunto', 'mensaje'
+        al_progreso: Callback opcional (sync o async) que recibe el progreso parcial
 
     Returns:
         dict: Resultado del envío con success, enviados, total, tiempo_total, errores
+        y el detalle de los destinatarios fallidos
     """
-    import asyncio
-    import time
+    from Services.mail.masivo import enviar_masivo
     logger = logging.getLogger(__name__)
     
-    start_time = time.time()
-    total = len(emails_lista)
-    enviados = 0
-    errores = 0
-
     try:
-        # Enviar emails de forma concurrente
-        tasks = []
-        for email_data in emails_lista:
-            task = asyncio.create_task(_enviar_email_async(email_data))
-            tasks.append(task)
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for result in results:
-            if isinstance(result, Exception):
-                errores += 1
-                logger.error(f"Error enviando email: {result}")
-            else:
-                enviados += 1
-
-        tiempo_total = time.time() - start_time
-
-        return {
-            "success": errores == 0,
-            "enviados": enviados,
-            "total": total,
-            "tiempo_total": tiempo_total,
-            "errores": errores
-        }
-
+        return await enviar_masivo(emails_lista, al_progreso=al_progreso)
     except Exception as e:
         logger.error(f"Error en enviar_multiples_emails: {e}")
         return {
             "success": False,
             "enviados": 0,
-            "total": total,
-            "tiempo_total": time.time() - start_time,
-            "errores": total
+            "total": len(emails_lista),
+            "tiempo_total": 0.0,
+            "errores": len(emails_lista),
+            "fallidos": [],
         }
-
-async def _enviar_email_async(email_data: dict):
-    """
-    Función auxiliar para enviar un email de forma asíncrona
-    """
-    logger = logging.getLogger(__name__)
-    
-    try:
-        destinatario = email_data.get('destinatario')
-        asunto = email_data.get('asunto')
-        mensaje = email_data.get('mensaje')
-
-        if not all([destinatario, asunto, mensaje]):
-            raise ValueError("Faltan datos requeridos: destinatario, asunto, mensaje")
-
-        enviar_email_simple(destinatario, asunto, mensaje)
-
-    except Exception as e:
-        logger.error(f"Error enviando email a {email_data.get('destinatario')}: {e}")
-        raise e
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# masivo.py - Envío masivo de correos con concurrencia acotada
+# =============================================================================
+# enviar_multiples_emails lanzaba una tarea por destinatario con un gather sin
+# límite, y cada tarea abría su propia conexión SMTP: una campaña de 10.000
+# destinatarios abría 10.000 conexiones simultáneas. Ahora:
+# - Hasta MAIL_BULK_CONCURRENCY conexiones en paralelo. Cada una es una
+#   SesionSMTP (Services/mail/cola.py) que envía muchos mensajes por sesión
+#   (sendmail sucesivos) y se renueva cada MAIL_BULK_MESSAGES_PER_CONNECTION.
+# - Límite global de MAIL_BULK_RATE_PER_SECOND mensajes por segundo (cuota
+#   del proveedor; 0 = sin límite).
+# - Errores transitorios de SMTP/red: hasta MAIL_BULK_MAX_ATTEMPTS intentos
+#   con backoff; rechazos permanentes (5xx) y errores que no son de SMTP ni de
+#   red no se reintentan.
+# - Sin configuración de correo (MAIL_CONFIG_OK / MAIL_FROM) no se abre
+#   ninguna conexión: todos los destinatarios se informan como fallidos.
+# - Informe de progreso (callback `al_progreso`) y resultado final con el
+#   detalle de los destinatarios fallidos.
+# `conectar` permite apuntar a otro servidor (p. ej. un aiosmtpd local en
+# pruebas) sin tocar la configuración SMTP del .env.
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union
+
+from Services.mail.cola import SesionSMTP, es_permanente
+
+logger = logging.getLogger(__name__)
+
+MAIL_BULK_CONCURRENCY = int(os.getenv("MAIL_BULK_CONCURRENCY", "4"))
+MAIL_BULK_RATE_PER_SECOND = float(os.getenv("MAIL_BULK_RATE_PER_SECOND", "10"))
+MAIL_BULK_MESSAGES_PER_CONNECTION = int(os.getenv("MAIL_BULK_MESSAGES_PER_CONNECTION", "100"))
+MAIL_BULK_MAX_ATTEMPTS = int(os.getenv("MAIL_BULK_MAX_ATTEMPTS", "3"))
+MAIL_BULK_RETRY_SECONDS = float(os.getenv("MAIL_BULK_RETRY_SECONDS", "2"))
+
+# Cada cuántos mensajes procesados se informa el progreso
+PROGRESO_CADA = 50
+
+
+class LimitadorTasa:
+    """Token bucket asíncrono: como máximo `por_segundo` adquisiciones por segundo"""
+
+    def __init__(self, por_segundo: float, rafaga: Optional[int] = None):
+        self.por_segundo = por_segundo
+        self.capacidad = float(rafaga or max(1, int(por_segundo)))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self):
+        if self.por_segundo <= 0:
+            return
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.por_segundo)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.por_segundo)
+
+
+def _preparar(email_data: Dict[str, Any]):
+    """(destinatario, remitente, contenido) o ValueError si faltan datos"""
+    from Services.mail.mail import MAIL_FROM, construir_mensaje, validar_email
+    destinatario = email_data.get('destinatario')
+    asunto = email_data.get('asunto')
+    mensaje = email_data.get('mensaje')
+    if not all([destinatario, asunto, mensaje]):
+        raise ValueError("Faltan datos requeridos: destinatario, asunto, mensaje")
+    if not validar_email(destinatario):
+        raise ValueError("Correo electrónico inválido")
+    return destinatario, MAIL_FROM, construir_mensaje(destinatario, asunto, mensaje).as_string()
+
+
+async def enviar_masivo(
+    emails: Iterable[Dict[str, Any]],
+    concurrencia: int = MAIL_BULK_CONCURRENCY,
+    por_segundo: float = MAIL_BULK_RATE_PER_SECOND,
+    mensajes_por_conexion: int = MAIL_BULK_MESSAGES_PER_CONNECTION,
+    max_intentos: int = MAIL_BULK_MAX_ATTEMPTS,
+    conectar: Optional[Callable[[], Any]] = None,
+    al_progreso: Optional[Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Envía una lista de correos ({'destinatario', 'asunto', 'mensaje'}) con a lo
+    sumo `concurrencia` conexiones SMTP, reutilizando cada una para muchos
+    mensajes y respetando `por_segundo`.
+
+    Returns:
+        dict: success, enviados, total, errores, fallidos (destinatario + error),
+        reintentos, conexiones y tiempo_total
+    """
+    from Services.mail.mail import MAIL_CONFIG_OK, MAIL_FROM
+    emails = list(emails)
+    inicio = time.perf_counter()
+    concurrencia = max(1, min(concurrencia, len(emails) or 1))
+    limitador = LimitadorTasa(por_segundo)
+    cola: asyncio.Queue = asyncio.Queue()
+    for email_data in emails:
+        cola.put_nowait(email_data)
+
+    informe: Dict[str, Any] = {
+        "total": len(emails),
+        "procesados": 0,
+        "enviados": 0,
+        "errores": 0,
+        "reintentos": 0,
+        "fallidos": [],
+    }
+
+    # Sin servidor o remitente configurado cada intento fallaría igual (con
+    # una conexión y reintentos por destinatario): se corta antes de empezar
+    if not MAIL_FROM or (conectar is None and not MAIL_CONFIG_OK):
+        logger.warning(f"Correo no configurado; no se envían {len(emails)} correos masivos")
+        informe.update({
+            "procesados": len(emails),
+            "errores": len(emails),
+            "fallidos": [{"destinatario": e.get('destinatario'), "error": "Correo no configurado"} for e in emails],
+            "success": not emails,
+            "conexiones": 0,
+            "tiempo_total": time.perf_counter() - inicio,
+        })
+        return informe
+
+    sesiones = [SesionSMTP(max_mensajes=mensajes_por_conexion, conectar=conectar) for _ in range(concurrencia)]
+    # Un hilo por conexión; cada SesionSMTP la usa un solo trabajador, de a un envío por vez
+    executor = ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="smtp-masivo")
+    loop = asyncio.get_running_loop()
+
+    async def _informar():
+        if al_progreso is None:
+            return
+        try:
+            resultado = al_progreso({k: v for k, v in informe.items() if k != "fallidos"})
+            if asyncio.iscoroutine(resultado):
+                await resultado
+        except Exception as e:
+            logger.warning(f"Error en callback de progreso del envío masivo: {e}")
+
+    async def _registrar(destinatario, error: Optional[Exception]):
+        informe["procesados"] += 1
+        if error is None:
+            informe["enviados"] += 1
+        else:
+            informe["errores"] += 1
+            informe["fallidos"].append({"destinatario": destinatario, "error": f"{type(error).__name__}: {error}"[:300]})
+        if informe["procesados"] % PROGRESO_CADA == 0:
+            await _informar()
+
+    async def _trabajador(sesion: SesionSMTP):
+        while True:
+            try:
+                email_data = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                destinatario, remitente, contenido = _preparar(email_data)
+            except ValueError as e:
+                await _registrar(email_data.get('destinatario'), e)
+                continue
+
+            error = None
+            for intento in range(1, max_intentos + 1):
+                await limitador.adquirir()
+                try:
+                    await loop.run_in_executor(executor, sesion.enviar, remitente, destinatario, contenido)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+                    # Solo se reintentan errores de SMTP o de red (SMTPException es un OSError)
+                    if es_permanente(e) or not isinstance(e, OSError) or intento == max_intentos:
+                        break
+                    informe["reintentos"] += 1
+                    await loop.run_in_executor(executor, sesion.cerrar)
+                    await asyncio.sleep(MAIL_BULK_RETRY_SECONDS * 2 ** (intento - 1))
+            await _registrar(destinatario, error)
+
+    try:
+        await asyncio.gather(*(_trabajador(sesion) for sesion in sesiones))
+    finally:
+        await asyncio.gather(*(loop.run_in_executor(executor, sesion.cerrar) for sesion in sesiones),
+                             return_exceptions=True)
+        executor.shutdown(wait=False)
+
+    tiempo_total = time.perf_counter() - inicio
+    informe.update({
+        "success": informe["errores"] == 0,
+        "conexiones": sum(sesion.conexiones for sesion in sesiones),
+        "tiempo_total": tiempo_total,
+    })
+    await _informar()
+    logger.info(
+        f"Envío masivo: {informe['enviados']}/{informe['total']} enviados, {informe['errores']} errores, "
+        f"{informe['conexiones']} conexiones en {tiempo_total:.1f}s"
+    )
+    return informe
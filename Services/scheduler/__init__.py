@@ -0,0 +1 @@
+# Scheduler de tareas periódicas con líder en MongoDB
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# scheduler.py - Tareas periódicas que corren una sola vez en todo el cluster
+# =============================================================================
+# Cada tarea de fondo (sweeper, renovaciones, reconciliación, ...) tenía su
+# propio bucle asyncio.sleep en CADA worker de gunicorn y en cada instancia.
+# Este scheduler las coordina con MongoDB:
+# - Elección de líder: el proceso que tiene el lease "scheduler_lider"
+#   (db/leases.py) es el único que despacha tareas; si muere, el lease vence y
+#   otro proceso toma el lugar en SCHEDULER_LEADER_LEASE_SECONDS.
+# - Tabla de tareas `scheduler_tareas` ({_id: nombre, proxima_ejecucion,
+#   lease_hasta, owner, ultima, métricas}). Antes de ejecutar, la tarea se
+#   reclama con un find_one_and_update (vencida y sin lease vigente): aunque
+#   haya un cambio de líder a mitad de camino, cada vencimiento corre una vez.
+# - Programación por intervalo (segundos entre el fin de una corrida y el
+#   inicio de la siguiente) o cron de 5 campos ("0 3 * * *"), más un jitter
+#   aleatorio para no disparar todo a la vez.
+# - Métricas por tarea: ejecuciones, fallos, última/promedio/máxima duración.
+# Las tareas se registran en registrar_tareas_por_defecto() (ver main.py).
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from db import leases
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "5"))
+SCHEDULER_LEADER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEADER_LEASE_SECONDS", "30"))
+SCHEDULER_JITTER_SECONDS = float(os.getenv("SCHEDULER_JITTER_SECONDS", "30"))
+
+COLECCION = "scheduler_tareas"
+LEASE_LIDER = "scheduler_lider"
+
+
+# -----------------------------------------------------------------------------
+# Cron (minuto hora día-del-mes mes día-de-la-semana), en UTC
+# -----------------------------------------------------------------------------
+
+_RANGOS = ((0, 59), (0, 23), (1, 31), (1, 12))
+
+
+def _campo_cron(expresion: str, minimo: int, maximo: int) -> Set[int]:
+    valores: Set[int] = set()
+    for parte in expresion.split(","):
+        rango, _, paso = parte.partition("/")
+        paso = int(paso) if paso else 1
+        if rango == "*":
+            inicio, fin = minimo, maximo
+        elif "-" in rango:
+            inicio, fin = (int(x) for x in rango.split("-", 1))
+        else:
+            inicio = int(rango)
+            fin = maximo if paso > 1 else inicio
+        if inicio < minimo or fin > maximo or inicio > fin or paso < 1:
+            raise ValueError(f"Campo cron fuera de rango: {parte!r}")
+        valores.update(range(inicio, fin + 1, paso))
+    return valores
+
+
+class Cron:
+    """Expresión cron de 5 campos (*, listas, rangos y pasos; domingo = 0 o 7)"""
+
+    def __init__(self, expresion: str):
+        campos = expresion.split()
+        if len(campos) != 5:
+            raise ValueError(f"Se esperaban 5 campos en la expresión cron: {expresion!r}")
+        self.expresion = expresion
+        self.minutos, self.horas, self.dias, self.meses = (
+            _campo_cron(c, lo, hi) for c, (lo, hi) in zip(campos[:4], _RANGOS)
+        )
+        self.dias_semana = {d % 7 for d in _campo_cron(campos[4], 0, 7)}
+        # Semántica clásica: si ambos campos de día están restringidos, basta con uno
+        self._dia_libre = campos[2] == "*"
+        self._dow_libre = campos[4] == "*"
+
+    def _dia_coincide(self, fecha: datetime) -> bool:
+        dow = (fecha.weekday() + 1) % 7
+        if self._dia_libre or self._dow_libre:
+            return fecha.day in self.dias and dow in self.dias_semana
+        return fecha.day in self.dias or dow in self.dias_semana
+
+    def siguiente(self, desde: datetime) -> datetime:
+        """Primer instante que coincide, estrictamente posterior a `desde`"""
+        fecha = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = fecha + timedelta(days=366 * 5)
+        while fecha < limite:
+            if fecha.month not in self.meses or not self._dia_coincide(fecha):
+                fecha = fecha.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if fecha.hour not in self.horas:
+                fecha = fecha.replace(minute=0) + timedelta(hours=1)
+                continue
+            if fecha.minute not in self.minutos:
+                fecha += timedelta(minutes=1)
+                continue
+            return fecha
+        raise ValueError(f"La expresión cron no coincide con ninguna fecha: {self.expresion!r}")
+
+
+# -----------------------------------------------------------------------------
+# Tareas
+# -----------------------------------------------------------------------------
+
+@dataclass
+class Tarea:
+    nombre: str
+    funcion: Callable[[], Awaitable[Any]]
+    intervalo: Optional[float] = None
+    cron: Optional[str] = None
+    jitter: float = SCHEDULER_JITTER_SECONDS
+    # Tiempo máximo que se considera tomada; si el proceso muere, otro la retoma al vencer
+    lease: float = 900
+    _cron: Optional[Cron] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if (self.intervalo is None) == (self.cron is None):
+            raise ValueError(f"La tarea {self.nombre} necesita `intervalo` o `cron` (uno solo)")
+        if self.cron is not None:
+            self._cron = Cron(self.cron)
+
+    @property
+    def programacion(self) -> str:
+        return f"cron {self.cron}" if self.cron else f"cada {self.intervalo:g}s"
+
+    def siguiente(self, desde: datetime) -> datetime:
+        base = self._cron.siguiente(desde) if self._cron else desde + timedelta(seconds=self.intervalo)
+        return base + timedelta(seconds=random.uniform(0, self.jitter)) if self.jitter > 0 else base
+
+
+_tareas: Dict[str, Tarea] = {}
+_en_curso: Dict[str, asyncio.Task] = {}
+_scheduler_task: Optional[asyncio.Task] = None
+_es_lider = False
+
+
+def registrar(tarea: Tarea):
+    """Agrega (o reemplaza) una tarea en el registro de este proceso"""
+    _tareas[tarea.nombre] = tarea
+
+
+def _coleccion():
+    from db.database import get_database
+    return get_database()[COLECCION]
+
+
+async def _sincronizar_tabla(coleccion):
+    """Crea los documentos de tareas nuevas y reprograma las que cambiaron de programación"""
+    now = datetime.utcnow()
+    existentes = {doc["_id"]: doc async for doc in coleccion.find({"_id": {"$in": list(_tareas)}}, {"programacion": 1})}
+    for nombre, tarea in _tareas.items():
+        doc = existentes.get(nombre)
+        if doc is not None and doc.get("programacion") == tarea.programacion:
+            continue
+        # Tarea nueva: primera corrida enseguida (como los bucles por proceso al arrancar)
+        proxima = now + timedelta(seconds=random.uniform(0, tarea.jitter)) if doc is None else tarea.siguiente(now)
+        try:
+            await coleccion.update_one(
+                {"_id": nombre},
+                {"$set": {"programacion": tarea.programacion, "proxima_ejecucion": proxima}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass
+
+
+async def _ejecutar(coleccion, tarea: Tarea):
+    inicio_dt = datetime.utcnow()
+    inicio = time.perf_counter()
+    error = None
+    resultado = None
+    try:
+        resultado = await tarea.funcion()
+    except asyncio.CancelledError:
+        # Apagado: se libera la tarea para que la retome el próximo líder
+        await coleccion.update_one({"_id": tarea.nombre, "owner": leases.OWNER_ID}, {"$set": {"lease_hasta": None}})
+        raise
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"[:500]
+        logger.error(f"Scheduler: la tarea {tarea.nombre} falló: {error}")
+    duracion = time.perf_counter() - inicio
+    fin = datetime.utcnow()
+    ultima = {
+        "inicio": inicio_dt,
+        "fin": fin,
+        "duracion_s": round(duracion, 3),
+        "ok": error is None,
+        "error": error,
+        "owner": leases.OWNER_ID,
+    }
+    if isinstance(resultado, dict):
+        ultima["resultado"] = resultado
+    await coleccion.update_one(
+        {"_id": tarea.nombre, "owner": leases.OWNER_ID},
+        {
+            "$set": {"ultima": ultima, "proxima_ejecucion": tarea.siguiente(fin), "lease_hasta": None},
+            "$inc": {"ejecuciones": 1, "fallos": 0 if error is None else 1, "duracion_total_s": duracion},
+            "$max": {"duracion_max_s": duracion},
+        },
+    )
+    logger.info(f"Scheduler: {tarea.nombre} terminó en {duracion:.2f}s ({'ok' if error is None else 'error'})")
+
+
+async def _despachar(coleccion):
+    """Reclama y lanza las tareas vencidas (solo el líder)"""
+    now = datetime.utcnow()
+    for nombre, tarea in _tareas.items():
+        if nombre in _en_curso:
+            continue
+        doc = await coleccion.find_one_and_update(
+            {"_id": nombre, "proxima_ejecucion": {"$lte": now}, "$or": [
+                {"lease_hasta": None},
+                {"lease_hasta": {"$lt": now}},
+            ]},
+            {"$set": {"lease_hasta": now + timedelta(seconds=tarea.lease), "owner": leases.OWNER_ID}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            continue
+        task = asyncio.create_task(_ejecutar(coleccion, tarea))
+        _en_curso[nombre] = task
+        task.add_done_callback(lambda _t, n=nombre: _en_curso.pop(n, None))
+
+
+async def _scheduler_loop():
+    global _es_lider
+    coleccion = _coleccion()
+    tabla_sincronizada = False
+    while True:
+        try:
+            lider = await leases.adquirir(LEASE_LIDER, SCHEDULER_LEADER_LEASE_SECONDS) is not None
+            if lider != _es_lider:
+                logger.info(f"Scheduler: este proceso {'es' if lider else 'dejó de ser'} líder ({leases.OWNER_ID})")
+                _es_lider = lider
+                tabla_sincronizada = False
+            if lider:
+                if not tabla_sincronizada:
+                    await _sincronizar_tabla(coleccion)
+                    tabla_sincronizada = True
+                await _despachar(coleccion)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en el scheduler: {e}")
+        await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+
+
+def start_scheduler() -> Optional[asyncio.Task]:
+    """Lanza el bucle del scheduler (idempotente). None si SCHEDULER_ENABLED=false."""
+    global _scheduler_task
+    if not SCHEDULER_ENABLED:
+        logger.info("Scheduler deshabilitado (SCHEDULER_ENABLED=false)")
+        return None
+    if _scheduler_task is None or _scheduler_task.done():
+        _scheduler_task = asyncio.create_task(_scheduler_loop())
+    return _scheduler_task
+
+
+async def stop_scheduler():
+    """Cancela el bucle y las tareas en curso, y cede el liderazgo"""
+    global _scheduler_task, _es_lider
+    task, _scheduler_task = _scheduler_task, None
+    pendientes = [t for t in [task, *_en_curso.values()] if t and not t.done()]
+    for t in pendientes:
+        t.cancel()
+    for t in pendientes:
+        try:
+            await t
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error cancelando tarea del scheduler: {e}")
+    if _es_lider:
+        _es_lider = False
+        await leases.liberar(LEASE_LIDER)
+
+
+async def ejecutar_ahora(nombre: str) -> bool:
+    """Adelanta la próxima ejecución de una tarea (la toma el líder en el próximo tick)"""
+    result = await _coleccion().update_one({"_id": nombre}, {"$set": {"proxima_ejecucion": datetime.utcnow()}})
+    return result.matched_count == 1
+
+
+async def get_scheduler_status() -> Dict[str, Any]:
+    """Líder actual y, por tarea: programación, próxima/última ejecución y métricas de duración"""
+    lider = await leases.leer(LEASE_LIDER) or {}
+    tareas: List[Dict[str, Any]] = []
+    async for doc in _coleccion().find({"_id": {"$in": list(_tareas)}}):
+        ejecuciones = doc.get("ejecuciones", 0)
+        tareas.append({
+            "nombre": doc["_id"],
+            "programacion": doc.get("programacion"),
+            "proxima_ejecucion": doc.get("proxima_ejecucion"),
+            "en_curso": bool(doc.get("lease_hasta") and doc["lease_hasta"] > datetime.utcnow()),
+            "owner": doc.get("owner"),
+            "ejecuciones": ejecuciones,
+            "fallos": doc.get("fallos", 0),
+            "duracion_promedio_s": round(doc.get("duracion_total_s", 0) / ejecuciones, 3) if ejecuciones else None,
+            "duracion_max_s": round(doc.get("duracion_max_s", 0), 3) if ejecuciones else None,
+            "ultima": doc.get("ultima"),
+        })
+    return {
+        "enabled": SCHEDULER_ENABLED,
+        "este_proceso": leases.OWNER_ID,
+        "es_lider": _es_lider,
+        "lider": {"owner": lider.get("owner"), "lease_hasta": lider.get("lease_hasta")},
+        "registradas": sorted(_tareas),
+        "tareas": tareas,
+    }
+
+
+def registrar_tareas_por_defecto():
+    """
+    Tareas de mantenimiento de la app; cada una se omite si su intervalo es 0
+    (y no tiene cron). Las variables son las mismas que usaban los bucles por
+    proceso, más las variantes *_CRON.
+    """
+    from Services.usuarios.sweeper import USER_SWEEP_INTERVAL_SECONDS, desactivar_usuarios_vencidos
+    from Services.contratos.renovaciones import CONTRACT_RENEWAL_INTERVAL_SECONDS, ejecutar_renovaciones
+    from db.categoria_stats import CATEGORIA_STATS_RECONCILE_SECONDS, reconciliar
+
+    async def _sincronizar_admin():
+        from Projects.Admin.services.sincronizar_usuarios import sincronizar_usuarios_admin
+        return await sincronizar_usuarios_admin()
+
+    async def _reconciliar_categorias():
+        return {"categorias": len(await reconciliar())}
+
+    def _programacion(intervalo: float, cron_env: str) -> Dict[str, Any]:
+        cron = os.getenv(cron_env, "").strip()
+        if cron:
+            return {"cron": cron}
+        return {"intervalo": intervalo} if intervalo > 0 else {}
+
+    candidatas = [
+        ("sweeper_usuarios", desactivar_usuarios_vencidos, _programacion(USER_SWEEP_INTERVAL_SECONDS, "USER_SWEEP_CRON")),
+        ("renovacion_contratos", ejecutar_renovaciones, _programacion(CONTRACT_RENEWAL_INTERVAL_SECONDS, "CONTRACT_RENEWAL_CRON")),
+        ("reconciliar_categorias", _reconciliar_categorias, _programacion(CATEGORIA_STATS_RECONCILE_SECONDS, "CATEGORIA_STATS_RECONCILE_CRON")),
+        ("sincronizar_usuarios_admin", _sincronizar_admin, _programacion(int(os.getenv("ADMIN_SYNC_INTERVAL_SECONDS", "0")), "ADMIN_SYNC_CRON")),
+    ]
+    for nombre, funcion, programacion in candidatas:
+        if programacion:
+            try:
+                registrar(Tarea(nombre, funcion, **programacion))
+            except ValueError as e:
+                # Un cron mal escrito deshabilita solo esa tarea, no el resto
+                logger.error(f"Scheduler: tarea {nombre} omitida, programación inválida {programacion}: {e}")
+        else:
+            logger.info(f"Scheduler: tarea {nombre} deshabilitada")
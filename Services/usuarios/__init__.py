@@ -0,0 +1 @@
+# Servicios de usuarios (tareas de mantenimiento)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# sweeper.py - Desactivación periódica de usuarios con todos sus proyectos vencidos
+# =============================================================================
+# Antes el listado GET /admin/users desactivaba usuarios "en caliente" con un
+# save() por documento. Ahora una tarea de fondo:
+# 1. Agrega usuario_proyectos (con $lookup a proyectos) para obtener los
+#    usuarios sin ninguna vinculación vigente.
+# 2. Los desactiva con un único update_many.
+# El resultado de la última pasada (evaluados, desactivados, duración) queda
+# disponible en get_sweeper_status().
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from models.models_beanie import Usuario, UsuarioProyecto
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre pasadas; 0 deshabilita la tarea periódica
+USER_SWEEP_INTERVAL_SECONDS = int(os.getenv("USER_SWEEP_INTERVAL_SECONDS", "300"))
+
+_sweeper_task: Optional[asyncio.Task] = None
+_sweep_lock = asyncio.Lock()
+_last_result: Optional[Dict[str, Any]] = None
+
+
+def _pipeline_usuarios_vencidos(now: datetime) -> List[Dict[str, Any]]:
+    """
+    Un usuario queda "vencido" si ninguna de sus vinculaciones está vigente:
+    vinculación activa, no vencida y con proyecto existente y activo.
+    """
+    return [
+        {"$addFields": {"_proyecto_oid": {
+            "$convert": {"input": "$proyecto_id", "to": "objectId", "onError": None, "onNull": None}
+        }}},
+        {"$lookup": {
+            "from": "proyectos",
+            "localField": "_proyecto_oid",
+            "foreignField": "_id",
+            "as": "_proyecto",
+        }},
+        {"$group": {
+            "_id": "$usuario_id",
+            "vigente": {"$max": {"$and": [
+                {"$gte": ["$fecha_vencimiento", now]},
+                "$activo",
+                {"$anyElementTrue": [{"$map": {"input": "$_proyecto", "in": "$$this.activo"}}]},
+            ]}},
+        }},
+        {"$match": {"vigente": False}},
+        {"$project": {"_id": 1}},
+    ]
+
+
+async def desactivar_usuarios_vencidos(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Ejecuta una pasada del sweeper y devuelve cuántos usuarios se desactivaron"""
+    global _last_result
+    async with _sweep_lock:
+        inicio = time.perf_counter()
+        now = now or datetime.utcnow()
+
+        candidatos = []
+        cursor = UsuarioProyecto.get_motor_collection().aggregate(_pipeline_usuarios_vencidos(now))
+        async for row in cursor:
+            usuario_id = str(row["_id"])
+            if ObjectId.is_valid(usuario_id):
+                candidatos.append(ObjectId(usuario_id))
+
+        desactivados = 0
+        if candidatos:
+            result = await Usuario.get_motor_collection().update_many(
+                {"_id": {"$in": candidatos}, "is_active": {"$ne": False}},
+                {"$set": {"is_active": False}}
+            )
+            desactivados = result.modified_count
+            if desactivados:
+                from security.credential_cache import credential_cache
+                for usuario_id in candidatos:
+                    credential_cache.invalidate_usuario(usuario_id)
+
+        _last_result = {
+            "ejecutado_en": now.isoformat(),
+            "evaluados": len(candidatos),
+            "desactivados": desactivados,
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000.0, 2),
+        }
+        if desactivados:
+            logger.info(
+                f"Sweeper de usuarios: {desactivados} desactivados de {len(candidatos)} vencidos "
+                f"en {_last_result['duracion_ms']} ms"
+            )
+        return _last_result
+
+
+async def _sweeper_loop(interval: int):
+    while True:
+        try:
+            await desactivar_usuarios_vencidos()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en sweeper de usuarios: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_sweeper(interval: Optional[int] = None) -> Optional[asyncio.Task]:
+    """Lanza la tarea periódica (idempotente). Devuelve None si está deshabilitada."""
+    global _sweeper_task
+    interval = USER_SWEEP_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        logger.info("Sweeper de usuarios deshabilitado (USER_SWEEP_INTERVAL_SECONDS=0)")
+        return None
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweeper_loop(interval))
+    return _sweeper_task
+
+
+async def stop_sweeper():
+    """Cancela la tarea periódica y espera a que termine"""
+    global _sweeper_task
+    task, _sweeper_task = _sweeper_task, None
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def get_sweeper_status() -> Dict[str, Any]:
+    """Estado de la tarea y resultado de la última pasada"""
+    return {
+        "running": _sweeper_task is not None and not _sweeper_task.done(),
+        "interval_seconds": USER_SWEEP_INTERVAL_SECONDS,
+        "last_result": _last_result,
+    }
@@ -0,0 +1,166 @@
+# =============================================================================
+# catalog_cache.py - Caché read-through del catálogo público de productos
+# =============================================================================
+# El catálogo (listado público, categorías, servicios públicos y detalle de
+# producto) cambia solo desde el panel admin, pero se lee en cada visita a la
+# tienda. Este módulo mantiene en memoria:
+# - Un LRU acotado (CATALOG_CACHE_MAX_ENTRIES) con TTL por entrada
+#   (CATALOG_CACHE_TTL_SECONDS).
+# - Claves por tipo de consulta y parámetros: ("productos_publicos", limit),
+#   ("categorias_publicas",), ("producto", id), ...
+# - Carga única por clave: las solicitudes concurrentes de una clave ausente
+#   esperan la misma consulta (se cuentan aparte, como `coalesced`).
+# - Los resultados None (p. ej. un id de producto inexistente) no se guardan:
+#   ids arbitrarios no deben desplazar del LRU a las entradas reales.
+#
+# Invalidación (routers/admin_productos):
+# - Alta/edición/baja de un producto borra su entrada ("producto", id) y todos
+#   los listados (cualquiera puede incluirlo); el resto de productos sigue en
+#   caché.
+# - Cada worker tiene su propia caché; los demás workers convergen por TTL.
+#
+# Los valores cacheados se comparten entre requests: tratarlos como solo
+# lectura.
+# =============================================================================
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1000"))
+
+# Prefijo de las claves de detalle; el resto de claves son listados
+PRODUCTO = "producto"
+
+
+class CatalogCache:
+    """LRU con TTL y estadísticas de aciertos"""
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL_SECONDS, max_entries: int = CATALOG_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Devuelve el valor cacheado o lo carga con `loader` (una sola carga por clave)"""
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Se canceló la solicitud que cargaba (no esta): cargar de nuevo
+                return await self.get_or_load(key, loader)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+            # Si se invalidó durante la carga, devolver el valor pero no guardarlo
+            if value is not None and generation == self._generation:
+                self._set(key, value)
+            future.set_result(value)
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar "Future exception was never retrieved" si nadie más esperaba
+            future.exception()
+            raise
+        finally:
+            # Cancelación (BaseException): los que esperan no deben quedar colgados
+            if not future.done():
+                future.cancel()
+            self._loading.pop(key, None)
+        return value
+
+    def invalidate_producto(self, producto_id: Optional[str] = None):
+        """Invalida el detalle de un producto y todos los listados"""
+        self._generation += 1
+        self.invalidations += 1
+        for key in list(self._entries):
+            if key[0] == PRODUCTO and producto_id is not None and key[1] != str(producto_id):
+                continue
+            del self._entries[key]
+
+    def clear(self):
+        self._generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+catalog_cache = CatalogCache()
+
+
+def _serializar_producto(producto: Dict[str, Any]) -> Dict[str, Any]:
+    """Documento de `productos` listo para templates/JSON (id string, fechas ISO)"""
+    producto = dict(producto)
+    producto['id'] = str(producto.pop('_id'))
+    if producto.get('created_at'):
+        producto['created_at'] = producto['created_at'].isoformat()
+    if producto.get('updated_at'):
+        producto['updated_at'] = producto['updated_at'].isoformat()
+    return producto
+
+
+async def get_producto_publico(db, producto_id: str) -> Optional[Dict[str, Any]]:
+    """Detalle de producto (cacheado) para las páginas de la tienda; None si no existe"""
+    from bson import ObjectId
+
+    async def cargar():
+        producto = await db.productos.find_one({"_id": ObjectId(producto_id)})
+        return _serializar_producto(producto) if producto else None
+
+    return await catalog_cache.get_or_load((PRODUCTO, str(producto_id)), cargar)
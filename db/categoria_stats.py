@@ -0,0 +1,119 @@
+# =============================================================================
+# categoria_stats.py - Conteo materializado de productos activos por categoría
+# =============================================================================
+# /ecomerce/api/categorias/publicas antes agregaba toda la colección productos
+# ($match/$group/$sort) en cada request. Ahora lee `categoria_stats`:
+#   {_id: <categoria>, count: <productos activos>, updated_at}
+# - routers/admin_productos aplica cada alta/edición/baja como un $inc sobre
+#   las categorías afectadas (aplicar_cambio).
+# - Una tarea periódica recalcula todo con la agregación original y corrige
+#   cualquier desvío (reconciliar), p. ej. escrituras hechas fuera de la API.
+# =============================================================================
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import DeleteMany, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+CATEGORIA_STATS_RECONCILE_SECONDS = int(os.getenv("CATEGORIA_STATS_RECONCILE_SECONDS", "600"))
+
+COLECCION = "categoria_stats"
+
+_reconciliado = False
+_reconcile_task: Optional[asyncio.Task] = None
+
+
+def _categoria_activa(producto: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Categoría a la que suma el producto (None si no suma a ninguna). Misma regla
+    que reconciliar ({"activo": True}): un producto sin el campo no suma.
+    """
+    if not producto or producto.get("activo") is not True:
+        return None
+    return producto.get("categoria")
+
+
+async def aplicar_cambio(db, antes: Optional[Dict[str, Any]], despues: Optional[Dict[str, Any]]):
+    """Ajusta los contadores según el estado del producto antes y después de la escritura"""
+    categoria_antes = _categoria_activa(antes)
+    categoria_despues = _categoria_activa(despues)
+    if categoria_antes == categoria_despues:
+        return
+    now = datetime.utcnow()
+    operaciones = []
+    if categoria_antes is not None:
+        operaciones.append(UpdateOne({"_id": categoria_antes}, {"$inc": {"count": -1}, "$set": {"updated_at": now}}, upsert=True))
+    if categoria_despues is not None:
+        operaciones.append(UpdateOne({"_id": categoria_despues}, {"$inc": {"count": 1}, "$set": {"updated_at": now}}, upsert=True))
+    operaciones.append(DeleteMany({"count": {"$lte": 0}}))
+    await db[COLECCION].bulk_write(operaciones, ordered=True)
+
+
+async def reconciliar(db=None) -> Dict[str, int]:
+    """Recalcula todos los contadores desde `productos` y reemplaza los existentes"""
+    global _reconciliado
+    if db is None:
+        from db.database import get_database
+        db = get_database()
+    pipeline = [
+        {"$match": {"activo": True}},
+        {"$group": {"_id": "$categoria", "count": {"$sum": 1}}},
+    ]
+    now = datetime.utcnow()
+    conteos = {row["_id"]: row["count"] async for row in db.productos.aggregate(pipeline)}
+    operaciones = [
+        UpdateOne({"_id": categoria}, {"$set": {"count": count, "updated_at": now}}, upsert=True)
+        for categoria, count in conteos.items()
+    ]
+    operaciones.append(DeleteMany({"_id": {"$nin": list(conteos)}}))
+    await db[COLECCION].bulk_write(operaciones, ordered=False)
+    _reconciliado = True
+    return conteos
+
+
+async def listar(db) -> List[Dict[str, Any]]:
+    """Categorías con productos activos, de mayor a menor cantidad"""
+    if not _reconciliado and await db[COLECCION].estimated_document_count() == 0:
+        # Primera lectura sin contadores materializados: calcularlos ahora
+        await reconciliar(db)
+    cursor = db[COLECCION].find({"count": {"$gt": 0}}).sort("count", -1)
+    return [{"nombre": row["_id"], "count": row["count"]} async for row in cursor]
+
+
+async def _reconcile_loop(intervalo: int):
+    while True:
+        try:
+            await reconciliar()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reconciliando categoria_stats: {e}")
+        await asyncio.sleep(intervalo)
+
+
+def start_reconciler(intervalo: Optional[int] = None) -> Optional[asyncio.Task]:
+    """Reconciliación al arrancar y luego periódica (0 = solo al arrancar)"""
+    global _reconcile_task
+    intervalo = CATEGORIA_STATS_RECONCILE_SECONDS if intervalo is None else intervalo
+    if _reconcile_task is None or _reconcile_task.done():
+        if intervalo <= 0:
+            _reconcile_task = asyncio.create_task(reconciliar())
+        else:
+            _reconcile_task = asyncio.create_task(_reconcile_loop(intervalo))
+    return _reconcile_task
+
+
+async def stop_reconciler():
+    global _reconcile_task
+    task, _reconcile_task = _reconcile_task, None
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,130 @@
+# =============================================================================
+# config_cache.py - Caché en proceso de la colección `configuraciones`
+# =============================================================================
+# La configuración del sitio se lee en casi cada request (/api/config, panel
+# admin, generación de PDFs de contratos) y cambia muy poco. Este módulo:
+# - Mantiene un dict {key: value} en memoria con TTL (CONFIG_CACHE_TTL_SECONDS).
+# - Recarga con una sola consulta; las recargas concurrentes se unifican
+#   (un único find por expiración, el resto espera el resultado).
+# - Se invalida explícitamente cuando admin_config escribe.
+# - Opcionalmente (CONFIG_CHANGE_STREAMS=true) escucha un change stream de
+#   MongoDB para que todos los workers se enteren de los cambios en < 1 s.
+#   Requiere replica set; si el servidor no lo soporta se sigue usando el TTL.
+# =============================================================================
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from utils.http_cache import make_etag
+
+logger = logging.getLogger(__name__)
+
+CONFIG_CACHE_TTL_SECONDS = float(os.getenv("CONFIG_CACHE_TTL_SECONDS", "60"))
+CONFIG_CHANGE_STREAMS = os.getenv("CONFIG_CHANGE_STREAMS", "false").lower() == "true"
+
+
+class ConfigCache:
+    """Caché de configuraciones con TTL, invalidación y ETag"""
+
+    def __init__(self, ttl: float = CONFIG_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._data: Optional[Dict[str, Any]] = None
+        self._etag: Optional[str] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self.loads = 0
+
+    def _fresh(self) -> bool:
+        return self._data is not None and time.monotonic() < self._expires_at
+
+    async def _load(self):
+        from models.models_beanie import Configuracion
+
+        async with self._lock:
+            if self._fresh():
+                return
+            generation = self._generation
+            configs = await Configuracion.find_all().to_list()
+            data = {c.key: c.value for c in configs}
+            self.loads += 1
+            # Si hubo una invalidación mientras se leía, no marcar como fresco
+            if generation == self._generation:
+                self._expires_at = time.monotonic() + self.ttl
+            self._data = data
+            self._etag = make_etag(json.dumps(data, sort_keys=True, default=str))
+
+    async def get_all(self) -> Dict[str, Any]:
+        """Copia del dict completo de configuraciones"""
+        if not self._fresh():
+            await self._load()
+        return dict(self._data)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        if not self._fresh():
+            await self._load()
+        return self._data.get(key, default)
+
+    async def get_etag(self) -> str:
+        """ETag del contenido actual (cambia solo si cambian los valores)"""
+        if not self._fresh():
+            await self._load()
+        return self._etag
+
+    def invalidate(self):
+        """Fuerza la recarga en la próxima lectura"""
+        self._generation += 1
+        self._expires_at = 0.0
+
+
+config_cache = ConfigCache()
+
+_watch_task: Optional[asyncio.Task] = None
+
+
+async def _watch_changes():
+    """Invalida la caché ante cualquier cambio en `configuraciones`"""
+    from models.models_beanie import Configuracion
+
+    espera = 1.0
+    while True:
+        try:
+            async with Configuracion.get_motor_collection().watch() as stream:
+                espera = 1.0
+                async for _change in stream:
+                    config_cache.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Códigos 40573/136: sin soporte de change streams (standalone, Cosmos)
+            if getattr(e, "code", None) in (40573, 136):
+                logger.warning(f"Change streams no disponibles, la caché de configuración usa solo TTL: {e}")
+                return
+            logger.error(f"Change stream de configuraciones interrumpido: {e}")
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 60.0)
+
+
+def start_config_watcher() -> Optional[asyncio.Task]:
+    """Lanza el watcher de change streams si está habilitado"""
+    global _watch_task
+    if not CONFIG_CHANGE_STREAMS:
+        return None
+    if _watch_task is None or _watch_task.done():
+        _watch_task = asyncio.create_task(_watch_changes())
+    return _watch_task
+
+
+async def stop_config_watcher():
+    global _watch_task
+    task, _watch_task = _watch_task, None
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -14,6 +14,7 @@
 # - Se recomienda mantener este archivo libre de prints de debug en producción.
 # =============================================================================
 
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -36,20 +37,79 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGO_DB_NAME", "db_sysne")
 
+# Configuración del pool de conexiones (compartido por toda la aplicación)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "120000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
 # Configuración de MongoDB con Beanie - Lazy initialization
 mongo_client = None
 mongo_database = None
 
-def get_database():
-    global mongo_client, mongo_database
+def get_mongo_client():
+    """
+    Devuelve el cliente Motor único de la aplicación, creándolo si no existe.
+    Todos los routers deben reutilizar este cliente (y su pool) en lugar de
+    crear su propio AsyncIOMotorClient.
+    """
+    global mongo_client
     if mongo_client is None:
+        from db.pool_metrics import pool_metrics
+        from db.query_profiler import query_profiler, MONGO_PROFILER_ENABLED
+        listeners = [pool_metrics]
+        if MONGO_PROFILER_ENABLED:
+            listeners.append(query_profiler)
         MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+        mongo_client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            event_listeners=listeners,
+        )
+        print(f"[INFO] Cliente MongoDB creado (maxPoolSize={MONGO_MAX_POOL_SIZE}, minPoolSize={MONGO_MIN_POOL_SIZE})")
+    return mongo_client
+
+def get_database():
+    global mongo_database
+    if mongo_database is None:
         DB_NAME = os.getenv("DB_NAME", "db_sysne")
-        mongo_client = AsyncIOMotorClient(MONGO_URL)
-        mongo_database = mongo_client[DB_NAME]
+        mongo_database = get_mongo_client()[DB_NAME]
         print(f"[DEBUG] Created database object: {type(mongo_database)}")
     return mongo_database
 
+async def get_mongo_db():
+    """Dependencia FastAPI: base de datos sobre el cliente compartido"""
+    return get_database()
+
+def close_mongo_client():
+    """Cierra el cliente compartido (se llama al apagar la aplicación)"""
+    global mongo_client, mongo_database
+    if mongo_client is not None:
+        mongo_client.close()
+    mongo_client = None
+    mongo_database = None
+
+def get_query_profile(limit: int = 20, sort: str = "total_ms"):
+    """Formas de consulta más lentas registradas por el perfilador de comandos"""
+    from db.query_profiler import query_profiler
+    return query_profiler.snapshot(limit=limit, sort=sort)
+
+def get_pool_metrics():
+    """Métricas del pool de conexiones del cliente compartido"""
+    from db.pool_metrics import pool_metrics
+    metrics = pool_metrics.snapshot()
+    metrics.update({
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "max_idle_time_ms": MONGO_MAX_IDLE_TIME_MS,
+        "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "client_initialized": mongo_client is not None,
+    })
+    return metrics
+
 # Función para crear usuario admin por defecto si la base está vacía
 async def create_default_admin():
     admin_collection = database["admin_usuarios"]
@@ -76,47 +136,91 @@ async def create_default_admin():
     result = await admin_collection.insert_one(admin_user)
     print(f"[SUCCESS] Usuario admin creado: admin/admin123 (ID: {result.inserted_id})")
 
+# Estado de inicialización de Beanie (una sola vez por proceso)
+# El lock evita inicializaciones concurrentes y el evento permite que las
+# solicitudes esperen la disponibilidad en O(1) una vez que Beanie está listo.
+_beanie_init_lock = asyncio.Lock()
+_beanie_ready = asyncio.Event()
+beanie_init_error = None
+
+def is_beanie_ready() -> bool:
+    """Indica si Beanie ya fue inicializado en este proceso"""
+    return _beanie_ready.is_set()
+
+def get_beanie_status() -> dict:
+    """Estado de inicialización de la base de datos (para health checks)"""
+    return {
+        "ready": _beanie_ready.is_set(),
+        "error": beanie_init_error,
+    }
+
+async def wait_for_beanie_ready(timeout: float = 5.0) -> bool:
+    """Espera (sin polling) hasta que Beanie esté listo o se agote el timeout"""
+    if _beanie_ready.is_set():
+        return True
+    try:
+        await asyncio.wait_for(_beanie_ready.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
 # Función para inicializar Beanie con los modelos
-async def init_beanie_db():
-    db = get_database()
+def get_document_models():
+    """Modelos Beanie registrados (también los usa db/indexes para reconciliar índices)"""
     # Importar todos los modelos aquí
-<<<<<<< HEAD
-    from Projects.ecomerce.models.usuarios import EcomerceUsuarios
-    from Projects.ecomerce.models.productos_beanie import EcomerceProductos, EcomerceProductosVariantes
-    from Projects.ecomerce.models.categorias_beanie import EcomerceCategorias
-    from Projects.ecomerce.models.carritos_beanie import EcomerceCarritos
-    from Projects.ecomerce.models.resenas_beanie import EcomerceResenas
-    from Projects.ecomerce.models.lista_deseos_beanie import EcomerceListaDeseos
-    from Projects.ecomerce.models.cupones_beanie import EcomerceCupones
-    # Importar modelo de pedidos (nuevo)
-    from Projects.ecomerce.models.pedidos_beanie import EcomercePedidos
-    # Importar modelos de Admin
-    from Projects.Admin.models.admin_usuarios_beanie import AdminUsuarios
-    from Projects.Admin.models.marketing_beanie import MarketingConfig, MarketingCampaign
-    from Projects.Admin.models.proyectos_beanie import Proyecto, UsuarioProyecto
-    from Projects.ecomerce.models.presupuesto_beanie import EcomercePresupuestos
-    from Projects.ecomerce.models.pedido_historial_beanie import EcomercePedidoHistorial
-    from Projects.ecomerce.models.configuracion_beanie import EcomerceConfiguracion
-
-    await init_beanie(database=database, document_models=[
-        EcomerceUsuarios,
-        EcomerceProductos,
-        EcomerceProductosVariantes,
-        EcomerceCategorias,
-        EcomerceCarritos,
-        EcomerceResenas,
-        EcomerceListaDeseos,
-        EcomerceCupones,
-        EcomercePedidos,
+    from models.models_beanie import (
+        Servicio,
+        Producto,
+        Presupuesto,
+        Contrato,
+        Configuracion,
+        Usuario,
+        AdminUsuarios,
+        Proyecto,
+        UsuarioProyecto,
+    )
+    # Importar modelos de Admin (usados por validación externa y sincronización)
+    from Projects.Admin.models import admin_usuarios_beanie, proyectos_beanie
+
+    return [
+        Servicio,
+        Producto,
+        Presupuesto,
+        Contrato,
+        Configuracion,
+        Usuario,
         AdminUsuarios,
-        MarketingConfig,
-        MarketingCampaign,
         Proyecto,
         UsuarioProyecto,
-        EcomercePresupuestos,
-        EcomercePedidoHistorial,
-        EcomerceConfiguracion
-    ])  # Lista de modelos Beanie
+        admin_usuarios_beanie.AdminUsuarios,
+        proyectos_beanie.Proyecto,
+        proyectos_beanie.UsuarioProyecto,
+    ]
+
+async def init_beanie_db():
+    """
+    Inicializa Beanie una única vez por proceso.
+    Las llamadas posteriores retornan inmediatamente; las concurrentes esperan
+    a que termine la primera inicialización.
+    """
+    global beanie_init_error
+    if _beanie_ready.is_set():
+        return True
+
+    async with _beanie_init_lock:
+        if _beanie_ready.is_set():
+            return True
+
+        db = get_database()
+        try:
+            await init_beanie(database=db, document_models=get_document_models())
+        except Exception as e:
+            beanie_init_error = str(e)
+            raise
+
+        beanie_init_error = None
+        _beanie_ready.set()
+        print("[INFO] Beanie inicializado")
     return True
 
 initialize_beanie_db = init_beanie_db
@@ -0,0 +1,148 @@
+# =============================================================================
+# indexes.py - Reconciliación de índices declarados vs. existentes en MongoDB
+# =============================================================================
+# Cada modelo Beanie puede declarar en `Settings.background_indexes` una lista
+# de pymongo.IndexModel. Estos índices NO los crea init_beanie: se comparan con
+# los existentes (`index_information`) y los que faltan se construyen en una
+# tarea de fondo lanzada desde el lifespan, sin bloquear el arranque.
+#
+# - Un índice se considera presente si existe otro con las mismas claves.
+# - Si existe con las mismas claves pero distinta unicidad se reporta como
+#   conflicto y no se toca (nunca se eliminan índices).
+# - Cada índice se crea por separado: un fallo (p. ej. duplicados al crear un
+#   índice único) queda en el reporte y no impide construir el resto.
+#
+# Uso por CLI:
+#   python -m db.indexes            # construye los índices faltantes
+#   python -m db.indexes --dry-run  # solo muestra la diferencia
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.database import get_database, get_document_models
+
+logger = logging.getLogger(__name__)
+
+# Lanzar la reconciliación en segundo plano al arrancar la app
+MONGO_RECONCILE_INDEXES = os.getenv("MONGO_RECONCILE_INDEXES", "true").lower() == "true"
+
+_reconcile_task: Optional[asyncio.Task] = None
+_last_report: Optional[Dict[str, Any]] = None
+
+
+def _key_spec(keys) -> Tuple[Tuple[str, Any], ...]:
+    return tuple((field, direction) for field, direction in keys)
+
+
+def get_declared_indexes() -> Dict[str, List[Any]]:
+    """Índices declarados por colección (sin duplicados entre modelos de la misma colección)"""
+    declared: Dict[str, Dict[tuple, Any]] = {}
+    for model in get_document_models():
+        settings = getattr(model, "Settings", None)
+        indexes = getattr(settings, "background_indexes", None)
+        if not indexes:
+            continue
+        por_clave = declared.setdefault(settings.name, {})
+        for index in indexes:
+            por_clave.setdefault(_key_spec(index.document["key"].items()), index)
+    return {coleccion: list(indexes.values()) for coleccion, indexes in declared.items()}
+
+
+async def diff_indexes() -> Dict[str, Dict[str, List[Any]]]:
+    """Compara declarados vs. existentes: {coleccion: {missing, present, conflicts}}"""
+    db = get_database()
+    diff = {}
+    for coleccion, declarados in get_declared_indexes().items():
+        existentes = await db[coleccion].index_information()
+        por_clave = {_key_spec(info["key"]): info for info in existentes.values()}
+        resultado = {"missing": [], "present": [], "conflicts": []}
+        for index in declarados:
+            spec = index.document
+            actual = por_clave.get(_key_spec(spec["key"].items()))
+            if actual is None:
+                resultado["missing"].append(index)
+            elif bool(actual.get("unique", False)) != bool(spec.get("unique", False)):
+                resultado["conflicts"].append(index)
+            else:
+                resultado["present"].append(index)
+        diff[coleccion] = resultado
+    return diff
+
+
+async def reconcile_indexes(dry_run: bool = False) -> Dict[str, Any]:
+    """Construye los índices declarados que faltan y devuelve un reporte"""
+    global _last_report
+    inicio = time.perf_counter()
+    db = get_database()
+    report: Dict[str, Any] = {
+        "ejecutado_en": datetime.utcnow().isoformat(),
+        "dry_run": dry_run,
+        "colecciones": {},
+    }
+
+    for coleccion, resultado in (await diff_indexes()).items():
+        detalle = {
+            "presentes": [ix.document["name"] for ix in resultado["present"]],
+            "conflictos": [ix.document["name"] for ix in resultado["conflicts"]],
+            "faltantes": [ix.document["name"] for ix in resultado["missing"]],
+            "creados": [],
+            "errores": {},
+        }
+        for conflicto in detalle["conflictos"]:
+            logger.warning(f"Índice {coleccion}.{conflicto} existe con otras opciones; no se modifica")
+
+        if not dry_run:
+            for index in resultado["missing"]:
+                nombre = index.document["name"]
+                try:
+                    await db[coleccion].create_indexes([index])
+                    detalle["creados"].append(nombre)
+                    logger.info(f"Índice creado: {coleccion}.{nombre}")
+                except Exception as e:
+                    detalle["errores"][nombre] = str(e)
+                    logger.error(f"No se pudo crear el índice {coleccion}.{nombre}: {e}")
+
+        report["colecciones"][coleccion] = detalle
+
+    report["duracion_ms"] = round((time.perf_counter() - inicio) * 1000.0, 2)
+    if not dry_run:
+        _last_report = report
+    return report
+
+
+async def _reconcile_safe():
+    try:
+        await reconcile_indexes()
+    except Exception as e:
+        logger.error(f"Error reconciliando índices: {e}")
+
+
+def start_index_reconciliation() -> Optional[asyncio.Task]:
+    """Lanza la reconciliación en segundo plano (una vez por proceso)"""
+    global _reconcile_task
+    if not MONGO_RECONCILE_INDEXES:
+        return None
+    if _reconcile_task is None:
+        _reconcile_task = asyncio.create_task(_reconcile_safe())
+    return _reconcile_task
+
+
+def get_index_report() -> Optional[Dict[str, Any]]:
+    """Reporte de la última reconciliación ejecutada en este proceso"""
+    return _last_report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Reconcilia los índices declarados en los modelos Beanie")
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar índices faltantes")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(reconcile_indexes(dry_run=args.dry_run)), indent=2, ensure_ascii=False))
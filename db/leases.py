@@ -0,0 +1,70 @@
+# =============================================================================
+# leases.py - Leases con vencimiento en MongoDB (exclusión entre workers)
+# =============================================================================
+# Con varios workers de gunicorn (y varias instancias) una tarea de fondo se
+# ejecutaría una vez por proceso. Un lease es un documento de la colección
+# `leases` ({_id: <nombre>, owner, lease_hasta, ...}) que solo un proceso a la
+# vez puede tener vigente:
+# - adquirir(): lo toma si está libre, vencido o ya es propio (atómico con
+#   find_one_and_update + upsert; si otro lo tiene, el upsert choca con el _id).
+# - guardar(): renueva el vencimiento y persiste campos (p. ej. un checkpoint)
+#   solo si el lease sigue siendo propio.
+# - liberar(): lo deja vencido sin borrar los datos guardados.
+# Si el proceso muere, el lease vence solo y otro worker lo toma.
+# =============================================================================
+
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+COLECCION = "leases"
+
+# Identificador de este proceso como dueño de leases
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _coleccion(db=None):
+    if db is None:
+        from db.database import get_database
+        db = get_database()
+    return db[COLECCION]
+
+
+async def adquirir(nombre: str, duracion: float, owner: str = OWNER_ID, db=None) -> Optional[Dict[str, Any]]:
+    """Toma el lease por `duracion` segundos. Devuelve el documento, o None si lo tiene otro."""
+    now = datetime.utcnow()
+    try:
+        return await _coleccion(db).find_one_and_update(
+            {"_id": nombre, "$or": [
+                {"lease_hasta": None},
+                {"lease_hasta": {"$lt": now}},
+                {"owner": owner},
+            ]},
+            {"$set": {"owner": owner, "lease_hasta": now + timedelta(seconds=duracion), "adquirido_en": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return None
+
+
+async def guardar(nombre: str, duracion: Optional[float] = None, owner: str = OWNER_ID, db=None, **campos) -> bool:
+    """Renueva el lease (si `duracion`) y guarda `campos`. False si el lease ya no es propio."""
+    cambios = dict(campos)
+    if duracion is not None:
+        cambios["lease_hasta"] = datetime.utcnow() + timedelta(seconds=duracion)
+    result = await _coleccion(db).update_one({"_id": nombre, "owner": owner}, {"$set": cambios})
+    return result.matched_count == 1
+
+
+async def liberar(nombre: str, owner: str = OWNER_ID, db=None, **campos) -> bool:
+    """Deja el lease vencido (los demás campos se conservan)"""
+    return await guardar(nombre, owner=owner, db=db, lease_hasta=datetime.utcnow(), **campos)
+
+
+async def leer(nombre: str, db=None) -> Optional[Dict[str, Any]]:
+    return await _coleccion(db).find_one({"_id": nombre})
@@ -0,0 +1,145 @@
+# =============================================================================
+# loaders.py - Carga por lotes (estilo DataLoader) para documentos Beanie
+# =============================================================================
+# Evita consultas N+1 en los listados del panel admin:
+# - Se juntan los ids que necesita la página.
+# - Se resuelven con UNA consulta `$in` por colección.
+# - Los resultados se memorizan durante la solicitud (el objeto RequestLoaders
+#   se crea por request mediante la dependencia `get_loaders`).
+# =============================================================================
+
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+
+def _normalize_key(value: Any) -> Optional[str]:
+    """Clave de memoización: siempre string (ObjectId y str comparten clave)"""
+    if value is None:
+        return None
+    return str(value)
+
+
+def _query_variants(keys: Iterable[str]) -> List[Any]:
+    """
+    Valores para el `$in`: cada id hexadecimal de 24 caracteres se busca tanto
+    como string como ObjectId, ya que hay colecciones con ambos formatos.
+    """
+    values: List[Any] = []
+    for key in keys:
+        values.append(key)
+        if ObjectId.is_valid(key):
+            values.append(ObjectId(key))
+    return values
+
+
+class _BatchLoader(ABC):
+    """Base común: memoización por clave y carga por lote"""
+
+    def __init__(self):
+        self._cache: Dict[str, Any] = {}
+        self.queries = 0
+
+    @abstractmethod
+    async def _fetch(self, keys: List[str]) -> Dict[str, Any]:
+        """Resultados de `keys` con una sola consulta, indexados por clave"""
+
+    def _default(self):
+        return None
+
+    async def load_many(self, keys: Iterable[Any]) -> Dict[str, Any]:
+        """Resuelve varias claves con una sola consulta (las ya cargadas no se repiten)"""
+        normalized = [k for k in (_normalize_key(k) for k in keys) if k is not None]
+        missing = list(dict.fromkeys(k for k in normalized if k not in self._cache))
+        if missing:
+            self.queries += 1
+            found = await self._fetch(missing)
+            for key in missing:
+                self._cache[key] = found.get(key, self._default())
+        return {k: self._cache[k] for k in normalized}
+
+
+class DocumentLoader(_BatchLoader):
+    """Carga documentos por `_id` con un `$in` por lote"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    async def _fetch(self, keys: List[str]) -> Dict[str, Any]:
+        docs = await self.model.find({"_id": {"$in": _query_variants(keys)}}).to_list()
+        return {str(doc.id): doc for doc in docs}
+
+
+class FieldLoader(_BatchLoader):
+    """Carga relaciones uno-a-muchos (p. ej. vinculaciones por usuario_id)"""
+
+    def __init__(self, model, field: str):
+        super().__init__()
+        self.model = model
+        self.field = field
+
+    def _default(self):
+        return []
+
+    async def _fetch(self, keys: List[str]) -> Dict[str, Any]:
+        docs = await self.model.find({self.field: {"$in": _query_variants(keys)}}).to_list()
+        grouped: Dict[str, List[Any]] = defaultdict(list)
+        for doc in docs:
+            grouped[str(getattr(doc, self.field))].append(doc)
+        return grouped
+
+
+class CountLoader(_BatchLoader):
+    """Cuenta documentos agrupados por un campo con una sola agregación"""
+
+    def __init__(self, model, field: str):
+        super().__init__()
+        self.model = model
+        self.field = field
+
+    def _default(self):
+        return 0
+
+    async def _fetch(self, keys: List[str]) -> Dict[str, Any]:
+        pipeline = [
+            {"$match": {self.field: {"$in": _query_variants(keys)}}},
+            {"$group": {"_id": f"${self.field}", "count": {"$sum": 1}}},
+        ]
+        counts: Dict[str, int] = defaultdict(int)
+        async for row in self.model.get_motor_collection().aggregate(pipeline):
+            counts[str(row["_id"])] += row["count"]
+        return counts
+
+
+class RequestLoaders:
+    """Registro de loaders de una solicitud (memoización con alcance de request)"""
+
+    def __init__(self):
+        self._loaders: Dict[tuple, _BatchLoader] = {}
+
+    def _get(self, key: tuple, factory):
+        if key not in self._loaders:
+            self._loaders[key] = factory()
+        return self._loaders[key]
+
+    def by_id(self, model) -> DocumentLoader:
+        return self._get(("id", model), lambda: DocumentLoader(model))
+
+    def by_field(self, model, field: str) -> FieldLoader:
+        return self._get(("field", model, field), lambda: FieldLoader(model, field))
+
+    def count_by(self, model, field: str) -> CountLoader:
+        return self._get(("count", model, field), lambda: CountLoader(model, field))
+
+    @property
+    def queries(self) -> int:
+        """Cantidad de consultas emitidas por los loaders en esta solicitud"""
+        return sum(loader.queries for loader in self._loaders.values())
+
+
+def get_loaders() -> RequestLoaders:
+    """Dependencia FastAPI: un RequestLoaders nuevo por solicitud"""
+    return RequestLoaders()
@@ -0,0 +1,109 @@
+# =============================================================================
+# pool_metrics.py - Métricas del pool de conexiones de MongoDB (Motor/PyMongo)
+# =============================================================================
+# Listener de eventos del pool de PyMongo registrado sobre el cliente compartido
+# de la aplicación (ver db/database.get_mongo_client). Lleva la cuenta de:
+# - Conexiones en uso (checked-out) actuales y máximo observado.
+# - Tiempo de espera para obtener una conexión del pool (promedio y máximo).
+# - Fallos de checkout (p. ej. waitQueueTimeoutMS agotado).
+#
+# Los eventos se emiten desde los hilos del executor de Motor, por eso el
+# estado se protege con un Lock y el inicio de cada checkout se guarda en un
+# threading.local (el checkout es síncrono dentro del mismo hilo).
+# =============================================================================
+
+import threading
+import time
+from typing import Dict, Any
+
+from pymongo import monitoring
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Acumula métricas del pool de conexiones de MongoDB"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.open_connections = 0
+        self.checkouts_total = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self.wait_time_total_ms = 0.0
+        self.wait_time_max_ms = 0.0
+
+    # --- Ciclo de vida del pool -------------------------------------------
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    # --- Conexiones ---------------------------------------------------------
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    # --- Checkout / checkin -------------------------------------------------
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _elapsed_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        if started is None:
+            return 0.0
+        return (time.perf_counter() - started) * 1000.0
+
+    def connection_check_out_failed(self, event):
+        self._elapsed_ms()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        waited = self._elapsed_ms()
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts_total += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.wait_time_total_ms += waited
+            self.wait_time_max_ms = max(self.wait_time_max_ms, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Devuelve una copia de las métricas actuales"""
+        with self._lock:
+            avg_wait = self.wait_time_total_ms / self.checkouts_total if self.checkouts_total else 0.0
+            return {
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "open_connections": self.open_connections,
+                "checkouts_total": self.checkouts_total,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+                "wait_time_avg_ms": round(avg_wait, 3),
+                "wait_time_max_ms": round(self.wait_time_max_ms, 3),
+            }
+
+
+# Instancia única por proceso, registrada en el cliente compartido
+pool_metrics = PoolMetricsListener()
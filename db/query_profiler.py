@@ -0,0 +1,281 @@
+# =============================================================================
+# query_profiler.py - Perfilado de consultas MongoDB (CommandListener de PyMongo)
+# =============================================================================
+# Listener de comandos registrado sobre el cliente compartido de la aplicación
+# (ver db/database.get_mongo_client). Para cada comando de lectura/escritura:
+# - Calcula la "forma" de la consulta: el filtro/pipeline con los literales
+#   reemplazados por "?" (mismo shape = misma consulta con otros valores).
+# - Acumula un histograma de latencias por (colección, comando, forma).
+# - Si una ejecución supera MONGO_SLOW_QUERY_MS se encola un explain()
+#   (como mucho uno por forma cada MONGO_EXPLAIN_INTERVAL_S) para detectar
+#   planes COLLSCAN.
+#
+# Los eventos llegan desde los hilos del executor de Motor; el estado se
+# protege con un Lock. Los explain se ejecutan en un hilo propio con un
+# cliente PyMongo síncrono de una sola conexión para no ocupar el pool de la
+# aplicación ni bloquear el hilo que reporta el evento.
+# =============================================================================
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+MONGO_PROFILER_ENABLED = os.getenv("MONGO_PROFILER_ENABLED", "true").lower() == "true"
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "100"))
+MONGO_EXPLAIN_INTERVAL_S = float(os.getenv("MONGO_EXPLAIN_INTERVAL_S", "300"))
+# Límite de formas distintas en memoria (las nuevas se cuentan en `descartadas`)
+MONGO_PROFILER_MAX_SHAPES = int(os.getenv("MONGO_PROFILER_MAX_SHAPES", "500"))
+
+# Límites superiores (ms) de los buckets del histograma; el último es +inf
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+# Comando -> campo que contiene el filtro (o pipeline) de la consulta
+_QUERY_FIELDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "update": "updates",
+    "delete": "deletes",
+    "insert": None,
+}
+# Comandos a los que se les puede pedir explain
+_EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Campos de sesión/transporte que no forman parte del comando a explicar
+_INTERNAL_FIELDS = {"lsid", "$clusterTime", "$db", "txnNumber", "$readPreference", "cursor", "writeConcern"}
+
+
+def normalize_shape(value: Any) -> Any:
+    """Reemplaza los literales por "?" conservando operadores y nombres de campo"""
+    if isinstance(value, dict):
+        return {k: normalize_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) for v in value):
+            return [normalize_shape(v) for v in value]
+        return "?"
+    return "?"
+
+
+def _command_shape(command_name: str, command: Dict[str, Any]) -> str:
+    field = _QUERY_FIELDS.get(command_name)
+    if field is None:
+        return "{}"
+    value = command.get(field)
+    # update/delete: lista de sentencias; el shape es el del primer filtro
+    if command_name in ("update", "delete") and isinstance(value, list) and value:
+        value = value[0].get("q", {})
+    return repr(normalize_shape(value or {}))
+
+
+def _find_stage(plan: Any, stage: str) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(_find_stage(v, stage) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_find_stage(v, stage) for v in plan)
+    return False
+
+
+class _ShapeStats:
+    __slots__ = ("collection", "command", "shape", "count", "failures", "total_ms",
+                 "max_ms", "buckets", "collscan", "explained_at", "explain_error")
+
+    def __init__(self, collection: str, command: str, shape: str):
+        self.collection = collection
+        self.command = command
+        self.shape = shape
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.collscan: Optional[bool] = None
+        self.explained_at: Optional[float] = None
+        self.explain_error: Optional[str] = None
+
+    def record(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, limit in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= limit:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentil aproximado: límite superior del bucket que lo contiene"""
+        if not self.count:
+            return None
+        objetivo = self.count * p
+        acumulado = 0
+        for i, n in enumerate(self.buckets):
+            acumulado += n
+            if acumulado >= objetivo:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        histograma = {f"<={limit}ms": n for limit, n in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        histograma[f">{LATENCY_BUCKETS_MS[-1]}ms"] = self.buckets[-1]
+        return {
+            "collection": self.collection,
+            "command": self.command,
+            "shape": self.shape,
+            "count": self.count,
+            "failures": self.failures,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p95_ms": self.percentile(0.95),
+            "histogram": histograma,
+            "collscan": self.collscan,
+            "explain_error": self.explain_error,
+        }
+
+
+class QueryProfilerListener(monitoring.CommandListener):
+    """Acumula latencias por forma de consulta y muestrea explain() de las lentas"""
+
+    def __init__(self, slow_ms: float = MONGO_SLOW_QUERY_MS,
+                 explain_interval_s: float = MONGO_EXPLAIN_INTERVAL_S,
+                 max_shapes: int = MONGO_PROFILER_MAX_SHAPES):
+        self.slow_ms = slow_ms
+        self.explain_interval_s = explain_interval_s
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._inflight: Dict[tuple, tuple] = {}
+        self._stats: Dict[tuple, _ShapeStats] = {}
+        self.descartadas = 0
+        self._explain_queue: "queue.Queue" = queue.Queue(maxsize=100)
+        self._explain_thread: Optional[threading.Thread] = None
+        self._explain_client = None
+
+    # --- Eventos de comandos ------------------------------------------------
+    def started(self, event):
+        if event.command_name not in _QUERY_FIELDS:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            return
+        key = (collection, event.command_name, _command_shape(event.command_name, command))
+        explicable = event.command_name in _EXPLAINABLE
+        with self._lock:
+            self._inflight[(event.request_id, event.connection_id)] = (
+                key, event.database_name, command if explicable else None
+            )
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            inflight = self._inflight.pop((event.request_id, event.connection_id), None)
+            if inflight is None:
+                return
+            key, database_name, command = inflight
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_shapes:
+                    self.descartadas += 1
+                    return
+                stats = self._stats[key] = _ShapeStats(*key)
+            elapsed_ms = event.duration_micros / 1000.0
+            stats.record(elapsed_ms)
+            if failed:
+                stats.failures += 1
+            ahora = time.monotonic()
+            explicar = (
+                command is not None
+                and not failed
+                and elapsed_ms >= self.slow_ms
+                and (stats.explained_at is None or ahora - stats.explained_at >= self.explain_interval_s)
+            )
+            if explicar:
+                stats.explained_at = ahora
+        if explicar:
+            self._schedule_explain(key, database_name, command)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    # --- explain() en segundo plano -----------------------------------------
+    def _schedule_explain(self, key: tuple, database_name: str, command: Dict[str, Any]):
+        try:
+            self._explain_queue.put_nowait((key, database_name, command))
+        except queue.Full:
+            return
+        if self._explain_thread is None or not self._explain_thread.is_alive():
+            self._explain_thread = threading.Thread(target=self._explain_worker, name="mongo-explain", daemon=True)
+            self._explain_thread.start()
+
+    def _get_explain_client(self):
+        if self._explain_client is None:
+            from pymongo import MongoClient
+            self._explain_client = MongoClient(
+                os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                maxPoolSize=1,
+                serverSelectionTimeoutMS=5000,
+            )
+        return self._explain_client
+
+    def _explain_worker(self):
+        while True:
+            key, database_name, command = self._explain_queue.get()
+            collscan, error = None, None
+            try:
+                comando = {k: v for k, v in command.items() if k not in _INTERNAL_FIELDS}
+                if key[1] == "aggregate":
+                    comando["cursor"] = {}
+                plan = self._get_explain_client()[database_name].command(
+                    {"explain": comando, "verbosity": "queryPlanner"}
+                )
+                collscan = _find_stage(plan, "COLLSCAN")
+                if collscan:
+                    logger.warning(f"COLLSCAN en {key[0]}.{key[1]} shape={key[2]}")
+            except Exception as e:
+                error = str(e)
+            with self._lock:
+                stats = self._stats.get(key)
+                if stats is not None:
+                    stats.collscan = collscan
+                    stats.explain_error = error
+
+    # --- Consulta de resultados ---------------------------------------------
+    def top(self, limit: int = 20, sort: str = "total_ms") -> List[Dict[str, Any]]:
+        """Formas de consulta ordenadas por total_ms, avg_ms, max_ms, p95_ms o count"""
+        with self._lock:
+            filas = [stats.to_dict() for stats in self._stats.values()]
+        filas.sort(key=lambda fila: fila.get(sort) or 0, reverse=True)
+        return filas[:limit]
+
+    def snapshot(self, limit: int = 20, sort: str = "total_ms") -> Dict[str, Any]:
+        with self._lock:
+            formas = len(self._stats)
+            descartadas = self.descartadas
+        return {
+            "enabled": MONGO_PROFILER_ENABLED,
+            "slow_query_ms": self.slow_ms,
+            "shapes": formas,
+            "dropped_shapes": descartadas,
+            "top": self.top(limit, sort),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.descartadas = 0
+
+
+# Instancia única por proceso, registrada en el cliente compartido
+query_profiler = QueryProfilerListener()
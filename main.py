@@ -63,9 +63,8 @@ print("[OK] Logging configurado")
 import sys
 import os
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi import Request
-from fastapi.responses import FileResponse, Response, JSONResponse
+from fastapi.responses import FileResponse, Response, JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 
 print("[OK] Importaciones básicas de FastAPI completadas")
@@ -183,11 +182,45 @@ async def lifespan(app: FastAPI):
     db_status = False
 
     try:
+        # Cliente Motor único (pool compartido por todos los routers)
+        from db.database import get_mongo_client
+        get_mongo_client()
+
         from db.database import initialize_beanie_db
         await initialize_beanie_db()
         db_status = True
         db_ready = True
         logger.info("Beanie inicializado correctamente para MongoDB")
+
+        # Invalidación de la caché de configuración entre workers (opcional)
+        from db.config_cache import start_config_watcher
+        start_config_watcher()
+
+        # Índices declarados en los modelos: se construyen en segundo plano
+        from db.indexes import start_index_reconciliation
+        start_index_reconciliation()
+
+        # Índice de búsqueda de productos (se construye en segundo plano)
+        from Services.busqueda.indice_productos import start_indexer
+        start_indexer()
+
+        # Cola de correos salientes (los handlers solo encolan)
+        from Services.mail.cola import start_mail_worker
+        start_mail_worker()
+
+        # Tareas periódicas (sweeper de usuarios, renovación de contratos,
+        # contadores por categoría, sync de admins): una sola vez en todo el
+        # cluster mediante el scheduler con líder en MongoDB
+        from Services.scheduler.scheduler import registrar_tareas_por_defecto, start_scheduler
+        registrar_tareas_por_defecto()
+        if start_scheduler() is None:
+            # Scheduler deshabilitado: bucles por proceso como antes
+            from db.categoria_stats import start_reconciler
+            from Services.usuarios.sweeper import start_sweeper
+            from Services.contratos.renovaciones import start_renovaciones
+            start_reconciler()
+            start_sweeper()
+            start_renovaciones()
         
         # Crear usuario admin si no existe
         # from init_app import create_admin_user
@@ -249,6 +282,66 @@ async def lifespan(app: FastAPI):
                 methods = getattr(route, 'methods', ['MOUNT'])
                 logger.info(f"  - {methods} {route.path}")
 
+        try:
+            from Services.usuarios.sweeper import stop_sweeper
+            await stop_sweeper()
+        except Exception as e:
+            logger.error(f"Error deteniendo sweeper de usuarios: {e}")
+
+        try:
+            from Services.scheduler.scheduler import stop_scheduler
+            await stop_scheduler()
+        except Exception as e:
+            logger.error(f"Error deteniendo el scheduler: {e}")
+
+        try:
+            from Services.contratos.renovaciones import stop_renovaciones
+            await stop_renovaciones()
+        except Exception as e:
+            logger.error(f"Error deteniendo renovaciones de contratos: {e}")
+
+        try:
+            from Services.mail.cola import stop_mail_worker
+            await stop_mail_worker()
+        except Exception as e:
+            logger.error(f"Error deteniendo la cola de correos: {e}")
+
+        try:
+            from Services.contratos import pdf as contratos_pdf
+            contratos_pdf.shutdown()
+        except Exception as e:
+            logger.error(f"Error deteniendo el pool de PDFs de contratos: {e}")
+
+        try:
+            from security.password_hasher import password_hasher
+            password_hasher.shutdown()
+        except Exception as e:
+            logger.error(f"Error deteniendo el pool de bcrypt: {e}")
+
+        try:
+            from Services.busqueda.indice_productos import stop_indexer
+            await stop_indexer()
+        except Exception as e:
+            logger.error(f"Error deteniendo indexador de búsqueda: {e}")
+
+        try:
+            from db.categoria_stats import stop_reconciler
+            await stop_reconciler()
+        except Exception as e:
+            logger.error(f"Error deteniendo reconciliación de categorías: {e}")
+
+        try:
+            from db.config_cache import stop_config_watcher
+            await stop_config_watcher()
+        except Exception as e:
+            logger.error(f"Error deteniendo watcher de configuración: {e}")
+
+        try:
+            from db.database import close_mongo_client
+            close_mongo_client()
+        except Exception as e:
+            logger.error(f"Error cerrando cliente MongoDB: {e}")
+
         logger.info("Limpieza de recursos completada")
 
 # Crear la aplicación con lifespan
@@ -265,18 +358,19 @@ db_initialized = False
 async def ensure_db_initialized():
     global db_initialized
     if not db_initialized:
-        # Wait for the lifespan to initialize the database with timeout
-        timeout = 5.0  # 5 seconds timeout
-        waited = 0.0
-        while not db_ready and waited < timeout:
-            await asyncio.sleep(0.1)
-            waited += 0.1
-        if not db_ready:
+        # Esperar el evento de readiness que marca el lifespan (sin polling)
+        from db.database import wait_for_beanie_ready
+        if not await wait_for_beanie_ready(timeout=5.0):
             logger.warning("Database not ready after timeout, proceeding without DB initialization")
         db_initialized = True
 
 # Configurar archivos estáticos y middlewares después de crear la app
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# (static/dist/: assets con hash y precomprimidos, ver utils/static_assets.py)
+from utils.static_assets import PrecompressedStaticFiles
+# /static/img/{nombre}?w= (derivados responsive) antes del montaje para tener prioridad
+from routers.imagenes import router as imagenes_router
+app.include_router(imagenes_router, tags=["imagenes"])
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # Configurar CORS permisivo para API de validación externa
 from fastapi.middleware.cors import CORSMiddleware
@@ -290,6 +384,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión brotli/gzip de respuestas (incluidas las de streaming)
+from middleware.compression import CompressionMiddleware
+app.add_middleware(CompressionMiddleware)
+
 # --------------------------------------------------------------------------
 # Favicon handler: evita error 500 si el navegador solicita /favicon.ico
 # Sirve logo.svg como fallback (o 204 si no está disponible)
@@ -305,17 +403,19 @@ app.add_middleware(
 #     return Response(status_code=204)
 
 
-# @app.get("/healthz")
-# async def healthz():
-#     """Readiness endpoint: devuelve 200 cuando la DB está lista, 503 mientras se inicializa."""
-#     try:
-#         if db_ready:
-#             return JSONResponse(status_code=200, content={"status": "ok", "db_ready": True})
-#         else:
-#             return JSONResponse(status_code=503, content={"status": "starting", "db_ready": False})
-#     except Exception as e:
-#         logger.error(f"Error en /healthz: {e}")
-#         return JSONResponse(status_code=500, content={"status": "error"})
+@app.get("/healthz")
+async def healthz():
+    """Readiness endpoint: devuelve 200 cuando la DB está lista, 503 mientras se inicializa."""
+    try:
+        from db.database import get_beanie_status
+        status = get_beanie_status()
+        if status["ready"]:
+            return JSONResponse(status_code=200, content={"status": "ok", "db_ready": True})
+        else:
+            return JSONResponse(status_code=503, content={"status": "starting", "db_ready": False, "error": status["error"]})
+    except Exception as e:
+        logger.error(f"Error en /healthz: {e}")
+        return JSONResponse(status_code=500, content={"status": "error"})
 
 # =============================
 # MIDDLEWARES
@@ -504,7 +604,9 @@ logger.info("carrito_router registrado")
 # Ruta para productos de tienda (sin /api para compatibilidad) - REGISTRADA ANTES QUE frontend_pages_router
 # Load templates defensively
 try:
-    templates_main = Jinja2Templates(directory="templates")
+    # Entorno Jinja único con caché de bytecode (utils/templates.py)
+    from utils.templates import page_templates
+    templates_main = page_templates
 except Exception as e:
     templates_main = None
     logger.error(f"Failed to initialize Jinja2Templates: {e}")
@@ -539,6 +641,45 @@ async def tienda_page(request: Request):
     await ensure_db_initialized()
     return FileResponse("static/tienda.html")
 
+async def render_producto_page(request: Request, producto_id: str) -> Response:
+    """
+    Página de detalle de producto con caché del HTML renderizado.
+    La versión de la página es (id, updated_at, versión de la plantilla): se
+    usa como ETag fuerte y como clave en la caché del catálogo, que se invalida
+    desde routers/admin_productos. Soporta If-None-Match / If-Modified-Since.
+    """
+    from datetime import datetime
+    from db.database import get_database
+    from db.catalog_cache import catalog_cache, get_producto_publico, PRODUCTO
+    from utils.http_cache import make_etag, etag_matches, http_date, modified_since, not_modified
+    from utils.templates import template_version
+
+    # Producto desde la caché del catálogo (id string y fechas ISO ya convertidos)
+    producto = await get_producto_publico(get_database(), producto_id)
+    if not producto:
+        logger.warning(f"Producto no encontrado: {producto_id}")
+        return Response(status_code=404, content="Producto no encontrado")
+
+    version = f"{producto['id']}:{producto.get('updated_at')}:{template_version('producto.html')}"
+    etag = make_etag(version)
+    cache_control = "public, max-age=0, must-revalidate"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    updated_at = producto.get('updated_at')
+    if updated_at:
+        last_modified = datetime.fromisoformat(updated_at)
+        headers["Last-Modified"] = http_date(last_modified)
+        if not modified_since(request, last_modified):
+            return not_modified(etag, cache_control, headers["Last-Modified"])
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control, headers.get("Last-Modified"))
+
+    async def renderizar():
+        logger.info(f"Renderizando template para producto: {producto.get('nombre', 'Sin nombre')}")
+        return templates_main.get_template("producto.html").render({"request": request, "product": producto})
+
+    html = await catalog_cache.get_or_load((PRODUCTO, producto['id'], "html", version), renderizar)
+    return HTMLResponse(html, headers=headers)
+
 @app.get("/ecomerce/productos/{producto_id}")
 async def producto_detail_page(request: Request, producto_id: str):
     """Servir la página de detalle de producto"""
@@ -549,44 +690,11 @@ async def producto_detail_page(request: Request, producto_id: str):
     except Exception as e:
         logger.warning(f"No se pudo inicializar DB, continuando de todos modos: {e}")
 
-    # Usar templates desde la carpeta templates para productos
-    try:
-        product_templates = Jinja2Templates(directory="templates")
-    except Exception as e:
-        logger.error(f"No se pudieron inicializar templates de producto: {e}")
+    if templates_main is None:
         return Response(status_code=503, content="Templates not available")
 
     try:
-        # Fetch product from database
-        from bson import ObjectId
-        from motor.motor_asyncio import AsyncIOMotorClient
-
-        logger.info(f"Conectando a base de datos para producto: {producto_id}")
-        client = AsyncIOMotorClient('mongodb://localhost:27017')
-        db = client.db_sysne
-
-        producto = await db.productos.find_one({"_id": ObjectId(producto_id)})
-        if not producto:
-            logger.warning(f"Producto no encontrado: {producto_id}")
-            return Response(status_code=404, content="Producto no encontrado")
-
-        logger.info(f"Producto encontrado: {producto.get('nombre', 'Sin nombre')}")
-
-        # Convert ObjectId to string
-        producto['id'] = str(producto['_id'])
-        del producto['_id']
-
-        # Convert datetime objects to strings for JSON serialization
-        if 'created_at' in producto and producto['created_at']:
-            producto['created_at'] = producto['created_at'].isoformat()
-        if 'updated_at' in producto and producto['updated_at']:
-            producto['updated_at'] = producto['updated_at'].isoformat()
-
-        logger.info(f"Renderizando template para producto: {producto.get('nombre', 'Sin nombre')}")
-        return product_templates.TemplateResponse("producto.html", {
-            "request": request,
-            "product": producto
-        })
+        return await render_producto_page(request, producto_id)
     except Exception as e:
         logger.error(f"Error loading product {producto_id}: {e}")
         import traceback
@@ -671,10 +779,9 @@ async def servicio_detail_page(request: Request, servicio_id: str):
         logger.warning(f"No se pudo inicializar DB, continuando de todos modos: {e}")
 
     # Usar templates desde la carpeta templates para servicios
-    try:
-        service_templates = Jinja2Templates(directory="templates")
-    except Exception as e:
-        logger.error(f"No se pudieron inicializar templates de servicio: {e}")
+    # Entorno Jinja compartido (construido una vez al importar)
+    service_templates = templates_main
+    if service_templates is None:
         return Response(status_code=503, content="Templates not available")
 
     try:
@@ -682,7 +789,7 @@ async def servicio_detail_page(request: Request, servicio_id: str):
         from models.models_beanie import Servicio, Producto
         from db.database import init_beanie_db
 
-        # Asegurar que Beanie esté inicializado
+        # Asegurar que Beanie esté inicializado (idempotente, O(1) si ya está listo)
         try:
             await init_beanie_db()
         except Exception as e:
@@ -787,10 +894,9 @@ async def contrato_page(request: Request, servicio_id: str):
         logger.warning(f"No se pudo inicializar DB, continuando de todos modos: {e}")
 
     # Usar templates desde la carpeta templates para contratos
-    try:
-        contract_templates = Jinja2Templates(directory="templates")
-    except Exception as e:
-        logger.error(f"No se pudieron inicializar templates de contrato: {e}")
+    # Entorno Jinja compartido (construido una vez al importar)
+    contract_templates = templates_main
+    if contract_templates is None:
         return Response(status_code=503, content="Templates not available")
 
     try:
@@ -798,7 +904,7 @@ async def contrato_page(request: Request, servicio_id: str):
         from models.models_beanie import Servicio, Producto
         from db.database import init_beanie_db
 
-        # Asegurar que Beanie esté inicializado
+        # Asegurar que Beanie esté inicializado (idempotente, O(1) si ya está listo)
         try:
             await init_beanie_db()
         except Exception as e:
@@ -895,31 +1001,7 @@ async def producto_detail_page_compat(request: Request, producto_id: str):
         return Response(status_code=503, content="Templates not available")
 
     try:
-        # Fetch product from database
-        from bson import ObjectId
-        from motor.motor_asyncio import AsyncIOMotorClient
-
-        client = AsyncIOMotorClient('mongodb://localhost:27017')
-        db = client.db_sysne
-
-        producto = await db.productos.find_one({"_id": ObjectId(producto_id)})
-        if not producto:
-            return Response(status_code=404, content="Producto no encontrado")
-
-        # Convert ObjectId to string
-        producto['id'] = str(producto['_id'])
-        del producto['_id']
-
-        # Convert datetime objects to strings for JSON serialization
-        if 'created_at' in producto and producto['created_at']:
-            producto['created_at'] = producto['created_at'].isoformat()
-        if 'updated_at' in producto and producto['updated_at']:
-            producto['updated_at'] = producto['updated_at'].isoformat()
-
-        return templates_main.TemplateResponse("producto.html", {
-            "request": request,
-            "product": producto
-        })
+        return await render_producto_page(request, producto_id)
     except Exception as e:
         logger.error(f"Error loading product {producto_id}: {e}")
         return Response(status_code=500, content="Error interno del servidor")
@@ -988,15 +1070,17 @@ async def admin_categorias_api():
     return {"categorias": categorias}
 
 @app.get("/api/config")
-async def get_public_config():
-    """Configuración pública para el frontend"""
+async def get_public_config(request: Request):
+    """Configuración pública para el frontend (cacheada en proceso, con ETag/304)"""
     await ensure_db_initialized()
-    from models.models_beanie import Configuracion
-    config = {}
-    configs = await Configuracion.find_all().to_list()
-    for c in configs:
-        config[c.key] = c.value
-    return config
+    from db.config_cache import config_cache
+    from utils.http_cache import etag_matches, not_modified
+    etag = await config_cache.get_etag()
+    cache_control = "no-cache"
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    config = await config_cache.get_all()
+    return JSONResponse(config, headers={"ETag": etag, "Cache-Control": cache_control})
 #             "Expires": "0",
 #         },
 #     )
@@ -1210,6 +1294,16 @@ except Exception as e:
     import traceback
     traceback.print_exc()
 
+# Importar y registrar el router de diagnóstico de base de datos (admin)
+try:
+    from routers.admin_db import router as admin_db_router
+    app.include_router(admin_db_router, tags=["admin-db"])
+    logger.info("Router admin_db registrado correctamente")
+except Exception as e:
+    logger.error(f"[ERROR] Error registrando admin_db_router: {e}")
+    import traceback
+    traceback.print_exc()
+
 # Importar y registrar el router de admin contratos
 try:
     from routers.admin_contrato import router as admin_contrato_router
@@ -1342,101 +1436,19 @@ if __name__ == "__main__":
 
 # Background task for contract renewals
 async def check_contract_renewals():
-    """Check for contracts that need renewal every 24 hours"""
-    while True:
-        try:
-            # Ensure database is initialized
-            from db.database import init_beanie_db
-            await init_beanie_db()
-            from models.models_beanie import Contrato, Servicio, Usuario
-            from datetime import datetime, timedelta
-            from Services.mail.mail import enviar_correo
-            
-            now = datetime.utcnow()
-            # Check contracts expiring in the next 7 days
-            seven_days_from_now = now + timedelta(days=7)
-            
-            expiring_contracts = await Contrato.find(
-                Contrato.fecha_fin <= seven_days_from_now,
-                Contrato.fecha_fin > now,
-                Contrato.estado == "activo",
-                Contrato.renovacion_automatica == True
-            ).to_list()
-            
-            for contrato in expiring_contracts:
-                try:
-                    servicio = await Servicio.get(contrato.servicio_id)
-                    if servicio:
-                        # Extend contract by one month
-                        contrato.fecha_fin = contrato.fecha_fin + timedelta(days=30)
-                        await contrato.save()
-                        
-                        # Send renewal notification
-                        user = await Usuario.find_one(Usuario.id == contrato.usuario_id)
-                        user_email = user.email if user else "user@example.com"
-                        subject = f"Contrato de {servicio.nombre} renovado automáticamente"
-                        message = f"""
-Tu contrato para el servicio "{servicio.nombre}" ha sido renovado automáticamente.
-
-Detalles actualizados:
-- Servicio: {servicio.nombre}
-- Nueva fecha de expiración: {contrato.fecha_fin.strftime('%Y-%m-%d')}
-- Precio mensual: ${contrato.precio_mensual or 0}
-
-Si deseas cancelar la renovación automática, puedes hacerlo desde tu panel de usuario.
-
-Atentamente,
-Equipo de Servicios Profesionales
-"""
-                        enviar_correo(user_email, subject, message)
-                        print(f"Contract {contrato.id} renewed automatically")
-                except Exception as e:
-                    print(f"Error renewing contract {contrato.id}: {e}")
-            
-            # Check for expired contracts that should be cancelled
-            expired_contracts = await Contrato.find(
-                Contrato.fecha_fin <= now,
-                Contrato.estado == "activo"
-            ).to_list()
-            
-            for contrato in expired_contracts:
-                if contrato.renovacion_automatica:
-                    # Already renewed above, skip
-                    continue
-                else:
-                    # Cancel expired contract
-                    contrato.estado = "expirado"
-                    await contrato.save()
-                    
-                    try:
-                        servicio = await Servicio.get(contrato.servicio_id)
-                        if servicio:
-                            user = await Usuario.find_one(Usuario.id == contrato.usuario_id)
-                            user_email = user.email if user else "user@example.com"
-                            subject = f"Contrato de {servicio.nombre} expirado"
-                            message = f"""
-Tu contrato para el servicio "{servicio.nombre}" ha expirado.
-
-Si deseas renovarlo, puedes crear un nuevo contrato desde nuestro sitio web.
-
-Atentamente,
-Equipo de Servicios Profesionales
-"""
-                            enviar_correo(user_email, subject, message)
-                            print(f"Contract {contrato.id} expired")
-                    except Exception as e:
-                        print(f"Error sending expiration email for contract {contrato.id}: {e}")
-                        
-        except Exception as e:
-            print(f"Error in contract renewal check: {e}")
-        
-        # Wait 24 hours before next check
-        await asyncio.sleep(24 * 60 * 60)
+    """
+    Una corrida de renovación/expiración de contratos.
+    El motor por lotes (con lease entre workers y checkpoint) está en
+    Services/contratos/renovaciones.py; la ejecución periódica la programa el
+    scheduler (Services/scheduler).
+    """
+    from Services.contratos.renovaciones import ejecutar_renovaciones
+    return await ejecutar_renovaciones()
 
 # Start the background task
 @app.on_event("startup")
 async def startup_event():
-    # Initialize Beanie database connection
+    # Initialize Beanie database connection (no-op si el lifespan ya lo hizo)
     try:
         from db.database import init_beanie_db
         await init_beanie_db()
@@ -1446,7 +1458,7 @@ async def startup_event():
         import traceback
         traceback.print_exc()
     
-    # asyncio.create_task(check_contract_renewals())  # TEMPORALMENTE DESHABILITADO
+    # Renovaciones: tarea "renovacion_contratos" del scheduler (Services/scheduler)
 
 # Adaptador para Vercel (serverless)
 # from mangum import Mangum
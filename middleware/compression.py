@@ -0,0 +1,161 @@
+# middleware/compression.py
+"""
+Compresión de respuestas HTTP (brotli o gzip según Accept-Encoding)
+
+Middleware ASGI puro (sin BaseHTTPMiddleware) para no acumular en memoria las
+respuestas en streaming:
+- Respuestas de un solo bloque: se comprimen si superan COMPRESSION_MIN_SIZE.
+- Respuestas en streaming (NDJSON, arrays JSON desde un cursor): se comprime
+  cada bloque con flush, así el cliente recibe los datos a medida que salen.
+- No se tocan respuestas ya codificadas (p. ej. los .br/.gz de static/dist),
+  tipos no comprimibles (imágenes, PDF) ni 204/304.
+brotli es opcional: sin el paquete solo se ofrece gzip.
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.static_assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Calidad baja/media: la compresión ocurre en cada request (no es un build)
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/manifest+json",
+    "image/svg+xml",
+}
+
+
+def _compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._obj.compress(data) + self._obj.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._obj.process(data) + self._obj.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        aceptadas = accepted_encodings(Headers(scope=scope))
+        if brotli is not None and "br" in aceptadas:
+            encoding = "br"
+        elif "gzip" in aceptadas:
+            encoding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, encoding, send)(scope, receive, self.app)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Message = {}
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, app: ASGIApp):
+        await app(scope, receive, self.send_wrapper)
+
+    def _new_encoder(self):
+        if self.encoding == "br":
+            return _BrotliEncoder(self.middleware.brotli_quality)
+        return _GzipEncoder(self.middleware.gzip_level)
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            headers = Headers(raw=self.start_message["headers"])
+            if (
+                self.start_message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not _compressible(headers.get("content-type", ""))
+                or (not more_body and len(body) < self.middleware.minimum_size)
+            ):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.encoder = self._new_encoder()
+            mutable = MutableHeaders(raw=self.start_message["headers"])
+            mutable["Content-Encoding"] = self.encoding
+            mutable.add_vary_header("Accept-Encoding")
+            if more_body:
+                # Streaming: el largo final no se conoce
+                del mutable["Content-Length"]
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": self.encoder.chunk(body), "more_body": True})
+            else:
+                comprimido = self.encoder.finish(body)
+                mutable["Content-Length"] = str(len(comprimido))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": comprimido})
+            return
+
+        if more_body:
+            await self.send({"type": "http.response.body", "body": self.encoder.chunk(body), "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.encoder.finish(body)})
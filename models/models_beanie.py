@@ -3,6 +3,11 @@ from beanie import Document
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional, List, Union, Any
 from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Índices de `background_indexes`: no los crea init_beanie (bloquearía el
+# arranque y un índice único con duplicados haría fallar la inicialización);
+# los construye en segundo plano db/indexes.reconcile_indexes.
 
 class Servicio(Document):
     nombre: str
@@ -29,6 +34,14 @@ class Producto(Document):
 
     class Settings:
         name = "productos"
+        # Listado público: filtro por activo/categoria + orden keyset (campo, _id)
+        background_indexes = [
+            IndexModel([("activo", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("activo", ASCENDING), ("categoria", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("activo", ASCENDING), ("precio", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("activo", ASCENDING), ("categoria", ASCENDING), ("precio", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("activo", ASCENDING), ("nombre", ASCENDING), ("_id", ASCENDING)]),
+        ]
 
 class Presupuesto(Document):
     usuario_id: str
@@ -59,6 +72,10 @@ class Contrato(Document):
 
     class Settings:
         name = "contratos"
+        background_indexes = [
+            IndexModel([("usuario_id", ASCENDING)]),
+            IndexModel([("estado", ASCENDING), ("fecha_fin", ASCENDING)]),  # Renovaciones y analíticas
+        ]
 
 # Modelo para configuraciones del sitio
 class Configuracion(Document):
@@ -69,6 +86,9 @@ class Configuracion(Document):
 
     class Settings:
         name = "configuraciones"
+        background_indexes = [
+            IndexModel([("key", ASCENDING)], unique=True),
+        ]
 
 # Mantener modelo de usuario básico
 class Usuario(Document):
@@ -86,6 +106,9 @@ class Usuario(Document):
         indexes = [
             "last_validated_at",
         ]
+        background_indexes = [
+            IndexModel([("email", ASCENDING)], unique=True),  # Login y /api/v1/validate
+        ]
 
 # Modelo para usuarios administradores
 class AdminUsuarios(Document):
@@ -100,6 +123,10 @@ class AdminUsuarios(Document):
     
     class Settings:
         name = "admin_usuarios"
+        background_indexes = [
+            IndexModel([("mail", ASCENDING)], unique=True),
+            IndexModel([("usuario", ASCENDING)], unique=True),
+        ]
 
 # Modelo para proyectos
 class Proyecto(Document):
@@ -128,4 +155,7 @@ class UsuarioProyecto(Document):
         name = "usuario_proyectos"
         indexes = [
             [("usuario_id", 1), ("proyecto_id", 1)],  # Índice compuesto único
+        ]
+        background_indexes = [
+            IndexModel([("proyecto_id", ASCENDING)]),  # Conteos por proyecto
         ]
\ No newline at end of file
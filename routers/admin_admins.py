@@ -3,7 +3,8 @@ from fastapi import APIRouter, HTTPException
 from models.models_beanie import AdminUsuarios
 from pydantic import BaseModel, EmailStr
 from typing import List
-from security.security import hash_password
+from security.security import encriptar_clave_async
+from security.credential_cache import credential_cache
 from routers.admin_auth import get_current_admin_user
 from fastapi import Depends
 from datetime import datetime
@@ -59,7 +60,7 @@ async def create_admin(data: CreateAdminRequest, current_admin=Depends(get_curre
         usuario=data.usuario,
         nombre=data.nombre,
         mail=data.mail,
-        clave_hash=hash_password(data.password),
+        clave_hash=await encriptar_clave_async(data.password),
         activo=data.activo,
         created_at=datetime.now()
     )
@@ -84,6 +85,7 @@ async def toggle_admin(admin_id: str, data: AdminToggle, current_admin=Depends(g
         raise HTTPException(status_code=404, detail="Admin no encontrado")
     admin.activo = data.activo
     await admin.save()
+    credential_cache.invalidate_usuario(admin.id)
     return {"message": "Estado actualizado"}
 
 @router.post("/admin/admins/{admin_id}/change-password")
@@ -91,6 +93,7 @@ async def change_admin_password(admin_id: str, data: ChangeAdminPasswordRequest,
     admin = await AdminUsuarios.find_one(AdminUsuarios.id == admin_id)
     if not admin:
         raise HTTPException(status_code=404, detail="Admin no encontrado")
-    admin.clave_hash = hash_password(data.new_password)
+    admin.clave_hash = await encriptar_clave_async(data.new_password)
     await admin.save()
+    credential_cache.invalidate_usuario(admin.id)
     return {"message": "Contraseña cambiada exitosamente"}
\ No newline at end of file
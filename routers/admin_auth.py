@@ -3,7 +3,9 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from datetime import timedelta
-from security.jwt_auth import create_access_token, verificar_clave
+from security.jwt_auth import create_access_token, verificar_clave_async
+from security.password_hasher import password_hasher
+from security.credential_cache import credential_cache
 from models.models_beanie import AdminUsuarios
 from beanie import PydanticObjectId
 from jose import jwt, JWTError
@@ -51,7 +53,7 @@ async def login_admin(request: LoginRequest):
         raise HTTPException(status_code=400, detail="Usuario inactivo")
     
     # Verificar contraseña
-    if not verificar_clave(request.password, usuario.clave_hash):
+    if not await verificar_clave_async(request.password, usuario.clave_hash):
         raise HTTPException(status_code=400, detail="Credenciales incorrectas")
     
     # Crear token con rol admin
@@ -61,4 +63,15 @@ async def login_admin(request: LoginRequest):
         expires_delta=access_token_expires
     )
     
-    return TokenResponse(access_token=access_token)
\ No newline at end of file
+    return TokenResponse(access_token=access_token)
+
+@router.get("/admin/auth/password-hasher")
+async def get_password_hasher_status(current_admin=Depends(get_current_admin_user)):
+    """Métricas del pool de bcrypt (en curso, en cola, esperas, rechazos por saturación)"""
+    return password_hasher.stats()
+
+
+@router.get("/admin/auth/credential-cache")
+async def get_credential_cache_status(current_admin=Depends(get_current_admin_user)):
+    """Métricas de la caché de validaciones exitosas de /api/v1/validate"""
+    return credential_cache.stats()
\ No newline at end of file
@@ -1,7 +1,10 @@
 # routers/admin_config.py
 from fastapi import APIRouter, HTTPException
 from models.models_beanie import Configuracion
+from db.config_cache import config_cache
 from pydantic import BaseModel
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from typing import Dict, Any
 import json
 from datetime import datetime
@@ -14,17 +17,17 @@ class IndexSectionsUpdate(BaseModel):
 @router.get("/admin/config")
 async def get_config():
     try:
-        config = {}
-        configs = await Configuracion.find_all().to_list()
-        print(f"[DEBUG] Found {len(configs)} config entries")
-        for c in configs:
-            print(f"[DEBUG] Config entry: {c.key} = {c.value} (type: {type(c.value)})")
+        config = await config_cache.get_all()
+        convertidos = False
+        for key, value in config.items():
             # Convertir a string si no lo es
-            if not isinstance(c.value, str):
-                print(f"[WARNING] Converting {c.key} from {type(c.value)} to string")
-                c.value = str(c.value)
-                await c.save()
-            config[c.key] = c.value
+            if not isinstance(value, str):
+                print(f"[WARNING] Converting {key} from {type(value)} to string")
+                config[key] = str(value)
+                await Configuracion.find_one(Configuracion.key == key).update({"$set": {"value": config[key]}})
+                convertidos = True
+        if convertidos:
+            config_cache.invalidate()
         return config
     except Exception as e:
         print(f"Error in get_config: {e}")
@@ -36,36 +39,62 @@ async def get_config():
 async def update_config(data: Dict[str, Any]):
     try:
         print(f"[DEBUG] Updating config with data: {list(data.keys())}")
-        for key, value in data.items():
+        keys = list(data.keys())
+        now = datetime.utcnow()
+        operaciones = []
+        for key in keys:
+            value = data[key]
             # Convertir a string si no lo es
             if not isinstance(value, str):
                 print(f"[WARNING] Converting {key} from {type(value)} to string")
                 value = str(value)
-            print(f"[DEBUG] Processing key: {key}, value: {value}")
-            existing = await Configuracion.find_one(Configuracion.key == key)
-            if existing:
-                existing.value = value
-                existing.updated_at = datetime.utcnow()
-                await existing.save()
-                print(f"[DEBUG] Updated existing config: {key}")
-            else:
-                new_config = Configuracion(key=key, value=value)
-                await new_config.insert()
-                print(f"[DEBUG] Created new config: {key}")
-        return {"message": "Configuración actualizada"}
+            # Upsert por `key` (índice único configuraciones.key)
+            operaciones.append(UpdateOne(
+                {"key": key},
+                {"$set": {"value": value, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            ))
+        
+        resultados = {}
+        if operaciones:
+            try:
+                result = await Configuracion.get_motor_collection().bulk_write(operaciones, ordered=False)
+                upserted = result.upserted_ids
+                errores = {}
+            except BulkWriteError as bwe:
+                upserted = {u["index"]: u["_id"] for u in bwe.details.get("upserted", [])}
+                errores = {e["index"]: e.get("errmsg", "error") for e in bwe.details.get("writeErrors", [])}
+            
+            for i, key in enumerate(keys):
+                if i in errores:
+                    resultados[key] = {"estado": "error", "detalle": errores[i]}
+                elif i in upserted:
+                    resultados[key] = {"estado": "creada"}
+                else:
+                    resultados[key] = {"estado": "actualizada"}
+            print(f"[DEBUG] Bulk upsert: {len(upserted)} created, {len(errores)} errors, {len(keys)} keys")
+        
+        config_cache.invalidate()
+        fallidas = [k for k, r in resultados.items() if r["estado"] == "error"]
+        return {
+            "message": "Configuración actualizada" if not fallidas else "Configuración actualizada parcialmente",
+            "resultados": resultados,
+            "errores": len(fallidas)
+        }
     except Exception as e:
+        config_cache.invalidate()
         print(f"Error in update_config: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/index/sections")
 async def get_index_sections():
     try:
-        config = await Configuracion.find_one(Configuracion.key == "index_sections")
-        print(f"[DEBUG] get_index_sections: config found = {config is not None}")
-        if config:
-            print(f"[DEBUG] get_index_sections: config.value = {config.value[:200]}...")
+        value = await config_cache.get("index_sections")
+        print(f"[DEBUG] get_index_sections: config found = {value is not None}")
+        if value is not None:
+            print(f"[DEBUG] get_index_sections: config.value = {value[:200]}...")
             try:
-                result = json.loads(config.value)
+                result = json.loads(value)
                 print(f"[DEBUG] get_index_sections: parsed successfully, keys = {list(result.keys())}")
                 return result
             except Exception as parse_error:
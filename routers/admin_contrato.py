@@ -1,13 +1,20 @@
 # routers/admin_contrato.py
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from models.models_beanie import Contrato, Servicio, Usuario, Producto
 from security.jwt_auth import require_admin
+from db.loaders import RequestLoaders
+from utils.streaming import en_lotes, stream_items
+from Services.contratos.renovaciones import ejecutar_renovaciones, get_renovaciones_status
+from Services.contratos.pdf import get_pdf_cache_status
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
+# Contratos por lote al listar: una consulta por colección relacionada y lote
+CONTRATOS_LOTE = 200
+
 class ContratoUpdate(BaseModel):
     estado: str  # pendiente, aprobado, activo, cancelado, suspendido, expirado
     detalles: str = ""
@@ -25,10 +32,30 @@ class ContratoUpdate(BaseModel):
             raise ValueError(f"Estado inválido: {self.estado}")
 
 @router.get("/admin/contratos", response_model=List[dict])
-async def listar_contratos_admin(current_user: dict = Depends(require_admin)):
-    from beanie import PydanticObjectId
-    
-    contratos = await Contrato.find().to_list()
+async def listar_contratos_admin(
+    request: Request,
+    current_user: dict = Depends(require_admin)
+):
+    # Respuesta en streaming: los contratos se recorren por lotes y se
+    # serializan a medida que se enriquecen (memoria constante)
+    async def contratos_enriquecidos():
+        async for lote in en_lotes(Contrato.find(), CONTRATOS_LOTE):
+            for contrato_dict in await _enriquecer_contratos(lote):
+                yield contrato_dict
+
+    return stream_items(request, contratos_enriquecidos())
+
+async def _enriquecer_contratos(contratos: List[Contrato]) -> List[dict]:
+    # Loaders nuevos por lote: la memoización no crece con el total de contratos
+    loaders = RequestLoaders()
+
+    # Cargar usuarios, servicios y productos referenciados (una consulta por colección)
+    usuarios = await loaders.by_id(Usuario).load_many(c.usuario_id for c in contratos)
+    servicio_ids = [c.servicio_id for c in contratos if c.servicio_id]
+    servicios = await loaders.by_id(Servicio).load_many(servicio_ids)
+    productos = await loaders.by_id(Producto).load_many(
+        sid for sid in servicio_ids if not servicios.get(str(sid))
+    )
     
     # Convertir contratos a diccionarios con información adicional
     contratos_dict = []
@@ -39,17 +66,10 @@ async def listar_contratos_admin(current_user: dict = Depends(require_admin)):
         # Obtener información del usuario
         usuario_nombre = f"Usuario {contrato.usuario_id[:8]}..."
         usuario_email = "N/A"
-        try:
-            # Intentar convertir a ObjectId si es necesario
-            usuario_id = contrato.usuario_id
-            if isinstance(usuario_id, str) and len(usuario_id) == 24:
-                usuario_id = PydanticObjectId(usuario_id)
-            usuario = await Usuario.get(usuario_id)
-            if usuario:
-                usuario_nombre = usuario.username
-                usuario_email = usuario.email
-        except Exception as e:
-            print(f"Error obteniendo usuario {contrato.usuario_id}: {e}")
+        usuario = usuarios.get(str(contrato.usuario_id))
+        if usuario:
+            usuario_nombre = usuario.username
+            usuario_email = usuario.email
         
         contrato_dict['usuario_nombre'] = usuario_nombre
         contrato_dict['usuario_email'] = usuario_email
@@ -57,24 +77,10 @@ async def listar_contratos_admin(current_user: dict = Depends(require_admin)):
         # Obtener información del servicio/producto
         servicio_info = "N/A"
         if contrato.servicio_id:
-            try:
-                # Intentar convertir a ObjectId si es necesario
-                servicio_id = contrato.servicio_id
-                if isinstance(servicio_id, str) and len(servicio_id) == 24:
-                    servicio_id = PydanticObjectId(servicio_id)
-                
-                # Buscar primero en servicios
-                servicio = await Servicio.get(servicio_id)
-                if servicio:
-                    servicio_info = servicio.nombre
-                else:
-                    # Buscar en productos
-                    producto = await Producto.get(servicio_id)
-                    if producto:
-                        servicio_info = producto.nombre
-            except Exception as e:
-                print(f"Error obteniendo servicio {contrato.servicio_id}: {e}")
-                servicio_info = f"Servicio {contrato.servicio_id[:8]}..."
+            # Buscar primero en servicios, luego en productos
+            servicio = servicios.get(str(contrato.servicio_id)) or productos.get(str(contrato.servicio_id))
+            if servicio:
+                servicio_info = servicio.nombre
         
         contrato_dict['servicio_nombre'] = servicio_info
         
@@ -125,7 +131,7 @@ async def actualizar_contrato_admin(contrato_id: str, update: ContratoUpdate, cu
     elif update.estado == "activo" and old_estado == "aprobado":
         # Email de activación (ya existente)
         try:
-            from Services.mail.mail import enviar_correo
+            from Services.mail.cola import encolar_correo
             from Projects.ecomerce.models.usuarios import EcomerceUsuarios
             user = await EcomerceUsuarios.find_one(EcomerceUsuarios.id == contrato.usuario_id)
             user_email = user.email if user else None
@@ -148,7 +154,7 @@ El servicio ya está disponible para su uso.
 Atentamente,
 Equipo de Servicios Profesionales
 """
-                enviar_correo(user_email, subject, message)
+                await encolar_correo(user_email, subject, message)
         except Exception as e:
             print(f"Error sending activation email: {e}")
     elif update.estado == "suspendido":
@@ -192,4 +198,19 @@ async def get_analytics(current_user: dict = Depends(require_admin)):
         "total_usuarios": total_usuarios,
         "total_contratos": total_contratos,
         "contratos_por_vencer": contratos_por_vencer
-    }
\ No newline at end of file
+    }
+
+@router.get("/admin/renovaciones")
+async def estado_renovaciones(current_user: dict = Depends(require_admin)):
+    """Estado del motor de renovaciones: lease, checkpoint y última corrida (con contratos/s)"""
+    return await get_renovaciones_status()
+
+@router.post("/admin/renovaciones/ejecutar")
+async def ejecutar_renovaciones_admin(forzar: bool = False, current_user: dict = Depends(require_admin)):
+    """Ejecuta ahora la corrida del día (o la retoma); `forzar` la repite desde cero"""
+    return await ejecutar_renovaciones(forzar=forzar)
+
+@router.get("/admin/contratos/pdf-cache")
+async def estado_cache_pdf(current_user: dict = Depends(require_admin)):
+    """Caché de PDFs de contratos de este worker: hits, generaciones y tiempo promedio"""
+    return get_pdf_cache_status()
\ No newline at end of file
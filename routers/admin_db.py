@@ -0,0 +1,79 @@
+# routers/admin_db.py
+"""
+Endpoints de diagnóstico de base de datos para el panel admin
+Expone métricas del pool de conexiones del cliente MongoDB compartido
+y el estado de los índices declarados en los modelos
+y las formas de consulta más lentas (perfilador de comandos)
+y las estadísticas de las cachés en proceso
+y la profundidad de la cola de correos salientes
+y el estado del scheduler de tareas periódicas
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from routers.admin_auth import get_current_admin_user
+from db.database import get_pool_metrics, get_query_profile
+from db.query_profiler import query_profiler
+from db.catalog_cache import catalog_cache
+from db.config_cache import config_cache
+from db.indexes import get_index_report, reconcile_indexes
+from Services.mail.cola import get_cola_status, procesar_lote
+from Services.scheduler.scheduler import ejecutar_ahora, get_scheduler_status
+
+router = APIRouter()
+
+@router.get("/admin/db/pool")
+async def get_pool_status(current_admin=Depends(get_current_admin_user)):
+    """Métricas del pool de conexiones (conexiones en uso, tiempos de espera)"""
+    return get_pool_metrics()
+
+@router.get("/admin/db/indexes")
+async def get_indexes_status(current_admin=Depends(get_current_admin_user)):
+    """Diferencia actual entre índices declarados y existentes, más el último reporte"""
+    return {
+        "diff": await reconcile_indexes(dry_run=True),
+        "last_report": get_index_report(),
+    }
+
+@router.get("/admin/db/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total_ms", pattern="^(total_ms|avg_ms|max_ms|p95_ms|count)$"),
+    current_admin=Depends(get_current_admin_user)
+):
+    """Top-N formas de consulta por latencia, con histograma y detección de COLLSCAN"""
+    return get_query_profile(limit=limit, sort=sort)
+
+@router.post("/admin/db/slow-queries/reset")
+async def reset_slow_queries(current_admin=Depends(get_current_admin_user)):
+    """Reinicia las estadísticas del perfilador"""
+    query_profiler.reset()
+    return {"message": "Estadísticas reiniciadas"}
+
+@router.get("/admin/db/caches")
+async def get_caches_status(current_admin=Depends(get_current_admin_user)):
+    """Aciertos/fallos de la caché del catálogo y recargas de la caché de configuración"""
+    return {
+        "catalogo": catalog_cache.stats(),
+        "configuracion": {"loads": config_cache.loads, "ttl_seconds": config_cache.ttl},
+    }
+
+@router.get("/admin/db/mail-queue")
+async def get_mail_queue_status(current_admin=Depends(get_current_admin_user)):
+    """Mensajes por estado en la cola de correos, antigüedad del más viejo y métricas del worker"""
+    return await get_cola_status()
+
+@router.post("/admin/db/mail-queue/flush")
+async def flush_mail_queue(current_admin=Depends(get_current_admin_user)):
+    """Envía ahora un lote de la cola (sin esperar al próximo sondeo del worker)"""
+    return {"procesados": await procesar_lote()}
+
+@router.get("/admin/scheduler")
+async def get_scheduler(current_admin=Depends(get_current_admin_user)):
+    """Líder actual, programación y métricas de duración de cada tarea periódica"""
+    return await get_scheduler_status()
+
+@router.post("/admin/scheduler/{nombre}/ejecutar")
+async def run_scheduler_job(nombre: str, current_admin=Depends(get_current_admin_user)):
+    """Adelanta la tarea: el líder la ejecuta en el próximo tick"""
+    if not await ejecutar_ahora(nombre):
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    return {"message": f"Tarea {nombre} programada para ahora"}
@@ -1,30 +1,32 @@
 # routers/admin_productos.py
-from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Depends, Request
+from db.database import get_mongo_db
+from db.catalog_cache import catalog_cache
+from db import categoria_stats
+from pymongo import ReturnDocument
+from Services.busqueda import indice_productos
+from Services.imagenes import derivados
 from routers.productos import ProductoCreate, ProductoUpdate, Producto
 from routers.admin_auth import get_current_admin_user
+from utils.streaming import stream_items
 from typing import List
 from datetime import datetime
 from bson import ObjectId
 
 router = APIRouter()
 
-# Cliente MongoDB
-client = AsyncIOMotorClient('mongodb://localhost:27017')
-db = client.db_sysne
-
 @router.get("/productos", response_model=List[Producto])
-async def listar_productos_admin(current_admin=Depends(get_current_admin_user)):
-    productos = []
-    cursor = db.productos.find({})
-    async for producto in cursor:
-        producto['id'] = str(producto['_id'])
-        del producto['_id']
-        productos.append(Producto(**producto))
-    return productos
+async def listar_productos_admin(request: Request, current_admin=Depends(get_current_admin_user), db=Depends(get_mongo_db)):
+    # Se serializa a medida que se recorre el cursor (array JSON o NDJSON)
+    async def productos():
+        async for producto in db.productos.find({}, batch_size=500):
+            producto['id'] = str(producto['_id'])
+            del producto['_id']
+            yield Producto(**producto).model_dump()
+    return stream_items(request, productos())
 
 @router.post("/productos")
-async def crear_producto(producto: ProductoCreate, current_admin=Depends(get_current_admin_user)):
+async def crear_producto(producto: ProductoCreate, current_admin=Depends(get_current_admin_user), db=Depends(get_mongo_db)):
     print(f"DEBUG: Endpoint crear_producto llamado con admin: {current_admin}")
     print(f"DEBUG: Recibiendo datos del producto: {producto.dict()}")
     print(f"DEBUG: Tipo de precio: {type(producto.precio)}, valor: {producto.precio}")
@@ -40,6 +42,10 @@ async def crear_producto(producto: ProductoCreate, current_admin=Depends(get_cur
         result = await db.productos.insert_one(nuevo_producto)
         nuevo_producto['id'] = str(result.inserted_id)
         print(f"DEBUG: Producto insertado con ID: {nuevo_producto['id']}")
+        await categoria_stats.aplicar_cambio(db, None, nuevo_producto)
+        catalog_cache.invalidate_producto(nuevo_producto['id'])
+        indice_productos.actualizar_producto(nuevo_producto)
+        derivados.pregenerar(nuevo_producto.get("imagen_url"))
         
         # Crear objeto Producto para validar
         producto_obj = Producto(**nuevo_producto)
@@ -56,29 +62,41 @@ async def crear_producto(producto: ProductoCreate, current_admin=Depends(get_cur
 async def actualizar_producto(
     producto_id: str,
     producto_update: ProductoUpdate,
-    current_admin=Depends(get_current_admin_user)
+    current_admin=Depends(get_current_admin_user),
+    db=Depends(get_mongo_db)
 ):
     update_data = producto_update.dict(exclude_unset=True)
     if update_data:
         update_data["updated_at"] = datetime.utcnow()
-        result = await db.productos.update_one(
+        # Estado previo atómico: necesario para ajustar los contadores por categoría
+        antes = await db.productos.find_one_and_update(
             {"_id": ObjectId(producto_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE
         )
-        if result.matched_count == 0:
+        if antes is None:
             raise HTTPException(status_code=404, detail="Producto no encontrado")
-    
-    # Obtener el producto actualizado
-    producto = await db.productos.find_one({"_id": ObjectId(producto_id)})
-    if not producto:
-        raise HTTPException(status_code=404, detail="Producto no encontrado")
+        producto = {**antes, **update_data}
+        await categoria_stats.aplicar_cambio(db, antes, producto)
+        catalog_cache.invalidate_producto(producto_id)
+        if "imagen_url" in update_data and update_data["imagen_url"] != antes.get("imagen_url"):
+            derivados.pregenerar(update_data["imagen_url"])
+    else:
+        # Obtener el producto sin cambios
+        producto = await db.productos.find_one({"_id": ObjectId(producto_id)})
+        if not producto:
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+    indice_productos.actualizar_producto(producto)
     producto['id'] = str(producto['_id'])
     del producto['_id']
     return Producto(**producto)
 
 @router.delete("/productos/{producto_id}")
-async def eliminar_producto(producto_id: str, current_admin=Depends(get_current_admin_user)):
-    result = await db.productos.delete_one({"_id": ObjectId(producto_id)})
-    if result.deleted_count == 0:
+async def eliminar_producto(producto_id: str, current_admin=Depends(get_current_admin_user), db=Depends(get_mongo_db)):
+    antes = await db.productos.find_one_and_delete({"_id": ObjectId(producto_id)})
+    if antes is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
+    await categoria_stats.aplicar_cambio(db, antes, None)
+    catalog_cache.invalidate_producto(producto_id)
+    indice_productos.quitar_producto(producto_id)
     return {"message": "Producto eliminado exitosamente"}
\ No newline at end of file
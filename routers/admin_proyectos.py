@@ -6,6 +6,8 @@ from datetime import datetime
 from typing import List, Optional
 from routers.admin_auth import get_current_admin_user
 from beanie import PydanticObjectId
+from db.loaders import RequestLoaders, get_loaders
+from security.credential_cache import credential_cache
 
 router = APIRouter()
 
@@ -21,16 +23,21 @@ class ProyectoToggle(BaseModel):
     activo: bool
 
 @router.get("/admin/proyectos")
-async def get_proyectos(admin=Depends(get_current_admin_user)):
+async def get_proyectos(
+    admin=Depends(get_current_admin_user),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
     """Lista todos los proyectos con conteo de usuarios asignados"""
     proyectos = await Proyecto.find_all().to_list()
     result = []
     
+    # Contar usuarios asignados de todos los proyectos en una sola agregación
+    conteos = await loaders.count_by(UsuarioProyecto, "proyecto_id").load_many(
+        str(proyecto.id) for proyecto in proyectos
+    )
+    
     for proyecto in proyectos:
-        # Contar usuarios asignados a este proyecto
-        usuarios_count = await UsuarioProyecto.find(
-            UsuarioProyecto.proyecto_id == str(proyecto.id)
-        ).count()
+        usuarios_count = conteos.get(str(proyecto.id), 0)
         
         result.append({
             "id": str(proyecto.id),
@@ -98,6 +105,8 @@ async def update_proyecto(
     
     proyecto.updated_at = datetime.utcnow()
     await proyecto.save()
+    # El nombre forma parte de la clave de las validaciones cacheadas
+    credential_cache.invalidate_proyecto(proyecto.id)
     
     return {
         "id": str(proyecto.id),
@@ -121,6 +130,7 @@ async def toggle_proyecto(
     proyecto.activo = data.activo
     proyecto.updated_at = datetime.utcnow()
     await proyecto.save()
+    credential_cache.invalidate_proyecto(proyecto.id)
     
     estado = "activado" if data.activo else "desactivado"
     return {
@@ -5,9 +5,15 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import List, Optional
 import math
-from security.security import hash_password
+import asyncio
+from bson import ObjectId
+from bson.errors import InvalidId
+from security.security import encriptar_clave_async
+from security.credential_cache import credential_cache
 from routers.admin_auth import get_current_admin_user
 from fastapi import Depends
+from db.loaders import RequestLoaders, get_loaders
+from Services.usuarios.sweeper import desactivar_usuarios_vencidos, get_sweeper_status
 
 router = APIRouter()
 
@@ -24,83 +30,163 @@ class AsignarProyectoRequest(BaseModel):
 class ActualizarVencimientoRequest(BaseModel):
     fecha_vencimiento: str  # ISO 8601 format
 
+def _pipeline_usuarios(now: datetime, limit: int, after: Optional[ObjectId] = None, skip: int = 0) -> list:
+    """
+    Pipeline de una página del listado de usuarios: vinculaciones y proyectos
+    vía `$lookup` y campos de vencimiento calculados en el servidor. La página
+    se recorre por `_id` (keyset) con `$match`/`$sort`/`$limit` al inicio del
+    pipeline para usar el índice de `_id` (dentro de un `$facet` no se usan
+    índices); `skip` solo se usa como compatibilidad cuando se pide un número
+    de página sin cursor. El total se cuenta aparte.
+    """
+    pagina = []
+    if after is not None:
+        pagina.append({"$match": {"_id": {"$gt": after}}})
+    pagina.append({"$sort": {"_id": 1}})
+    if skip:
+        pagina.append({"$skip": skip})
+    pagina.extend([
+        {"$limit": limit},
+        # usuario_proyectos guarda usuario_id como string
+        {"$addFields": {"_id_str": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": "usuario_proyectos",
+            "localField": "_id_str",
+            "foreignField": "usuario_id",
+            "as": "vinculaciones",
+        }},
+        {"$addFields": {"_proyecto_oids": {"$map": {
+            "input": "$vinculaciones",
+            "in": {"$convert": {"input": "$$this.proyecto_id", "to": "objectId", "onError": None, "onNull": None}},
+        }}}},
+        {"$lookup": {
+            "from": "proyectos",
+            "localField": "_proyecto_oids",
+            "foreignField": "_id",
+            "as": "_proyectos",
+        }},
+        # Emparejar cada vinculación con su proyecto (las huérfanas se descartan)
+        {"$addFields": {"_items": {"$filter": {
+            "input": {"$map": {
+                "input": "$vinculaciones",
+                "as": "v",
+                "in": {
+                    "v": "$$v",
+                    "p": {"$arrayElemAt": [{"$filter": {
+                        "input": "$_proyectos",
+                        "as": "p",
+                        "cond": {"$eq": [{"$toString": "$$p._id"}, {"$toString": "$$v.proyecto_id"}]},
+                    }}, 0]},
+                },
+            }},
+            "cond": {"$ne": [{"$type": "$$this.p"}, "missing"]},
+        }}}},
+        {"$addFields": {"_items": {"$map": {
+            "input": "$_items",
+            "in": {"$mergeObjects": ["$$this", {
+                "vencido": {"$lt": ["$$this.v.fecha_vencimiento", now]},
+                "dias": {"$floor": {"$divide": [{"$subtract": ["$$this.v.fecha_vencimiento", now]}, 86400000]}},
+            }]},
+        }}}},
+        {"$project": {
+            "username": 1,
+            "email": 1,
+            "is_active": 1,
+            "last_validated_at": 1,
+            "last_validation_attempt": 1,
+            "created_at": 1,
+            "tiene_proyectos": {"$gt": [{"$size": "$vinculaciones"}, 0]},
+            "todos_vencidos": {"$not": [{"$anyElementTrue": [{"$map": {
+                "input": "$_items",
+                "in": {"$and": [{"$not": ["$$this.vencido"]}, "$$this.v.activo", "$$this.p.activo"]},
+            }}]}]},
+            "proyectos": {"$map": {
+                "input": "$_items",
+                "in": {
+                    "proyecto_id": {"$toString": "$$this.p._id"},
+                    "nombre": "$$this.p.nombre",
+                    "fecha_vencimiento": "$$this.v.fecha_vencimiento",
+                    "dias_restantes": {"$cond": ["$$this.vencido", 0, "$$this.dias"]},
+                    "estado": {"$cond": ["$$this.vencido", "vencido", "activo"]},
+                    "proyecto_activo": "$$this.p.activo",
+                    "vinculacion_activa": "$$this.v.activo",
+                },
+            }},
+        }},
+    ])
+    return pagina
+
+def _iso(value):
+    return value.isoformat() if value else None
+
 @router.get("/admin/users")
 async def get_users(
     page: int = Query(1, ge=1),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None, description="Cursor: _id del último usuario de la página anterior")
 ):
-    """Lista usuarios con paginación y proyectos asignados"""
-    skip = (page - 1) * limit
+    """Lista usuarios con paginación y proyectos asignados (una agregación por página, solo lectura)"""
+    after_id = None
+    if after:
+        try:
+            after_id = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
     
-    # Obtener total de usuarios para calcular páginas
-    total = await Usuario.find_all().count()
+    # Sin cursor se mantiene compatibilidad con ?page=N
+    skip = 0 if after_id else (page - 1) * limit
     
-    # Obtener usuarios con paginación
-    users = await Usuario.find_all().skip(skip).limit(limit).to_list()
+    now = datetime.utcnow()
+    coleccion = Usuario.get_motor_collection()
+    pipeline = _pipeline_usuarios(now, limit, after=after_id, skip=skip)
+    # Página (índice de _id) y total (metadatos de la colección) en paralelo
+    users, total = await asyncio.gather(
+        coleccion.aggregate(pipeline).to_list(length=limit),
+        coleccion.estimated_document_count(),
+    )
     result = []
     
+    # Solo lectura: la desactivación de usuarios vencidos la hace el sweeper
+    # de fondo (Services/usuarios/sweeper.py)
     for user in users:
-        # Buscar proyectos asignados al usuario
-        usuario_proyectos = await UsuarioProyecto.find(
-            UsuarioProyecto.usuario_id == str(user.id)
-        ).to_list()
-        
-        proyectos_info = []
-        todos_vencidos = True
-        tiene_proyectos = len(usuario_proyectos) > 0
-        
-        for up in usuario_proyectos:
-            # Obtener información del proyecto
-            proyecto = await Proyecto.get(up.proyecto_id)
-            if not proyecto:
-                continue
-            
-            now = datetime.utcnow()
-            dias_restantes = (up.fecha_vencimiento - now).days
-            esta_vencido = up.fecha_vencimiento < now
-            
-            if not esta_vencido and up.activo and proyecto.activo:
-                todos_vencidos = False
-            
-            estado = "vencido" if esta_vencido else "activo"
-            
-            proyectos_info.append({
-                "proyecto_id": str(proyecto.id),
-                "nombre": proyecto.nombre,
-                "fecha_vencimiento": up.fecha_vencimiento.isoformat(),
-                "dias_restantes": dias_restantes if not esta_vencido else 0,
-                "estado": estado,
-                "proyecto_activo": proyecto.activo,
-                "vinculacion_activa": up.activo
-            })
-        
-        # Validación lazy: desactivar usuario si todos los proyectos están vencidos
-        if tiene_proyectos and todos_vencidos and user.is_active:
-            user.is_active = False
-            await user.save()
+        proyectos_info = user["proyectos"]
+        for info in proyectos_info:
+            info["fecha_vencimiento"] = _iso(info.get("fecha_vencimiento"))
         
         result.append({
-            "id": str(user.id),
-            "username": user.username,
-            "email": user.email,
-            "is_active": user.is_active,
+            "id": str(user["_id"]),
+            "username": user.get("username"),
+            "email": user.get("email"),
+            "is_active": user.get("is_active", True),
             "proyectos": proyectos_info,
-            "sin_proyectos": not tiene_proyectos,
-            "last_validated_at": user.last_validated_at.isoformat() if user.last_validated_at else None,
-            "last_validation_attempt": user.last_validation_attempt.isoformat() if user.last_validation_attempt else None,
-            "created_at": user.created_at.isoformat()
+            "sin_proyectos": not user["tiene_proyectos"],
+            "last_validated_at": _iso(user.get("last_validated_at")),
+            "last_validation_attempt": _iso(user.get("last_validation_attempt")),
+            "created_at": _iso(user.get("created_at"))
         })
     
     total_pages = math.ceil(total / limit)
+    next_cursor = result[-1]["id"] if len(result) == limit else None
     
     return {
         "users": result,
         "total": total,
         "page": page,
         "limit": limit,
-        "pages": total_pages
+        "pages": total_pages,
+        "next_cursor": next_cursor
     }
 
+@router.get("/admin/users/sweep")
+async def get_sweep_status(admin=Depends(get_current_admin_user)):
+    """Estado del sweeper de usuarios vencidos y resultado de la última pasada"""
+    return get_sweeper_status()
+
+@router.post("/admin/users/sweep")
+async def run_sweep(admin=Depends(get_current_admin_user)):
+    """Ejecuta ahora una pasada del sweeper (desactiva usuarios con todo vencido)"""
+    return await desactivar_usuarios_vencidos()
+
 @router.post("/admin/users/{user_id}/toggle")
 async def toggle_user(user_id: str, data: UserToggle, admin=Depends(get_current_admin_user)):
     from beanie import PydanticObjectId
@@ -116,6 +202,7 @@ async def toggle_user(user_id: str, data: UserToggle, admin=Depends(get_current_
     
     user.is_active = data.active
     await user.save()
+    credential_cache.invalidate_usuario(user.id)
     return {"message": "Estado actualizado"}
 
 @router.post("/admin/users/{user_id}/change-password")
@@ -132,8 +219,9 @@ async def change_user_password(user_id: str, data: ChangePasswordRequest, admin=
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    user.hashed_password = hash_password(data.new_password)
+    user.hashed_password = await encriptar_clave_async(data.new_password)
     await user.save()
+    credential_cache.invalidate_usuario(user.id)
     return {"message": "Contraseña cambiada exitosamente"}
 
 # ===== ENDPOINTS DE GESTIÓN DE PROYECTOS DE USUARIO =====
@@ -185,6 +273,7 @@ async def asignar_proyecto(
         updated_at=datetime.utcnow()
     )
     await usuario_proyecto.insert()
+    credential_cache.invalidate_usuario(user_id)
     
     # Activar el usuario
     if not user.is_active:
@@ -202,7 +291,8 @@ async def asignar_proyecto(
 @router.get("/admin/users/{user_id}/proyectos")
 async def get_proyectos_usuario(
     user_id: str,
-    admin=Depends(get_current_admin_user)
+    admin=Depends(get_current_admin_user),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
     """Listar todos los proyectos asignados a un usuario"""
     user = await Usuario.get(user_id)
@@ -212,10 +302,11 @@ async def get_proyectos_usuario(
     usuario_proyectos = await UsuarioProyecto.find(
         UsuarioProyecto.usuario_id == user_id
     ).to_list()
+    proyectos = await loaders.by_id(Proyecto).load_many(up.proyecto_id for up in usuario_proyectos)
     
     result = []
     for up in usuario_proyectos:
-        proyecto = await Proyecto.get(up.proyecto_id)
+        proyecto = proyectos.get(str(up.proyecto_id))
         if not proyecto:
             continue
         
@@ -277,6 +368,7 @@ async def actualizar_vencimiento_proyecto(
     usuario_proyecto.fecha_vencimiento = nueva_fecha
     usuario_proyecto.updated_at = datetime.utcnow()
     await usuario_proyecto.save()
+    credential_cache.invalidate_usuario(user_id)
     
     proyecto = await Proyecto.get(proyecto_id)
     
@@ -308,6 +400,7 @@ async def desvincular_proyecto(
     proyecto_nombre = proyecto.nombre if proyecto else "Desconocido"
     
     await usuario_proyecto.delete()
+    credential_cache.invalidate_usuario(user_id)
     
     return {
         "message": "Proyecto desvinculado exitosamente",
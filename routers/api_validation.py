@@ -7,7 +7,11 @@ from fastapi import APIRouter, HTTPException
 from models.models_beanie import Usuario, Proyecto, UsuarioProyecto
 from pydantic import BaseModel
 from datetime import datetime
-from security.ecommerce_auth import verify_password
+from security.ecommerce_auth import verify_password_async
+from security.credential_cache import credential_cache, en_segundo_plano
+from bson import ObjectId
+from db.loaders import RequestLoaders
+from utils.streaming import en_lotes, stream_object
 
 # Nuevos imports para Firebase
 import os
@@ -17,6 +21,9 @@ from firebase_admin import firestore as fa_firestore
 
 router = APIRouter()
 
+# Vinculaciones por lote al listar usuarios de un proyecto (un $in de usuarios por lote)
+USUARIOS_LOTE = 500
+
 # Helper para inicializar Firestore (una sola vez)
 _fire_app = None
 _firestore = None
@@ -50,6 +57,69 @@ class ValidacionResponse(BaseModel):
     datos_usuario: dict = None
     fecha_vencimiento: str = None
 
+def _pipeline_validacion(email: str, proyecto_nombre: str) -> list:
+    """
+    usuario (por email) -> proyecto (por nombre) -> vinculación, en una sola
+    agregación. Usa los índices de usuarios.email, proyectos.nombre y
+    usuario_proyectos(usuario_id, proyecto_id); las vinculaciones guardan los
+    ids como string.
+    """
+    return [
+        {"$match": {"email": email}},
+        {"$limit": 1},
+        {"$project": {"email": 1, "username": 1, "hashed_password": 1, "is_active": 1}},
+        {"$lookup": {
+            "from": Proyecto.get_collection_name(),
+            "let": {"uid": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"nombre": proyecto_nombre}},
+                {"$limit": 1},
+                {"$project": {"activo": 1}},
+                {"$lookup": {
+                    "from": UsuarioProyecto.get_collection_name(),
+                    "let": {"uid": "$$uid", "pid": {"$toString": "$_id"}},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$and": [
+                            {"$eq": ["$usuario_id", "$$uid"]},
+                            {"$eq": ["$proyecto_id", "$$pid"]},
+                        ]}}},
+                        {"$limit": 1},
+                        {"$project": {"activo": 1, "fecha_vencimiento": 1}},
+                    ],
+                    "as": "vinculacion",
+                }},
+            ],
+            "as": "proyecto",
+        }},
+    ]
+
+
+async def _buscar_para_validacion(email: str, proyecto_nombre: str):
+    """(usuario, proyecto, vinculación) como dicts crudos; None en lo que no exista"""
+    filas = await Usuario.get_motor_collection().aggregate(
+        _pipeline_validacion(email, proyecto_nombre)
+    ).to_list(length=1)
+    if not filas:
+        return None, None, None
+    usuario = filas[0]
+    proyecto = (usuario.pop("proyecto", None) or [None])[0]
+    vinculacion = (proyecto.pop("vinculacion", None) or [None])[0] if proyecto else None
+    return usuario, proyecto, vinculacion
+
+
+def _registrar_validacion(usuario_id, now: datetime, exitosa: bool = False):
+    """
+    Tracking con un $set puntual (sin reescribir el documento), en segundo
+    plano: la respuesta no espera la escritura.
+    """
+    if isinstance(usuario_id, str) and ObjectId.is_valid(usuario_id):
+        usuario_id = ObjectId(usuario_id)
+    cambios = {"last_validation_attempt": now}
+    if exitosa:
+        cambios["last_validated_at"] = now
+    en_segundo_plano(Usuario.get_motor_collection().update_one({"_id": usuario_id}, {"$set": cambios}))
+
+
 @router.post("/api/v1/validate", response_model=ValidacionResponse)
 async def validar_usuario_proyecto(data: ValidacionRequest):
     """
@@ -66,100 +136,112 @@ async def validar_usuario_proyecto(data: ValidacionRequest):
     Tracking:
     - Actualiza last_validation_attempt siempre
     - Actualiza last_validated_at solo si la validación es exitosa
+
+    Usuario, proyecto y vinculación se leen con una sola agregación y el
+    tracking se escribe con un $set en segundo plano.
+    Las validaciones exitosas se cachean (security/credential_cache): una
+    repetición responde sin bcrypt ni consultas.
     """
     
-    # Actualizar last_validation_attempt siempre
     now = datetime.utcnow()
+
+    clave_cache = credential_cache.key("api_v1", data.email, data.password, data.proyecto_nombre)
+    cacheado = credential_cache.get(clave_cache)
+    if cacheado is not None:
+        _registrar_validacion(cacheado["usuario_id"], now, exitosa=True)
+        return ValidacionResponse(**cacheado["respuesta"])
+    generacion = credential_cache.generation
     
-    # 1. Buscar usuario por email
-    usuario = await Usuario.find_one(Usuario.email == data.email)
+    # Usuario, proyecto y vinculación en una sola consulta
+    usuario, proyecto, usuario_proyecto = await _buscar_para_validacion(data.email, data.proyecto_nombre)
+
+    # 1. Usuario existe
     if not usuario:
         return ValidacionResponse(
             valid=False,
             mensaje="Credenciales inválidas"
         )
     
-    # Actualizar intento de validación
-    usuario.last_validation_attempt = now
-    
     # 2. Verificar contraseña
-    if not verify_password(data.password, usuario.hashed_password):
-        await usuario.save()  # Guardar intento fallido
+    if not await verify_password_async(data.password, usuario["hashed_password"]):
+        _registrar_validacion(usuario["_id"], now)  # Registrar intento fallido
         return ValidacionResponse(
             valid=False,
             mensaje="Credenciales inválidas"
         )
     
     # 3. Verificar que el usuario esté activo
-    if not usuario.is_active:
-        await usuario.save()
+    if not usuario.get("is_active", True):
+        _registrar_validacion(usuario["_id"], now)
         return ValidacionResponse(
             valid=False,
             mensaje="Usuario inactivo"
         )
     
-    # 4. Buscar proyecto por nombre
-    proyecto = await Proyecto.find_one(Proyecto.nombre == data.proyecto_nombre)
+    # 4. Proyecto existe
     if not proyecto:
-        await usuario.save()
+        _registrar_validacion(usuario["_id"], now)
         return ValidacionResponse(
             valid=False,
             mensaje=f"Proyecto '{data.proyecto_nombre}' no encontrado"
         )
     
     # 5. Verificar que el proyecto esté activo
-    if not proyecto.activo:
-        await usuario.save()
+    if not proyecto.get("activo", True):
+        _registrar_validacion(usuario["_id"], now)
         return ValidacionResponse(
             valid=False,
             mensaje=f"Proyecto '{data.proyecto_nombre}' está inactivo"
         )
     
-    # 6. Buscar vinculación usuario-proyecto
-    usuario_proyecto = await UsuarioProyecto.find_one(
-        UsuarioProyecto.usuario_id == str(usuario.id),
-        UsuarioProyecto.proyecto_id == str(proyecto.id)
-    )
-    
+    # 6. Vinculación usuario-proyecto
     if not usuario_proyecto:
-        await usuario.save()
+        _registrar_validacion(usuario["_id"], now)
         return ValidacionResponse(
             valid=False,
             mensaje=f"Usuario no está asignado al proyecto '{data.proyecto_nombre}'"
         )
     
     # 7. Verificar que la vinculación esté activa
-    if not usuario_proyecto.activo:
-        await usuario.save()
+    if not usuario_proyecto.get("activo", True):
+        _registrar_validacion(usuario["_id"], now)
         return ValidacionResponse(
             valid=False,
             mensaje=f"Asignación al proyecto '{data.proyecto_nombre}' está inactiva"
         )
     
     # 8. Verificar fecha de vencimiento
-    if usuario_proyecto.fecha_vencimiento < now:
-        await usuario.save()
+    fecha_vencimiento = usuario_proyecto["fecha_vencimiento"]
+    if fecha_vencimiento < now:
+        _registrar_validacion(usuario["_id"], now)
         return ValidacionResponse(
             valid=False,
             mensaje=f"Acceso al proyecto '{data.proyecto_nombre}' ha vencido",
-            fecha_vencimiento=usuario_proyecto.fecha_vencimiento.isoformat()
+            fecha_vencimiento=fecha_vencimiento.isoformat()
         )
     
     # ✅ Validación exitosa - actualizar last_validated_at
-    usuario.last_validated_at = now
-    await usuario.save()
+    _registrar_validacion(usuario["_id"], now, exitosa=True)
     
-    return ValidacionResponse(
+    respuesta = ValidacionResponse(
         valid=True,
         mensaje="Acceso válido",
         datos_usuario={
-            "email": usuario.email,
-            "username": usuario.username,
-            "is_active": usuario.is_active,
-            "fecha_vencimiento": usuario_proyecto.fecha_vencimiento.isoformat()
+            "email": usuario["email"],
+            "username": usuario["username"],
+            "is_active": usuario.get("is_active", True),
+            "fecha_vencimiento": fecha_vencimiento.isoformat()
         },
-        fecha_vencimiento=usuario_proyecto.fecha_vencimiento.isoformat()
+        fecha_vencimiento=fecha_vencimiento.isoformat()
+    )
+    credential_cache.put(
+        clave_cache,
+        {"usuario_id": str(usuario["_id"]), "respuesta": respuesta.model_dump()},
+        usuario["_id"], proyecto["_id"],
+        vencimiento=fecha_vencimiento,
+        generation=generacion
     )
+    return respuesta
 
 
 @router.get("/api/v1/proyecto/{proyecto_nombre}/usuarios")
@@ -183,48 +265,53 @@ async def listar_usuarios_proyecto(proyecto_nombre: str, sync: bool = False):
             detail=f"Proyecto '{proyecto_nombre}' no encontrado"
         )
     
-    # 2. Buscar todas las vinculaciones del proyecto (activas e inactivas)
-    vinculaciones = await UsuarioProyecto.find(
-        UsuarioProyecto.proyecto_id == str(proyecto_obj.id)
-    ).to_list()
-    
-    # 3. Obtener información de cada usuario
-    usuarios_info = []
-    
-    for vinculacion in vinculaciones:
-        usuario = await Usuario.get(vinculacion.usuario_id)
-        if not usuario:
-            continue
-        
-        usuarios_info.append({
-            "email": usuario.email,
-            "username": usuario.username,
-            "nombre": usuario.username,  # o usar otro campo si existe
-            "activo": usuario.is_active and vinculacion.activo,
-            "fecha_vencimiento": vinculacion.fecha_vencimiento.isoformat(),
-            "clave_hash": usuario.hashed_password
-        })
-    
-    resultado = {
+    # 2. Recorrer las vinculaciones del proyecto (activas e inactivas) por lotes
+    # 3. Obtener la información de los usuarios de cada lote con una sola consulta
+    async def usuarios_proyecto():
+        vinculaciones = UsuarioProyecto.find(UsuarioProyecto.proyecto_id == str(proyecto_obj.id))
+        async for lote in en_lotes(vinculaciones, USUARIOS_LOTE):
+            usuarios = await RequestLoaders().by_id(Usuario).load_many(v.usuario_id for v in lote)
+            for vinculacion in lote:
+                usuario = usuarios.get(str(vinculacion.usuario_id))
+                if not usuario:
+                    continue
+                yield {
+                    "email": usuario.email,
+                    "username": usuario.username,
+                    "nombre": usuario.username,  # o usar otro campo si existe
+                    "activo": usuario.is_active and vinculacion.activo,
+                    "fecha_vencimiento": vinculacion.fecha_vencimiento.isoformat(),
+                    "clave_hash": usuario.hashed_password
+                }
+
+    cabecera = {
         "proyecto": proyecto_obj.nombre,
         "proyecto_activo": proyecto_obj.activo,
+    }
+    if not sync:
+        # Streaming: {"proyecto", "proyecto_activo", "usuarios": [...], "total"}
+        return stream_object(cabecera, "usuarios", usuarios_proyecto())
+
+    # La exportación a Firestore necesita la lista completa
+    usuarios_info = [usuario async for usuario in usuarios_proyecto()]
+    resultado = {
+        **cabecera,
         "usuarios": usuarios_info,
         "total": len(usuarios_info)
     }
 
-    # Exporta snapshot del proyecto a Firestore si sync=true
-    if sync:
-        db = get_firestore()
-        if db:
-            try:
-                now = datetime.utcnow()
-                db.collection("proyectos").document(str(proyecto_obj.id))\
-                  .collection("exports").document("usuarios").set({
-                      "usuarios": usuarios_info,
-                      "timestamp": now.isoformat()
-                  }, merge=True)
-            except Exception:
-                pass
+    # Exporta snapshot del proyecto a Firestore
+    db = get_firestore()
+    if db:
+        try:
+            now = datetime.utcnow()
+            db.collection("proyectos").document(str(proyecto_obj.id))\
+              .collection("exports").document("usuarios").set({
+                  "usuarios": usuarios_info,
+                  "timestamp": now.isoformat()
+              }, merge=True)
+        except Exception:
+            pass
 
     return resultado
 
@@ -1,18 +1,19 @@
 # routers/contrato.py
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import FileResponse
 from models.models_beanie import Contrato, Servicio
 from security.jwt_auth import get_current_user
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
-from models.models_beanie import Configuracion
+from db.config_cache import config_cache
+from Services.contratos import pdf as contratos_pdf
+from utils.http_cache import etag_matches, not_modified
 
 async def get_contract_config() -> Dict[str, Any]:
-    """Obtiene la configuración del contrato desde la base de datos"""
+    """Obtiene la configuración del contrato (caché de configuraciones)"""
     try:
-        configs = await Configuracion.find_all().to_list()
-        config_dict = {c.key: c.value for c in configs}
+        config_dict = await config_cache.get_all()
         
         # Valores por defecto si no existen
         defaults = {
@@ -77,7 +78,7 @@ async def crear_contrato(contrato: ContratoCreate, current_user: dict = Depends(
 
 @router.post("/contratos/servicio")
 async def crear_contrato_servicio(contrato: ContratoServicioCreate, current_user: dict = Depends(get_current_user)):
-    # Asegurar que Beanie esté inicializado
+    # Asegurar que Beanie esté inicializado (idempotente, O(1) si ya está listo)
     from db.database import init_beanie_db
     await init_beanie_db()
 
@@ -128,7 +129,7 @@ async def crear_contrato_servicio(contrato: ContratoServicioCreate, current_user
 
     # Send email notification to user
     try:
-        from Services.mail.mail import enviar_correo
+        from Services.mail.cola import encolar_correo
         user_email = current_user.get("email")
         if user_email:
             service_name = getattr(servicio, 'nombre', 'Servicio')
@@ -152,7 +153,7 @@ Gracias por elegir nuestros servicios.
 Atentamente,
 Equipo de Servicios Profesionales
 """
-            enviar_correo(user_email, subject, message)
+            await encolar_correo(user_email, subject, message)
     except Exception as e:
         print(f"Error sending email: {e}")
 
@@ -166,7 +167,7 @@ async def listar_contratos(current_user: dict = Depends(get_current_user)):
 @router.get("/contratos/usuario")
 async def listar_contratos_usuario(current_user: dict = Depends(get_current_user)):
     """Obtener contratos del usuario actual con información del servicio"""
-    # Asegurar que Beanie esté inicializado
+    # Asegurar que Beanie esté inicializado (idempotente, O(1) si ya está listo)
     from db.database import init_beanie_db
     await init_beanie_db()
     
@@ -220,10 +221,10 @@ async def listar_contratos_usuario(current_user: dict = Depends(get_current_user
     return contratos_enriquecidos
 
 @router.get("/contratos/{contrato_id}/pdf")
-async def descargar_contrato_pdf(contrato_id: str, current_user: dict = Depends(get_current_user)):
-    """Descargar PDF del contrato"""
+async def descargar_contrato_pdf(request: Request, contrato_id: str, current_user: dict = Depends(get_current_user)):
+    """Descargar PDF del contrato (cacheado en disco, con ETag)"""
     try:
-        # Asegurar que Beanie esté inicializado
+        # Asegurar que Beanie esté inicializado (idempotente, O(1) si ya está listo)
         from db.database import init_beanie_db
         await init_beanie_db()
 
@@ -274,8 +275,10 @@ async def descargar_contrato_pdf(contrato_id: str, current_user: dict = Depends(
         # Obtener configuración del contrato desde DB
         contract_config = await get_contract_config()
 
-        # Agregar datos del proveedor (configurables)
+        # Agregar datos del proveedor (configurables); la fecha de emisión es el
+        # día de hoy, así el PDF cacheado se reutiliza durante todo el día
         contrato_dict.update({
+            'fecha_emision': datetime.combine(datetime.now().date(), datetime.min.time()),
             'proveedor_razon_social': contract_config.get('proveedor_razon_social'),
             'proveedor_cuit': contract_config.get('proveedor_cuit'),
             'proveedor_domicilio': contract_config.get('proveedor_domicilio'),
@@ -297,23 +300,20 @@ async def descargar_contrato_pdf(contrato_id: str, current_user: dict = Depends(
             'domicilio': current_user.get('domicilio', 'Domicilio del Cliente')
         }
 
-        # Generar PDF
-        pdf_buffer = generate_contract_pdf(contrato_dict, user_data)
+        # El ETag es la clave de caché: si el cliente ya tiene esta versión no se genera nada
+        clave_pdf = contratos_pdf.clave(contrato_dict, user_data)
+        etag = contratos_pdf.etag(clave_pdf)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request, etag):
+            return not_modified(etag, headers['Cache-Control'])
 
-        # Crear respuesta de streaming
-        def iter_pdf():
-            yield pdf_buffer.getvalue()
+        # Generar PDF (pool de procesos) o reutilizar el de la caché en disco
+        ruta = await contratos_pdf.obtener_pdf(contrato_dict, user_data, clave_pdf)
 
-        filename = f"contrato_{contrato_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
+        filename = f"contrato_{contrato_id}_{contrato_dict['fecha_emision'].strftime('%Y%m%d')}.pdf"
 
-        return StreamingResponse(
-            iter_pdf(),
-            media_type='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Length': str(len(pdf_buffer.getvalue()))
-            }
-        )
+        # FileResponse envía el archivo con sendfile, sin copiarlo en memoria
+        return FileResponse(ruta, media_type='application/pdf', filename=filename, headers=headers)
 
     except HTTPException:
         raise
@@ -0,0 +1,59 @@
+# routers/imagenes.py
+"""
+Imágenes de static/img con derivados responsive:
+GET /static/img/{nombre}?w=640[&format=webp]
+Sin ?w= se sirve el original, igual que el montaje /static.
+Se registra antes del montaje /static para tener prioridad sobre él.
+"""
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+
+from Services.imagenes import derivados
+from utils.http_cache import etag_matches, not_modified
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+DERIVADO_CACHE_CONTROL = "public, max-age=86400"
+
+
+def _file_response(request: Request, ruta: str, media_type: Optional[str] = None, headers: Optional[dict] = None) -> Response:
+    # Con stat_result los encabezados ETag/Last-Modified se calculan acá mismo
+    response = FileResponse(ruta, media_type=media_type, headers=headers, stat_result=os.stat(ruta))
+    if etag_matches(request, response.headers["etag"]):
+        return not_modified(
+            response.headers["etag"], response.headers.get("cache-control"), response.headers.get("last-modified")
+        )
+    return response
+
+
+@router.api_route("/static/img/{nombre:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def imagen(
+    request: Request,
+    nombre: str,
+    w: Optional[int] = Query(None, ge=1, le=4096),
+    format: Optional[str] = Query(None, pattern="^(avif|webp|jpeg|png)$"),
+):
+    ruta = derivados.ruta_original(nombre)
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    if w is None or not derivados.disponible() or derivados.nombre_desde_url(derivados.IMG_URL + nombre) is None:
+        return _file_response(request, ruta)
+
+    formato = derivados.elegir_formato(request.headers.get("accept", ""), ruta, format)
+    try:
+        destino, media_type = await derivados.obtener_derivado(ruta, w, formato)
+    except Exception as e:
+        # Imagen que Pillow no puede procesar: se sirve el original
+        logger.warning(f"No se pudo generar el derivado {w}px/{formato} de {nombre}: {e}")
+        return _file_response(request, ruta)
+
+    headers = {"Cache-Control": DERIVADO_CACHE_CONTROL}
+    if format is None:
+        headers["Vary"] = "Accept"
+    return _file_response(request, destino, media_type, headers)
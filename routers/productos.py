@@ -1,9 +1,14 @@
 # routers/productos.py
-from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from db.database import get_mongo_db
+from db.catalog_cache import catalog_cache, get_producto_publico
+from db import categoria_stats
+from Services.busqueda.indice_productos import obtener_indice
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+from bson import json_util
+import base64
 
 router = APIRouter()
 
@@ -36,40 +41,160 @@ class Producto(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-# Cliente MongoDB
-client = AsyncIOMotorClient('mongodb://localhost:27017')
-db = client.db_sysne
-
-@router.get("/productos/publicos", response_model=List[Producto])
-async def listar_productos_publicos(limit: int = 100):
-    productos = []
-    cursor = db.productos.find({"activo": True}).limit(limit)
-    async for producto in cursor:
-        producto['id'] = str(producto['_id'])
-        del producto['_id']
-        productos.append(Producto(**producto))
+# Ordenamientos del listado público: (campo, dirección) + _id como desempate.
+# Cada uno tiene su índice compuesto en models_beanie.Producto.
+ORDENES_LISTADO = {
+    "recientes": ("created_at", -1),
+    "precio_asc": ("precio", 1),
+    "precio_desc": ("precio", -1),
+    "nombre": ("nombre", 1),
+}
+
+CAMPOS_LISTADO = set(Producto.model_fields)
+
+def _encode_cursor(orden: str, valor, _id) -> str:
+    payload = json_util.dumps([orden, valor, _id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str, orden: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        orden_cursor, valor, _id = json_util.loads(base64.urlsafe_b64decode(padded).decode("utf-8"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if orden_cursor != orden:
+        raise HTTPException(status_code=400, detail="El cursor corresponde a otro ordenamiento")
+    return valor, _id
+
+def _filtro_keyset(campo: str, direccion: int, valor, ultimo_id) -> dict:
+    """
+    Filas posteriores al cursor (valor, _id). MongoDB ordena null/ausente antes
+    que cualquier valor: primeras en orden ascendente y últimas en descendente,
+    y `$gt`/`$lt` contra un valor nunca las incluyen, así que se tratan aparte.
+    """
+    op = "$lt" if direccion < 0 else "$gt"
+    if valor is None:
+        mismo_valor = {campo: None, "_id": {op: ultimo_id}}
+        if direccion < 0:
+            return mismo_valor
+        return {"$or": [mismo_valor, {campo: {"$ne": None}}]}
+    condiciones = [
+        {campo: {op: valor}},
+        {campo: valor, "_id": {op: ultimo_id}},
+    ]
+    if direccion < 0:
+        condiciones.append({campo: None})
+    return {"$or": condiciones}
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    campos = [f.strip() for f in fields.split(",") if f.strip()]
+    invalidos = [f for f in campos if f not in CAMPOS_LISTADO]
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(invalidos)}")
+    return campos
+
+@router.get("/productos/publicos")
+async def listar_productos_publicos(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en X-Next-Cursor"),
+    categoria: Optional[str] = None,
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    en_stock: bool = False,
+    orden: str = Query("recientes", pattern="^(recientes|precio_asc|precio_desc|nombre)$"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por coma (p. ej. id,nombre,precio)"),
+    db=Depends(get_mongo_db)
+):
+    """
+    Listado público con paginación keyset: la página siguiente se pide con el
+    cursor del encabezado X-Next-Cursor (ausente en la última página).
+    La respuesta sigue siendo un array de productos.
+    """
+    campo_orden, direccion = ORDENES_LISTADO[orden]
+    campos = _parse_fields(fields)
+
+    async def cargar():
+        filtro = {"activo": True}
+        if categoria:
+            filtro["categoria"] = categoria
+        if precio_min is not None or precio_max is not None:
+            filtro["precio"] = {}
+            if precio_min is not None:
+                filtro["precio"]["$gte"] = precio_min
+            if precio_max is not None:
+                filtro["precio"]["$lte"] = precio_max
+        if en_stock:
+            filtro["stock"] = {"$gt": 0}
+        if cursor:
+            valor, ultimo_id = _decode_cursor(cursor, orden)
+            filtro = {"$and": [filtro, _filtro_keyset(campo_orden, direccion, valor, ultimo_id)]}
+
+        proyeccion = None
+        if campos:
+            # El campo de orden siempre se lee para poder armar el cursor
+            proyeccion = {c: 1 for c in campos if c != "id"}
+            proyeccion[campo_orden] = 1
+
+        productos = []
+        ultimo = None
+        query = db.productos.find(filtro, proyeccion).sort([(campo_orden, direccion), ("_id", direccion)]).limit(limit)
+        async for producto in query:
+            ultimo = producto
+            producto['id'] = str(producto['_id'])
+            if campos:
+                productos.append({c: producto.get(c) for c in campos})
+            else:
+                del producto['_id']
+                productos.append(Producto(**producto).model_dump())
+
+        siguiente = None
+        if ultimo is not None and len(productos) == limit:
+            siguiente = _encode_cursor(orden, ultimo.get(campo_orden), ultimo["_id"])
+        return productos, siguiente
+
+    clave = ("productos_publicos", limit, cursor, categoria, precio_min, precio_max, en_stock, orden, fields)
+    productos, siguiente = await catalog_cache.get_or_load(clave, cargar)
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
     return productos
 
+@router.get("/productos/buscar")
+async def buscar_productos(
+    q: str = Query(..., min_length=1, max_length=200),
+    categoria: Optional[str] = None,
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    en_stock: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db=Depends(get_mongo_db)
+):
+    """
+    Búsqueda de productos activos por texto (nombre, descripción, categoría)
+    con relevancia, tolerancia a errores de tipeo y facetas de categoría/precio.
+    """
+    indice = await obtener_indice(db)
+    return indice.buscar(
+        q,
+        categoria=categoria,
+        precio_min=precio_min,
+        precio_max=precio_max,
+        en_stock=en_stock,
+        limit=limit,
+        offset=offset,
+    )
+
 @router.get("/productos/{producto_id}", response_model=Producto)
-async def obtener_producto(producto_id: str):
-    from bson import ObjectId
-    producto = await db.productos.find_one({"_id": ObjectId(producto_id)})
+async def obtener_producto(producto_id: str, db=Depends(get_mongo_db)):
+    producto = await get_producto_publico(db, producto_id)
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    producto['id'] = str(producto['_id'])
-    del producto['_id']
     return Producto(**producto)
 
 @router.get("/categorias/publicas")
-async def listar_categorias():
-    # Obtener categorías únicas de productos activos usando agregación
-    pipeline = [
-        {"$match": {"activo": True}},
-        {"$group": {"_id": "$categoria", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    categorias = []
-    cursor = db.productos.aggregate(pipeline)
-    async for cat in cursor:
-        categorias.append({"nombre": cat["_id"], "count": cat["count"]})
-    return categorias
\ No newline at end of file
+async def listar_categorias(db=Depends(get_mongo_db)):
+    # Conteos materializados en categoria_stats (ver db/categoria_stats.py)
+    return await catalog_cache.get_or_load(("categorias_publicas",), lambda: categoria_stats.listar(db))
\ No newline at end of file
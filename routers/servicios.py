@@ -1,5 +1,7 @@
 # routers/servicios.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from db.database import get_mongo_db
+from db.catalog_cache import catalog_cache
 from models.models_beanie import Servicio
 from typing import List
 
@@ -11,13 +13,9 @@ async def listar_servicios():
     return servicios
 
 @router.get("/servicios/publicos")
-async def listar_servicios_publicos():
+async def listar_servicios_publicos(db=Depends(get_mongo_db)):
     """Endpoint público para listar productos activos como servicios"""
-    try:
-        from motor.motor_asyncio import AsyncIOMotorClient
-        client = AsyncIOMotorClient('mongodb://localhost:27017')
-        db = client.db_sysne
-        
+    async def cargar():
         # Obtener productos activos de la colección "productos" (estos son los servicios)
         productos_cursor = db.productos.find({"activo": True})
         servicios_data = []
@@ -32,8 +30,11 @@ async def listar_servicios_publicos():
                 "created_at": producto.get('created_at').isoformat() if producto.get('created_at') else None,
                 "updated_at": producto.get('updated_at').isoformat() if producto.get('updated_at') else None
             })
-        
         return servicios_data
+
+    try:
+        # Los datos mock del fallback no se cachean (cargar() lanza la excepción)
+        return await catalog_cache.get_or_load(("servicios_publicos",), cargar)
     except Exception as e:
         # Fallback a datos mock si hay error de base de datos
         from datetime import datetime
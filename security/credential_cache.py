@@ -0,0 +1,156 @@
+"""
+Caché de validaciones exitosas para los endpoints /api/v1/validate
+
+Los sistemas externos validan email + contraseña + proyecto en cada acceso, y
+cada validación cuesta un bcrypt (~250 ms) más varias consultas. Las
+validaciones EXITOSAS se guardan por CREDENTIAL_CACHE_TTL_SECONDS:
+
+- Clave: HMAC-SHA256 de (ámbito, email, contraseña, proyecto) con una clave
+  aleatoria generada al arrancar el proceso. Nunca se guarda la contraseña ni
+  un hash reutilizable fuera del proceso.
+- Solo se cachean resultados válidos: una contraseña incorrecta siempre paga
+  el bcrypt completo (no acelera ataques de fuerza bruta).
+- La entrada vence por TTL o al llegar la fecha de vencimiento de la
+  vinculación, lo que ocurra primero.
+- Invalidación explícita por usuario (cambio de contraseña, activar/desactivar,
+  cambios de vinculaciones) y por proyecto (activar/desactivar, renombrar).
+  Cada worker tiene su propia caché; los demás convergen por TTL.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Dict, Optional, Set
+
+logger = logging.getLogger("security")
+
+CREDENTIAL_CACHE_TTL_SECONDS = float(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", "60"))
+CREDENTIAL_CACHE_MAX_ENTRIES = int(os.getenv("CREDENTIAL_CACHE_MAX_ENTRIES", "10000"))
+
+# Clave del HMAC: solo vive en memoria de este proceso
+_HMAC_KEY = os.urandom(32)
+
+
+class _Entrada:
+    __slots__ = ("expira", "valor", "usuario_id", "proyecto_id")
+
+    def __init__(self, expira: float, valor: Dict[str, Any], usuario_id: str, proyecto_id: str):
+        self.expira = expira
+        self.valor = valor
+        self.usuario_id = usuario_id
+        self.proyecto_id = proyecto_id
+
+
+class CredentialCache:
+    """LRU con TTL de validaciones exitosas, indexado por usuario y proyecto"""
+
+    def __init__(self, ttl: float = CREDENTIAL_CACHE_TTL_SECONDS, max_entries: int = CREDENTIAL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, _Entrada]" = OrderedDict()
+        self._por_usuario: Dict[str, Set[bytes]] = {}
+        self._por_proyecto: Dict[str, Set[bytes]] = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(ambito: str, email: str, password: str, proyecto: str) -> bytes:
+        mensaje = "\x00".join((ambito, email, password, proyecto)).encode("utf-8")
+        return hmac.new(_HMAC_KEY, mensaje, hashlib.sha256).digest()
+
+    def _remove(self, clave: bytes):
+        entrada = self._entries.pop(clave, None)
+        if entrada is None:
+            return
+        for indice, id_ in ((self._por_usuario, entrada.usuario_id), (self._por_proyecto, entrada.proyecto_id)):
+            claves = indice.get(id_)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del indice[id_]
+
+    def get(self, clave: bytes) -> Optional[Dict[str, Any]]:
+        entrada = self._entries.get(clave)
+        if entrada is None or time.monotonic() >= entrada.expira:
+            if entrada is not None:
+                self._remove(clave)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(clave)
+        self.hits += 1
+        return entrada.valor
+
+    def put(self, clave: bytes, valor: Dict[str, Any], usuario_id: Any, proyecto_id: Any,
+            vencimiento: Optional[datetime] = None, generation: Optional[int] = None):
+        """Guarda una validación exitosa (se descarta si hubo invalidaciones desde `generation`)"""
+        if generation is not None and generation != self.generation:
+            return
+        ttl = self.ttl
+        if vencimiento is not None:
+            ahora = datetime.now(timezone.utc) if vencimiento.tzinfo else datetime.utcnow()
+            ttl = min(ttl, (vencimiento - ahora).total_seconds())
+        if ttl <= 0:
+            return
+        self._remove(clave)
+        entrada = _Entrada(time.monotonic() + ttl, valor, str(usuario_id), str(proyecto_id))
+        self._entries[clave] = entrada
+        self._por_usuario.setdefault(entrada.usuario_id, set()).add(clave)
+        self._por_proyecto.setdefault(entrada.proyecto_id, set()).add(clave)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_usuario(self, usuario_id: Any):
+        self.generation += 1
+        self.invalidations += 1
+        for clave in list(self._por_usuario.get(str(usuario_id), ())):
+            self._remove(clave)
+
+    def invalidate_proyecto(self, proyecto_id: Any):
+        self.generation += 1
+        self.invalidations += 1
+        for clave in list(self._por_proyecto.get(str(proyecto_id), ())):
+            self._remove(clave)
+
+    def clear(self):
+        self.generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+        self._por_usuario.clear()
+        self._por_proyecto.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Instancia única por proceso
+credential_cache = CredentialCache()
+
+_tareas: Set[asyncio.Task] = set()
+
+
+def en_segundo_plano(coro: Awaitable[Any]):
+    """Lanza una escritura de tracking sin demorar la respuesta cacheada"""
+    async def _ejecutar():
+        try:
+            await coro
+        except Exception as e:
+            logger.error(f"Error actualizando tracking de validación: {e}")
+
+    tarea = asyncio.create_task(_ejecutar())
+    _tareas.add(tarea)
+    tarea.add_done_callback(_tareas.discard)
@@ -11,7 +11,8 @@ import re
 
 from config import SECRET_KEY, ALGORITHM
 from models.models_beanie import Usuario
-from db.database import init_beanie_db
+from db.database import init_beanie_db, is_beanie_ready
+from security.password_hasher import password_hasher, PasswordHasherBusy
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -19,20 +20,15 @@ logger = logging.getLogger(__name__)
 # Configuración de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Bandera para controlar inicialización de Beanie
-beanie_initialized = False
-
 async def ensure_beanie_initialized():
     """Asegura que Beanie esté inicializado antes de usar los modelos"""
-    global beanie_initialized
-    if not beanie_initialized:
-        try:
-            await init_beanie_db()
-            beanie_initialized = True
-            logger.info("Beanie inicializado en ecommerce_auth")
-        except Exception as e:
-            logger.error(f"Error inicializando Beanie: {e}")
-            raise
+    if is_beanie_ready():
+        return
+    try:
+        await init_beanie_db()
+    except Exception as e:
+        logger.error(f"Error inicializando Beanie: {e}")
+        raise
 
 # Configuración de tokens
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 horas para usuarios ecommerce
@@ -45,6 +41,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica una contraseña contra su hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password: str) -> str:
+    """hash_password en el pool de bcrypt (no bloquea el event loop)"""
+    return await password_hasher.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password en el pool de bcrypt (no bloquea el event loop)"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crea un token JWT de acceso"""
     to_encode = data.copy()
@@ -86,8 +90,10 @@ async def authenticate_ecommerce_user(email: str, password: str) -> Optional[Dic
 
         # Verificar contraseña
         try:
-            password_valid = verify_password(password, user.hashed_password)
+            password_valid = await verify_password_async(password, user.hashed_password)
             logger.info(f"🔐 Password verification result: {password_valid}")
+        except PasswordHasherBusy:
+            raise
         except Exception as pwd_error:
             logger.error(f"❌ Error verificando contraseña para {email}: {str(pwd_error)}")
             return None
@@ -110,6 +116,8 @@ async def authenticate_ecommerce_user(email: str, password: str) -> Optional[Dic
         logger.info(f"Usuario autenticado exitosamente: {email}")
         return user_data
 
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         logger.error(f"Error autenticando usuario ecommerce {email}: {str(e)}")
         logger.error(f"Type of error: {type(e)}")
@@ -208,7 +216,7 @@ async def register_ecommerce_user(user_data: Dict[str, Any]) -> Optional[Dict[st
             return None
 
         # Hash de la contraseña
-        password_hash = hash_password(user_data['password'])
+        password_hash = await hash_password_async(user_data['password'])
 
         # Crear usuario usando Beanie
         new_user = Usuario(
@@ -233,6 +241,8 @@ async def register_ecommerce_user(user_data: Dict[str, Any]) -> Optional[Dict[st
         logger.info(f"Usuario registrado exitosamente: {user_data['email']}")
         return user_info
 
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         logger.error(f"Error registrando usuario: {str(e)}")
         import traceback
@@ -282,17 +292,21 @@ async def change_ecommerce_user_password(user_id: str, new_password: str) -> boo
             return False
 
         # Hash de la nueva contraseña
-        hashed_password = hash_password(new_password)
+        hashed_password = await hash_password_async(new_password)
 
         # Actualizar la contraseña
         user.password_hash = hashed_password
         user.updated_at = datetime.utcnow()
 
         await user.save()
+        from security.credential_cache import credential_cache
+        credential_cache.invalidate_usuario(user.id)
 
         logger.info(f"Contraseña cambiada exitosamente para usuario: {user_id}")
         return True
 
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         logger.error(f"Error cambiando contraseña para usuario {user_id}: {str(e)}")
         return False
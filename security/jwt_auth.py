@@ -38,7 +38,14 @@ def verificar_clave(password: str, hashed_password: str) -> bool:
     try:
         return pwd_context.verify(password, hashed_password)
     except Exception:
-        return False# Configurar logger
+        return False
+
+async def verificar_clave_async(password: str, hashed_password: str) -> bool:
+    """verificar_clave en el pool de bcrypt (no bloquea el event loop)"""
+    from security.password_hasher import password_hasher
+    return await password_hasher.run(verificar_clave, password, hashed_password)
+
+# Configurar logger
 logger = logging.getLogger("jwt_auth")
 
 # Configurar HTTPBearer para extraer token del header Authorization
@@ -379,7 +386,7 @@ async def authenticate_user_jwt(username: str, password: str) -> Optional[dict]:
         
         # Verificar contraseña
         logger.debug(f"🔑 Verificando contraseña...")
-        password_valid = verificar_clave(password, user.hashed_password)
+        password_valid = await verificar_clave_async(password, user.hashed_password)
         logger.debug(f"🔑 Resultado verificación: {password_valid}")
         
         if not password_valid:
@@ -403,6 +410,9 @@ async def authenticate_user_jwt(username: str, password: str) -> Optional[dict]:
         logger.info(f"Autenticación exitosa para usuario: {username}")
         return user_data
     
+    except HTTPException:
+        # PasswordHasherBusy (503) debe llegar al cliente
+        raise
     except Exception as e:
         logger.error(f"Error en autenticación: {str(e)}")
         return None
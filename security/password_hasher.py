@@ -0,0 +1,126 @@
+"""
+Servicio asíncrono de hash/verificación de contraseñas (bcrypt)
+
+bcrypt con 12 rondas tarda ~250 ms de CPU. Ejecutado directamente en una ruta
+async bloquea el event loop y con él todas las demás solicitudes del worker.
+Este módulo ejecuta esas operaciones en un pool de hilos propio y acotado
+(bcrypt libera el GIL mientras calcula):
+
+- PASSWORD_HASH_WORKERS hilos dedicados (no comparten el executor por
+  defecto de asyncio que usan Motor y otras tareas).
+- Como máximo PASSWORD_HASH_MAX_QUEUE operaciones esperando hilo; por encima
+  se responde 503 de inmediato (con Retry-After) en lugar de acumular
+  solicitudes que igual terminarían por timeout.
+- Métricas de profundidad de cola, tiempos de espera/ejecución y rechazos
+  (GET /admin/auth/password-hasher).
+
+Uso: `await password_hasher.run(funcion_sync, *args)`; los módulos de
+security exponen variantes async (verify_password_async, verificar_clave_async,
+...) que envuelven sus funciones sync con este servicio.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger("security")
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+
+class PasswordHasherBusy(HTTPException):
+    """503: el pool de bcrypt está saturado"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Servicio de autenticación saturado, intente nuevamente en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+
+
+class PasswordHasher:
+    """Pool acotado para operaciones bcrypt con backpressure y métricas"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Solo se modifican desde el event loop: no necesitan lock
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.completadas = 0
+        self.rechazadas = 0
+        self.errores = 0
+        self.espera_total_ms = 0.0
+        self.espera_max_ms = 0.0
+        self.ejecucion_total_ms = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    @property
+    def en_cola(self) -> int:
+        """Operaciones esperando un hilo libre"""
+        return max(0, self.en_curso - self.workers)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta `func(*args)` en el pool; PasswordHasherBusy si la cola está llena"""
+        if self.en_curso >= self.workers + self.max_queue:
+            self.rechazadas += 1
+            logger.warning(f"Pool de bcrypt saturado ({self.en_curso} operaciones en curso); se responde 503")
+            raise PasswordHasherBusy()
+
+        self.en_curso += 1
+        self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        encolada = time.perf_counter()
+
+        def tarea():
+            inicio = time.perf_counter()
+            return func(*args), inicio, time.perf_counter()
+
+        try:
+            resultado, inicio, fin = await asyncio.get_running_loop().run_in_executor(self._get_executor(), tarea)
+        except Exception:
+            self.errores += 1
+            raise
+        finally:
+            self.en_curso -= 1
+
+        espera_ms = (inicio - encolada) * 1000.0
+        self.espera_total_ms += espera_ms
+        self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+        self.ejecucion_total_ms += (fin - inicio) * 1000.0
+        self.completadas += 1
+        return resultado
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.en_curso,
+            "queued": self.en_cola,
+            "max_in_flight": self.max_en_curso,
+            "completed": self.completadas,
+            "rejected": self.rechazadas,
+            "errors": self.errores,
+            "avg_wait_ms": round(self.espera_total_ms / self.completadas, 2) if self.completadas else 0.0,
+            "max_wait_ms": round(self.espera_max_ms, 2),
+            "avg_run_ms": round(self.ejecucion_total_ms / self.completadas, 2) if self.completadas else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Instancia única por proceso
+password_hasher = PasswordHasher()
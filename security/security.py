@@ -147,6 +147,16 @@ def verify_password(password: str, hashed_password: str) -> bool:
     """Alias de verificar_clave para compatibilidad con otros módulos"""
     return verificar_clave(password, hashed_password)
 
+async def encriptar_clave_async(clave: str) -> str:
+    """encriptar_clave en el pool de bcrypt (no bloquea el event loop)"""
+    from security.password_hasher import password_hasher
+    return await password_hasher.run(encriptar_clave, clave)
+
+async def verificar_clave_async(password: str, hashed_password: str) -> bool:
+    """verificar_clave en el pool de bcrypt (no bloquea el event loop)"""
+    from security.password_hasher import password_hasher
+    return await password_hasher.run(verificar_clave, password, hashed_password)
+
 def generate_secure_token(length: int = 32) -> str:
     """Genera un token seguro aleatorio"""
     try:
@@ -188,7 +188,7 @@ async function loadCategories() {
  */
 async function loadProducts() {
     try {
-        const response = await fetch('/ecomerce/api/productos/publicos?limit=1000');
+        const response = await fetch('/ecomerce/api/productos/publicos?limit=1000&fields=id,nombre,descripcion,precio,categoria,imagen_url,stock');
 
         if (!response.ok) {
             throw new Error('Error HTTP: ' + response.status);
@@ -461,6 +461,10 @@ function updateProductsGrid(data) {
         card.className = 'product-card fade-in';
 
         const imageUrl = item.imagen_url || '/static/img/logo.png';
+        // Imágenes locales: derivados por ancho (/static/img/{nombre}?w=) para móviles
+        const imageSrcset = /^\/static\/img\/[^?]+\.(png|jpe?g|webp|gif)$/i.test(imageUrl)
+            ? [320, 480, 640, 960].map(w => imageUrl + '?w=' + w + ' ' + w + 'w').join(', ')
+            : '';
         const basePrice = item.precio || 0;
         const hasVariants = item.variantes && item.variantes.length > 0;
 
@@ -505,7 +509,7 @@ function updateProductsGrid(data) {
         const escapedCodigo = (item.codigo || '').replace(/"/g, '&quot;').replace(/'/g, '&#39;');
 
         card.innerHTML = '<div class="product-image-container relative block group overflow-hidden">' +
-            '<img src="' + imageUrl + '" alt="' + escapedNombre + '" class="product-image w-full h-72 object-cover transition-transform duration-700 ease-out group-hover:scale-110" onerror="this.onerror=null; this.src=\'/static/img/logo.png\'">' +
+            '<img src="' + imageUrl + '"' + (imageSrcset ? ' srcset="' + imageSrcset + '" sizes="(max-width: 640px) 100vw, (max-width: 1024px) 50vw, 25vw"' : '') + ' loading="lazy" alt="' + escapedNombre + '" class="product-image w-full h-72 object-cover transition-transform duration-700 ease-out group-hover:scale-110" onerror="this.onerror=null; this.src=\'/static/img/logo.png\'">' +
             '<div class="absolute inset-0 bg-gradient-to-t from-black/20 via-transparent to-transparent opacity-0 group-hover:opacity-100 transition-opacity duration-300"></div>' +
             '<div class="absolute top-4 left-4 bg-green-500 text-white px-3 py-1 rounded-full text-xs font-bold shadow-lg">NUEVO</div>' +
             '<button class="wishlist-btn absolute top-4 right-4 bg-white/95 hover:bg-white text-gray-600 hover:text-red-500 p-3 rounded-full shadow-xl transition-all duration-300 z-10 transform translate-y-2 group-hover:translate-y-0 opacity-0 group-hover:opacity-100" data-product-id="' + item.id + '" title="Agregar a favoritos">' +
@@ -11,13 +11,26 @@ const urlsToCache = [
   // Removed external CDN URLs to avoid CORS issues
 ];
 
+// Manifest del build de assets (python -m utils.static_assets): mapea cada
+// ruta lógica a su versión con hash. Sin build se cachean las rutas originales.
+const ASSET_MANIFEST_URL = '/static/dist/manifest.json';
+
+function resolverUrls(manifest) {
+  const assets = (manifest && manifest.assets) || {};
+  return urlsToCache.map(url => {
+    const asset = assets[url.replace(/^\/static\//, '')];
+    return asset ? '/static/' + asset.file : url;
+  });
+}
+
 // Instalación del service worker
 self.addEventListener('install', event => {
   event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then(cache => {
-        return cache.addAll(urlsToCache);
-      })
+    fetch(ASSET_MANIFEST_URL, { cache: 'no-cache' })
+      .then(response => response.ok ? response.json() : null)
+      .catch(() => null)
+      .then(manifest => caches.open(CACHE_NAME)
+        .then(cache => cache.addAll(resolverUrls(manifest))))
   );
 });
 
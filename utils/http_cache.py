@@ -0,0 +1,79 @@
+# utils/http_cache.py
+"""
+Utilidades de caché HTTP: ETag y respuestas 304 Not Modified
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def make_etag(content: Union[str, bytes], weak: bool = False) -> str:
+    """ETag entrecomillado a partir del contenido (sha1 truncado)"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    digest = hashlib.sha1(content).hexdigest()[:20]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True si el If-None-Match del cliente coincide con el ETag actual"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    actual = etag[2:] if etag.startswith("W/") else etag
+    for candidato in header.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == actual:
+            return True
+    return False
+
+
+def http_date(value: datetime) -> str:
+    """Fecha en formato HTTP (Last-Modified); las fechas naive se toman como UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def modified_since(request: Request, last_modified: datetime) -> bool:
+    """
+    False si If-Modified-Since indica que el cliente ya tiene esta versión.
+    Solo se evalúa cuando no hay If-None-Match (que tiene prioridad).
+    """
+    if request.headers.get("if-none-match"):
+        return True
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return True
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return True
+    # Con offset "-0000" parsedate_to_datetime devuelve una fecha naive (UTC)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # Last-Modified tiene resolución de segundos
+    try:
+        return last_modified.replace(microsecond=0) > since
+    except (TypeError, ValueError):
+        return True
+
+
+def not_modified(etag: str, cache_control: Optional[str] = None, last_modified: Optional[str] = None) -> Response:
+    """Respuesta 304 con los mismos encabezados de validación"""
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return Response(status_code=304, headers=headers)
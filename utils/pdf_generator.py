@@ -15,15 +15,48 @@ from reportlab.pdfbase.ttfonts import TTFont
 from io import BytesIO
 from typing import Dict, Any, Optional
 import logging
+import tempfile
 
 logger = logging.getLogger(__name__)
 
+# Hoja de estilos compartida: se arma una vez por proceso (cada worker del pool
+# de PDFs la construye con su primer contrato) y no en cada descarga
+_STYLES = None
+
+_INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.darkblue),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+])
+
+_SIGNATURES_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+
+def _fecha_emision(contract_data: Dict[str, Any]) -> datetime:
+    """Fecha impresa en el contrato (la fija quien pide el PDF para que sea cacheable)"""
+    return contract_data.get('fecha_emision') or datetime.now()
+
+
 class ContractPDFGenerator:
     """Generador de PDFs para contratos profesionales"""
 
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_styles()
+        global _STYLES
+        if _STYLES is None:
+            self.styles = getSampleStyleSheet()
+            self._setup_styles()
+            _STYLES = self.styles
+        self.styles = _STYLES
 
     def _setup_styles(self):
         """Configurar estilos personalizados para el PDF"""
@@ -91,10 +124,34 @@ class ContractPDFGenerator:
             BytesIO: Buffer con el PDF generado
         """
         buffer = BytesIO()
+        self._build(buffer, contract_data, user_data)
 
+        # Resetear posición del buffer
+        buffer.seek(0)
+        return buffer
+
+    def write_contract_pdf(self, contract_data: Dict[str, Any], user_data: Dict[str, Any], path: str) -> str:
+        """
+        Genera el PDF directamente en `path`. Se escribe en un temporal del mismo
+        directorio y se renombra, así nadie lee un archivo a medio escribir.
+        """
+        directorio = os.path.dirname(path) or "."
+        os.makedirs(directorio, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._build(f, contract_data, user_data)
+            os.replace(temporal, path)
+        except Exception:
+            os.unlink(temporal)
+            raise
+        return path
+
+    def _build(self, output, contract_data: Dict[str, Any], user_data: Dict[str, Any]):
+        """Arma el documento sobre `output` (buffer o archivo abierto en binario)"""
         # Crear documento
         doc = SimpleDocTemplate(
-            buffer,
+            output,
             pagesize=A4,
             rightMargin=2*cm,
             leftMargin=2*cm,
@@ -108,10 +165,6 @@ class ContractPDFGenerator:
         # Generar PDF
         doc.build(story)
 
-        # Resetear posición del buffer
-        buffer.seek(0)
-        return buffer
-
     def _build_contract_content(self, contract_data: Dict[str, Any], user_data: Dict[str, Any]) -> list:
         """Construye el contenido del contrato"""
         story = []
@@ -123,18 +176,10 @@ class ContractPDFGenerator:
         # Información básica
         info_data = [
             ['Número de Contrato:', contract_data.get('id', 'N/A')],
-            ['Fecha:', datetime.now().strftime('%d/%m/%Y')]
+            ['Fecha:', _fecha_emision(contract_data).strftime('%d/%m/%Y')]
         ]
         info_table = Table(info_data, colWidths=[4*cm, 10*cm])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.darkblue),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        info_table.setStyle(_INFO_TABLE_STYLE)
         story.append(info_table)
         story.append(Spacer(1, 1*cm))
 
@@ -294,7 +339,7 @@ class ContractPDFGenerator:
         story.append(Spacer(1, 1*cm))
 
         # Firmas
-        signatures = self._create_signatures_section(user_data)
+        signatures = self._create_signatures_section(user_data, _fecha_emision(contract_data))
         story.append(signatures)
 
         return story
@@ -420,24 +465,19 @@ class ContractPDFGenerator:
             "con jurisdicción exclusiva en la Ciudad Autónoma de Buenos Aires, 2024."
         ]
 
-    def _create_signatures_section(self, user_data: Dict[str, Any]) -> Table:
+    def _create_signatures_section(self, user_data: Dict[str, Any], fecha: Optional[datetime] = None) -> Table:
         """Crea la sección de firmas"""
+        fecha = fecha or datetime.now()
         data = [
             ['_______________________________', '_______________________________'],
             ['EL PROVEEDOR', 'EL CLIENTE'],
             ['', ''],
             ['Aceptación Digital', 'Aceptación Digital'],
-            [f'Fecha: {datetime.now().strftime("%d/%m/%Y")}', f'Cliente: {user_data.get("email", "N/A")}']
+            [f'Fecha: {fecha.strftime("%d/%m/%Y")}', f'Cliente: {user_data.get("email", "N/A")}']
         ]
 
         table = Table(data, colWidths=[8*cm, 8*cm])
-        table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
+        table.setStyle(_SIGNATURES_TABLE_STYLE)
 
         return table
 
@@ -455,4 +495,15 @@ def generate_contract_pdf(contract_data: Dict[str, Any], user_data: Dict[str, An
         BytesIO: Buffer con el PDF generado
     """
     generator = ContractPDFGenerator()
-    return generator.generate_contract_pdf(contract_data, user_data)
\ No newline at end of file
+    return generator.generate_contract_pdf(contract_data, user_data)
+
+
+def write_contract_pdf(contract_data: Dict[str, Any], user_data: Dict[str, Any], path: str) -> str:
+    """
+    Genera el PDF del contrato en `path` (punto de entrada del pool de procesos
+    de Services/contratos/pdf.py: debe ser una función de módulo, picklable)
+
+    Returns:
+        str: La ruta escrita
+    """
+    return ContractPDFGenerator().write_contract_pdf(contract_data, user_data, path)
\ No newline at end of file
@@ -0,0 +1,242 @@
+# =============================================================================
+# static_assets.py - Assets estáticos con hash de contenido y precomprimidos
+# =============================================================================
+# Paso de build (antes de desplegar):
+#   python -m utils.static_assets            # genera static/dist/ y el manifest
+#   python -m utils.static_assets --clean    # borra static/dist/ antes
+#
+# - Cada asset de static/ (js, css, imágenes, fuentes) se copia a
+#   static/dist/<ruta>/<nombre>.<hash>.<ext>; el hash es del contenido, así
+#   que la URL cambia solo cuando cambia el archivo.
+# - Los tipos de texto (js, css, svg, json...) se guardan además como .gz y,
+#   si está instalado el paquete `brotli`, como .br (solo si resultan más
+#   chicos que el original).
+# - static/dist/manifest.json mapea la ruta lógica ("tailwind.js") al archivo
+#   con hash y las codificaciones disponibles. Lo usan `asset_url()` en las
+#   plantillas Jinja y static/sw.js.
+#
+# Servicio: PrecompressedStaticFiles reemplaza a StaticFiles en /static.
+# - Los archivos de static/dist/ se sirven con Cache-Control immutable y, según
+#   Accept-Encoding, desde su hermano .br/.gz (Content-Encoding + Vary).
+# - El resto de static/ se sirve igual que antes.
+# - Sin build (no hay manifest) `asset_url()` devuelve la ruta original.
+# =============================================================================
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = "static"
+DIST_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+STATIC_URL = "/static/"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Extensiones que se versionan con hash
+ASSET_EXTENSIONS = {
+    ".js", ".css", ".svg", ".json", ".map",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".ico",
+    ".woff", ".woff2", ".ttf", ".otf",
+}
+# Extensiones de texto que además se precomprimen
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".json", ".map", ".ttf", ".otf", ".ico"}
+# Archivos que deben conservar su URL (service worker y manifest PWA)
+EXCLUDED_FILES = {"sw.js", "manifest.json"}
+# Directorios de static/ que no son assets (subidas de usuarios, salida del build)
+EXCLUDED_DIRS = {DIST_NAME, "uploads"}
+# Por debajo de este tamaño la compresión no compensa
+MIN_COMPRESS_BYTES = 1024
+
+# Codificaciones precomprimidas: (token de Accept-Encoding, sufijo del archivo)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se generan .gz
+    brotli = None
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _compress(data: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        # mtime=0 para que el build sea reproducible
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def build_assets(static_dir: str = STATIC_DIR, clean: bool = False) -> Dict[str, Any]:
+    """Genera los assets con hash (y sus .gz/.br) y escribe el manifest"""
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    if clean and os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    assets: Dict[str, Dict[str, Any]] = {}
+    bytes_original = 0
+    bytes_comprimidos = 0
+    for dirpath, dirnames, filenames in os.walk(static_dir):
+        rel_dir = os.path.relpath(dirpath, static_dir)
+        if rel_dir == ".":
+            dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+            rel_dir = ""
+        for filename in sorted(filenames):
+            base, ext = os.path.splitext(filename)
+            if ext.lower() not in ASSET_EXTENSIONS or (not rel_dir and filename in EXCLUDED_FILES):
+                continue
+            with open(os.path.join(dirpath, filename), "rb") as f:
+                data = f.read()
+
+            logical = "/".join(filter(None, rel_dir.split(os.sep) + [filename]))
+            hashed = "/".join(filter(None, rel_dir.split(os.sep) + [f"{base}.{_content_hash(data)}{ext}"]))
+            destino = os.path.join(dist_dir, *hashed.split("/"))
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            if not os.path.exists(destino):
+                with open(destino, "wb") as f:
+                    f.write(data)
+
+            encodings = []
+            if ext.lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_BYTES:
+                for encoding, suffix in ENCODINGS:
+                    comprimido = _compress(data, encoding)
+                    if comprimido is None or len(comprimido) >= len(data):
+                        continue
+                    with open(destino + suffix, "wb") as f:
+                        f.write(comprimido)
+                    encodings.append(encoding)
+                    bytes_comprimidos += len(comprimido) if encoding == "gzip" else 0
+                if "gzip" not in encodings:
+                    bytes_comprimidos += len(data)
+                bytes_original += len(data)
+
+            assets[logical] = {
+                "file": f"{DIST_NAME}/{hashed}",
+                "size": len(data),
+                "encodings": encodings,
+            }
+
+    manifest = {
+        "version": _content_hash(json.dumps(assets, sort_keys=True).encode("utf-8")),
+        "assets": assets,
+    }
+    os.makedirs(dist_dir, exist_ok=True)
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logger.info(
+        f"Assets generados: {len(assets)} (texto {bytes_original} -> {bytes_comprimidos} bytes con gzip)"
+    )
+    return manifest
+
+
+# --- Manifest en runtime ------------------------------------------------------
+_manifest: Optional[Dict[str, Any]] = None
+# Ruta con hash (relativa a static/) -> codificaciones precomprimidas
+_encodings_por_archivo: Dict[str, list] = {}
+
+
+def load_manifest(static_dir: str = STATIC_DIR, reload: bool = False) -> Dict[str, Any]:
+    """Manifest del último build (vacío si no se ejecutó el build)"""
+    global _manifest, _encodings_por_archivo
+    if _manifest is None or reload:
+        try:
+            with open(os.path.join(static_dir, DIST_NAME, MANIFEST_NAME), encoding="utf-8") as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {"version": "", "assets": {}}
+        _encodings_por_archivo = {
+            asset["file"]: asset.get("encodings", []) for asset in _manifest.get("assets", {}).values()
+        }
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """URL pública de un asset: la versión con hash si existe en el manifest"""
+    logical = path[len(STATIC_URL):] if path.startswith(STATIC_URL) else path.lstrip("/")
+    asset = load_manifest()["assets"].get(logical)
+    return STATIC_URL + (asset["file"] if asset else logical)
+
+
+def asset_version() -> str:
+    """Versión del manifest (cambia con cualquier asset); "" sin build"""
+    return load_manifest().get("version", "")
+
+
+def accepted_encodings(request_headers: Headers) -> set:
+    """Codificaciones aceptadas según Accept-Encoding (sin las que tienen q=0)"""
+    aceptadas = set()
+    for parte in request_headers.get("accept-encoding", "").split(","):
+        token, _, params = parte.strip().partition(";")
+        params = params.replace(" ", "")
+        if token and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            aceptadas.add(token.lower())
+    return aceptadas
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles con negociación de .br/.gz y caché immutable para static/dist/"""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        path = self.get_path(scope).replace(os.sep, "/")
+        if not path.startswith(DIST_NAME + "/"):
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        load_manifest()
+        encodings = _encodings_por_archivo.get(path, [])
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        if path.endswith("/" + MANIFEST_NAME):
+            # El manifest conserva su nombre: siempre se revalida
+            headers["Cache-Control"] = "no-cache"
+        if encodings:
+            headers["Vary"] = "Accept-Encoding"
+
+        aceptadas = accepted_encodings(request_headers)
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings and encoding in aceptadas:
+                try:
+                    comprimido_stat = os.stat(str(full_path) + suffix)
+                except OSError:
+                    continue
+                headers["Content-Encoding"] = encoding
+                response = FileResponse(
+                    str(full_path) + suffix,
+                    status_code=status_code,
+                    stat_result=comprimido_stat,
+                    media_type=mimetypes.guess_type(str(full_path))[0] or "application/octet-stream",
+                    headers=headers,
+                )
+                break
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Genera static/dist/ con assets versionados y precomprimidos")
+    parser.add_argument("--clean", action="store_true", help="Borrar static/dist/ antes de generar")
+    args = parser.parse_args()
+
+    manifest = build_assets(clean=args.clean)
+    print(f"{len(manifest['assets'])} assets, versión {manifest['version']}")
@@ -0,0 +1,131 @@
+# utils/streaming.py
+"""
+Respuestas JSON en streaming para listados grandes
+
+Los documentos se serializan a medida que salen del cursor (Motor/Beanie) en
+lugar de armar la lista completa en memoria, así el uso de memoria no depende
+de la cantidad de resultados.
+- Formato por defecto: array JSON (compatible con los clientes existentes).
+- NDJSON (un documento por línea) con `Accept: application/x-ndjson` o
+  `?format=ndjson`.
+Los bytes se agrupan en bloques de STREAM_CHUNK_BYTES antes de enviarse, y
+middleware/compression los comprime bloque a bloque.
+
+Si el cursor falla a mitad de camino la respuesta ya salió con 200: el error se
+registra en el log y el cuerpo queda truncado (JSON inválido para el cliente).
+"""
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # opcional: se usa json de la librería estándar
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_BYTES = 64 * 1024
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """Serializa a JSON (orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def en_lotes(items: AsyncIterable[Any], tamano: int) -> AsyncIterator[List[Any]]:
+    """Agrupa un iterable asíncrono (cursor) en listas de hasta `tamano` elementos"""
+    lote: List[Any] = []
+    async for item in items:
+        lote.append(item)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+async def _bloques(partes: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer: List[bytes] = []
+    tamano = 0
+    try:
+        async for parte in partes:
+            buffer.append(parte)
+            tamano += len(parte)
+            if tamano >= STREAM_CHUNK_BYTES:
+                yield b"".join(buffer)
+                buffer, tamano = [], 0
+    except Exception as e:
+        logger.error(f"Error generando respuesta en streaming: {e}")
+        raise
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def _array(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    yield b"["
+    primero = True
+    async for item in items:
+        yield dumps(item) if primero else b"," + dumps(item)
+        primero = False
+    yield b"]"
+
+
+async def _ndjson(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield dumps(item) + b"\n"
+
+
+async def _objeto(cabecera: Dict[str, Any], clave: str, items: AsyncIterable[Any],
+                  total: Optional[str]) -> AsyncIterator[bytes]:
+    inicio = dumps(cabecera)
+    yield (inicio[:-1] + b"," if len(inicio) > 2 else b"{") + dumps(clave) + b":["
+    cantidad = 0
+    async for item in items:
+        yield dumps(item) if cantidad == 0 else b"," + dumps(item)
+        cantidad += 1
+    yield b"]" + (b"," + dumps(total) + b":" + dumps(cantidad) if total else b"") + b"}"
+
+
+def wants_ndjson(request: Request) -> bool:
+    return request.query_params.get("format") == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def stream_items(request: Request, items: AsyncIterable[Any], headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Array JSON (o NDJSON si el cliente lo pide) generado a medida que llegan los items"""
+    if wants_ndjson(request):
+        return StreamingResponse(_bloques(_ndjson(items)), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(_bloques(_array(items)), media_type="application/json", headers=headers)
+
+
+def stream_object(cabecera: Dict[str, Any], clave: str, items: AsyncIterable[Any],
+                  total: Optional[str] = "total") -> StreamingResponse:
+    """
+    Objeto JSON con una lista en streaming: {**cabecera, clave: [...], total: n}.
+    El total se escribe al final, cuando ya se conoce.
+    """
+    return StreamingResponse(_bloques(_objeto(cabecera, clave, items, total)), media_type="application/json")
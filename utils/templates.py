@@ -1,3 +1,52 @@
+import os
+import tempfile
+
+import jinja2
 from fastapi.templating import Jinja2Templates
 
+from utils.static_assets import asset_url, asset_version
+from Services.imagenes.derivados import srcset
+
 templates = Jinja2Templates(directory="static")
+
+# Entorno Jinja único para las páginas de `templates/` (producto, servicio,
+# contrato...). Se construye una sola vez por proceso y guarda el bytecode
+# compilado en disco para que los workers nuevos no recompilen las plantillas.
+JINJA_BYTECODE_CACHE_DIR = os.getenv("JINJA_BYTECODE_CACHE_DIR") or os.path.join(
+    tempfile.gettempdir(), "jinja_bytecode"
+)
+
+
+def _build_page_environment() -> jinja2.Environment:
+    bytecode_cache = None
+    try:
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+    except OSError:
+        # Sistema de archivos de solo lectura: se sigue sin caché de bytecode
+        pass
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader("templates"),
+        autoescape=True,
+        bytecode_cache=bytecode_cache,
+        auto_reload=os.getenv("JINJA_AUTO_RELOAD", "false").lower() == "true",
+    )
+
+
+page_templates = Jinja2Templates(env=_build_page_environment())
+# {{ asset_url('styles.css') }} -> /static/dist/styles.<hash>.css
+page_templates.env.globals["asset_url"] = asset_url
+# {{ srcset('/static/img/x.png') }} -> "/static/img/x.png?w=320 320w, ..."
+page_templates.env.globals["srcset"] = srcset
+
+
+def template_version(name: str) -> str:
+    """
+    Versión de una plantilla para incluir en ETags de páginas renderizadas:
+    su mtime más la versión del manifest de assets (el HTML incluye sus URLs).
+    """
+    try:
+        mtime = str(int(os.path.getmtime(os.path.join("templates", name))))
+    except OSError:
+        mtime = "0"
+    return f"{mtime}-{asset_version()}"